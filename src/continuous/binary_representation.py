@@ -1,9 +1,12 @@
 '''Module with functions to encode and decode
 vectors of real numbers to vectors of bits.'''
 
-from typing import List, Tuple
+from typing import Dict, List, Tuple
+from functools import lru_cache
 from math import log2
-from random import randint
+from random import randint, randbytes
+from numpy import add, arange, asarray, concatenate, cumsum, empty, float64, frombuffer, ndarray
+from numpy import packbits, uint8, uint64, unpackbits
 
 
 def encode_aux(n_to_encode: int, n_bits: int) -> List[int]:
@@ -55,7 +58,29 @@ def decode_aux(bits: List[int], n_bits: int,
     return decoded_num
 
 
-def encode(x: float, n_bits: int, a: float, b: float) -> List[int]:
+def binary_to_gray(n: int) -> int:
+    """Gray code of a natural number, consecutive numbers differ in one bit."""
+    return n ^ (n >> 1)
+
+
+def gray_to_binary(g: int | ndarray) -> int | ndarray:
+    """
+    Inverse of binary_to_gray, also for arrays of unsigned integers
+    (of at most 64 bits).
+    """
+    if isinstance(g, ndarray):
+        n = g
+        for shift in (1, 2, 4, 8, 16, 32):
+            n = n ^ (n >> shift)
+        return n
+    n = 0
+    while g:
+        n ^= g
+        g >>= 1
+    return n
+
+
+def encode(x: float, n_bits: int, a: float, b: float, gray: bool = False) -> List[int]:
     """
     Encode a real number into a list of bits.
     Args:
@@ -63,6 +88,7 @@ def encode(x: float, n_bits: int, a: float, b: float) -> List[int]:
         n_bits (int): Number of bits for encoding.
         a (float): Minimum value of the interval.
         b (float): Maximum value of the interval.
+        gray (bool): If the number is encoded with Gray code.
     Returns:
         List[int]: List of bits representing the encoded number.
     """
@@ -71,11 +97,11 @@ def encode(x: float, n_bits: int, a: float, b: float) -> List[int]:
 
     delta = (b - a) / (2**n_bits - 1)
     n = int((x - a) / delta)
-    return encode_aux(n, n_bits)
+    return encode_aux(binary_to_gray(n) if gray else n, n_bits)
 
 
 def decode(x_cod: List[int], n_bits: int, a: float, b: float,
-           initial_bit_index: int = 0) -> float:
+           initial_bit_index: int = 0, gray: bool = False) -> float:
     """
     Decode a list of bits into a floating-point number.
     Args:
@@ -85,6 +111,7 @@ def decode(x_cod: List[int], n_bits: int, a: float, b: float,
         b (float): Maximum value of the interval.
         initial_bit_index (int): Starting index for decoding, only
             in case of decoding a vector.
+        gray (bool): If the number was encoded with Gray code.
     Returns:
         float: The decoded number.
     """
@@ -92,11 +119,14 @@ def decode(x_cod: List[int], n_bits: int, a: float, b: float,
 
     delta = (b - a) / (2**n_bits - 1)
     n = decode_aux(x_cod, n_bits, initial_bit_index)
+    if gray:
+        n = gray_to_binary(n)
     return a + delta * n
 
 
 def encode_vector(v: List[float], v_n_bits: List[int],
-                  v_intervals: List[Tuple[float, float]]) -> List[int]:
+                  v_intervals: List[Tuple[float, float]],
+                  gray: bool = False) -> List[int]:
     """
     Encode a vector of real numbers into a vector of bits.
 
@@ -108,6 +138,7 @@ def encode_vector(v: List[float], v_n_bits: List[int],
         v_intervals (List[Tuple[float, float]]): List of tuples where each
             tuple contains the minimum and maximum values of the interval
             to encode each number in `v`.
+        gray (bool): If the numbers are encoded with Gray code.
     Returns:
         List[int]: Vector of bits representing the encoded vector.
     """
@@ -116,12 +147,13 @@ def encode_vector(v: List[float], v_n_bits: List[int],
 
     encoded_vector = []
     for num, n_bits, (a, b) in zip(v, v_n_bits, v_intervals):
-        encoded_vector.extend(encode(num, n_bits, a, b))
+        encoded_vector.extend(encode(num, n_bits, a, b, gray))
     return encoded_vector
 
 
 def decode_vector(v: List[int], v_n_bits: List[int],
-                  v_intervals: List[Tuple[float, float]]) -> List[float]:
+                  v_intervals: List[Tuple[float, float]],
+                  gray: bool = False) -> List[float]:
     """
     Decode a vector of bits into a vector of real numbers.
     Args:
@@ -131,17 +163,103 @@ def decode_vector(v: List[int], v_n_bits: List[int],
         v_intervals (List[Tuple[float, float]]): List of tuples where
             each tuple specifies the minimum and maximum values of the
             interval to decode each number.
+        gray (bool): If the numbers were encoded with Gray code.
     Returns:
         List[float]: Vector of decoded real numbers.
     """
     decoded_vector = []
     i = 0
     for n_bits, (a, b) in zip(v_n_bits, v_intervals):
-        decoded_vector.append(decode(v, n_bits, a, b, i))
+        decoded_vector.append(decode(v, n_bits, a, b, i, gray))
         i += n_bits
     return decoded_vector
 
 
+MAX_DECODE_TABLE_BITS = 16
+'''Widest encoding decoded with a lookup table (2**16 float64
+values, 512 KiB per table), wider ones are decoded arithmetically.'''
+
+
+@lru_cache(maxsize=64)
+def decode_table(n_bits: int, a: float, b: float, gray: bool = False) -> ndarray:
+    """
+    Table with the decoded value of each integer of n_bits bits for
+    the interval [a, b] (the same values computed by decode). Built
+    the first time it is needed and shared by all the decodings (up
+    to 64 tables are kept).
+    Args:
+        n_bits (int): Number of bits of the encoding.
+        a (float): Minimum value of the interval.
+        b (float): Maximum value of the interval.
+        gray (bool): If the integers are Gray codes.
+    Returns:
+        ndarray: Read-only array of 2**n_bits float64 values.
+    """
+    assert n_bits <= MAX_DECODE_TABLE_BITS, f'Too many bits for a table: {n_bits}.'
+    integers = arange(2**n_bits, dtype=uint64)
+    if gray:
+        integers = gray_to_binary(integers)
+    table = a + (b - a) / (2**n_bits - 1) * integers.astype(float64)
+    table.flags.writeable = False
+    return table
+
+
+def decode_population(bit_matrix: ndarray | List[List[int]],
+                      v_n_bits: List[int],
+                      v_intervals: List[Tuple[float, float]],
+                      packed: bool = False,
+                      gray: bool = False) -> ndarray:
+    """
+    Decode the vectors of bits of a whole population at once, same
+    result as decode_vector on each one: the bits of each number are
+    multiplied by their power of two and added (a dot product when all
+    the numbers have the same bits, a sum by blocks otherwise) and the
+    results are scaled to their intervals, reading them from a lookup
+    table (see decode_table) for encodings of up to MAX_DECODE_TABLE_BITS.
+    Args:
+        bit_matrix (ndarray | List[List[int]]): The vectors of bits, one
+            per row, or the packed vectors (see pack_bit_vector).
+        v_n_bits (List[int]): Number of bits used for encoding each number.
+        v_intervals (List[Tuple[float, float]]): Minimum and maximum
+            values of the interval of each number.
+        packed (bool): If the rows are packed vectors of bits.
+        gray (bool): If the numbers were encoded with Gray code.
+    Returns:
+        ndarray: A (pop_size, dim) float64 array with the decoded vectors.
+    """
+    assert all(a < b for a, b in v_intervals), 'Wrong input intervals.'
+    assert max(v_n_bits) <= 64, 'At most 64 bits per number.'
+    bits = asarray(bit_matrix, dtype=uint8)
+    if packed:
+        bits = unpackbits(bits, axis=1, count=sum(v_n_bits))
+    bits = bits.reshape(-1, sum(v_n_bits))
+
+    if len(set(v_n_bits)) == 1: # blocks of the same size
+        n_bits = v_n_bits[0]
+        weights = uint64(1) << arange(n_bits, dtype=uint64)
+        integers = bits.reshape(len(bits), len(v_n_bits), n_bits) @ weights
+    else:
+        weights = concatenate([uint64(1) << arange(n_bits, dtype=uint64) for n_bits in v_n_bits])
+        starts = concatenate(([0], cumsum(v_n_bits)[:-1]))
+        integers = add.reduceat(bits * weights, starts, axis=1)
+
+    # the numbers with the same encoding are decoded together
+    columns: Dict[Tuple[int, float, float], List[int]] = {}
+    for i, (n_bits, (a, b)) in enumerate(zip(v_n_bits, v_intervals)):
+        columns.setdefault((n_bits, a, b), []).append(i)
+
+    decoded = empty(integers.shape, dtype=float64)
+    for (n_bits, a, b), indexes in columns.items():
+        block = integers if len(indexes) == len(v_n_bits) else integers[:, indexes]
+        if n_bits <= MAX_DECODE_TABLE_BITS:
+            decoded[:, indexes] = decode_table(n_bits, a, b, gray)[block]
+            continue
+        if gray:
+            block = gray_to_binary(block)
+        decoded[:, indexes] = a + (b - a) / (2**n_bits - 1) * block.astype(float64)
+    return decoded
+
+
 def generate_random_bit_vector(v_n_bits: List[int]) -> List[int]:
     """
     Generate a random vector of bits.
@@ -155,3 +273,96 @@ def generate_random_bit_vector(v_n_bits: List[int]) -> List[int]:
             in `v_n_bits`.
     """
     return [randint(0, 1) for _ in range(sum(v_n_bits))]
+
+
+def bit_vector_key(v: List[int]) -> bytes:
+    """
+    Packs a vector of bits into bytes, used as a compact hashable key
+    of the vector (e.g. for a fitness cache).
+    Args:
+        v (List[int]): Vector of bits.
+    Returns:
+        bytes: The packed bits, eight per byte.
+    """
+    return packbits(asarray(v, dtype=uint8)).tobytes()
+
+
+def pack_bit_vector(v: List[int]) -> ndarray:
+    """
+    Packs a vector of bits into a uint8 array, eight bits per byte
+    (the first bit of the vector is the most significant bit of the
+    first byte), the unused bits of the last byte are 0.
+    Args:
+        v (List[int]): Vector of bits.
+    Returns:
+        ndarray: The packed vector, of ceil(len(v) / 8) bytes.
+    """
+    return packbits(asarray(v, dtype=uint8))
+
+
+def unpack_bit_vector(packed: ndarray, n_bits: int) -> List[int]:
+    """
+    Inverse of pack_bit_vector.
+    Args:
+        packed (ndarray): The packed vector.
+        n_bits (int): Number of bits of the vector.
+    Returns:
+        List[int]: Vector of bits.
+    """
+    return unpackbits(packed, count=n_bits).tolist()
+
+
+def encode_packed_vector(v: List[float], v_n_bits: List[int],
+                         v_intervals: List[Tuple[float, float]],
+                         gray: bool = False) -> ndarray:
+    """
+    Encode a vector of real numbers into a packed vector of bits,
+    the packed result of encode_vector.
+    Returns:
+        ndarray: The packed vector of bits.
+    """
+    return pack_bit_vector(encode_vector(v, v_n_bits, v_intervals, gray))
+
+
+def decode_packed_vector(v: ndarray, v_n_bits: List[int],
+                         v_intervals: List[Tuple[float, float]],
+                         gray: bool = False) -> List[float]:
+    """
+    Decode a packed vector of bits into a vector of real numbers,
+    same result as decode_vector on the unpacked vector.
+    Args:
+        v (ndarray): Packed vector of bits to decode.
+        v_n_bits (List[int]): List of integers where each integer
+            specifies the number of bits used for encoding each number.
+        v_intervals (List[Tuple[float, float]]): List of tuples where
+            each tuple specifies the minimum and maximum values of the
+            interval to decode each number.
+        gray (bool): If the numbers were encoded with Gray code.
+    Returns:
+        List[float]: Vector of decoded real numbers.
+    """
+    return decode_population([v], v_n_bits, v_intervals, True, gray)[0].tolist()
+
+
+def generate_random_packed_bit_vector(v_n_bits: List[int]) -> ndarray:
+    """
+    Generate a random packed vector of bits, with the unused bits
+    of the last byte set to 0.
+    Args:
+        v_n_bits (List[int]): List of integers where each integer
+            specifies the number of bits for each component in the vector.
+    Returns:
+        ndarray: The packed vector of sum(v_n_bits) random bits.
+    """
+    n_bits = sum(v_n_bits)
+    packed = frombuffer(randbytes((n_bits + 7) // 8), dtype=uint8).copy()
+    if n_bits % 8:
+        packed[-1] &= (0xFF << (8 - n_bits % 8)) & 0xFF
+    return packed
+
+
+def packed_bit_vector_key(v: ndarray) -> bytes:
+    """
+    Hashable key of a packed vector of bits (e.g. for a fitness cache).
+    """
+    return v.tobytes()
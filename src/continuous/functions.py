@@ -1,12 +1,17 @@
 '''Module with continuous objective functions.'''
 
-from typing import List, Tuple
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+from random import randint
+from typing import Callable, List, Tuple
 from math import cos, inf, pi, exp, sqrt, e, sin
 
-from src.continuous.binary_representation import decode_vector
-from src.gen_algo_framework.genetic_algorithm import Population
-from src.gen_algo_framework.population_utils import transform_to_max
-from src.gen_algo_framework.selection import cumulative_fitness
+from numpy import arange, cos as np_cos, exp as np_exp, ndarray, sin as np_sin, sqrt as np_sqrt, unpackbits
+from src.continuous.binary_representation import bit_vector_key, decode_aux, decode_population, gray_to_binary
+from src.gen_algo_framework.genetic_algorithm import Population, fitness_cache_lookup, fitness_cache_store
+from src.gen_algo_framework.mutation import bit_flip_mutation, packed_bit_flip_mutation
+from src.gen_algo_framework.population_utils import fitness_values_to_max, population_fitness_values
 from src.gen_algo_framework.diversity import diversity_avg_distance_bit_seq, entropy_bit_seq_population
 
 
@@ -108,19 +113,321 @@ all_funcs = {"rastrigin": rastrigin, "rosenbrock": rosenbrock,
              "griewank": griewank}
 
 
+# Batch versions: evaluate each row of a (pop_size, dim) matrix at once
+
+
+def batch_rastrigin(x: ndarray, a: float = 10) -> ndarray:
+    return a * x.shape[1] + (x**2 - a * np_cos(2 * pi * x)).sum(axis=1)
+
+
+def batch_rosenbrock(x: ndarray) -> ndarray:
+    return (100 * (x[:, 1:] - x[:, :-1]**2)**2 + (1 - x[:, :-1])**2).sum(axis=1)
+
+
+def batch_sphere(x: ndarray) -> ndarray:
+    return (x**2).sum(axis=1)
+
+
+def batch_ackley(x: ndarray, a=20, b=0.2, c=2 * pi) -> ndarray:
+    dimension = x.shape[1]
+    return (
+        -a * np_exp(-b * np_sqrt(1 / dimension * (x**2).sum(axis=1)))
+        - np_exp(1 / dimension * np_cos(c * x).sum(axis=1))
+        + a
+        + e
+    )
+
+
+def batch_easom(x: ndarray) -> ndarray:
+    return -np_cos(x[:, 0]) * np_cos(x[:, 1]) * np_exp(-(x[:, 0] - pi) - (x[:, 1] - pi))
+
+
+def batch_zakharov(x: ndarray) -> ndarray:
+    lineal = (0.5 * arange(1, x.shape[1] + 1) * x).sum(axis=1)
+    return (x**2).sum(axis=1) + lineal**2 + lineal**4
+
+
+def batch_michalewicz(x: ndarray, steepness=10) -> ndarray:
+    i = arange(1, x.shape[1] + 1)
+    return -(np_sin(x) * np_sin((i * x**2) / pi)**(2 * steepness)).sum(axis=1)
+
+
+def batch_hyper_ellipsoid(x: ndarray) -> ndarray:
+    # x[j]**2 is added once for each i > j, O(d) instead of O(d^2)
+    dimension = x.shape[1]
+    return x**2 @ arange(dimension - 1, -1, -1)
+
+
+def batch_griewank(x: ndarray) -> ndarray:
+    i = arange(1, x.shape[1] + 1)
+    return 1 + (x**2).sum(axis=1) / 4000 - np_cos(x / np_sqrt(i)).prod(axis=1)
+
+
+all_batch_funcs = {"rastrigin": batch_rastrigin, "rosenbrock": batch_rosenbrock,
+                   "zakharov": batch_zakharov, "michalewicz": batch_michalewicz,
+                   "sphere": batch_sphere, "hyper_ellipsoid": batch_hyper_ellipsoid,
+                   "ackley": batch_ackley, "easom": batch_easom,
+                   "griewank": batch_griewank}
+'''Batch versions of the functions in all_funcs (same keys), they
+take a (pop_size, dim) matrix and return the vector of values.'''
+
+
+def batch_function(f: Callable[[List[float]], float]) -> Callable[[ndarray], ndarray] | None:
+    '''Returns the batch version of a function of all_funcs, None for
+    other functions.'''
+    name = getattr(f, '__name__', None)
+    if all_funcs.get(name) is f:
+        return all_batch_funcs[name]
+    return None
+
+
+# Contribution of each coordinate to the additively separable functions,
+# f(x) = sum(term(x[i], i, len(x)) for i in range(len(x)))
+
+
+def sphere_term(x_i: float, i: int, dimension: int) -> float:
+    return x_i**2
+
+
+def rastrigin_term(x_i: float, i: int, dimension: int, a: float = 10) -> float:
+    return a + x_i**2 - a * cos(2 * pi * x_i)
+
+
+def hyper_ellipsoid_term(x_i: float, i: int, dimension: int) -> float:
+    # x[i]**2 is added once for each of the following coordinates
+    return (dimension - 1 - i) * x_i**2
+
+
+def michalewicz_term(x_i: float, i: int, dimension: int, steepness=10) -> float:
+    return -sin(x_i) * sin(((i + 1) * x_i**2) / pi) ** (2 * steepness)
+
+
+all_coordinate_terms = {"sphere": sphere_term, "rastrigin": rastrigin_term,
+                        "hyper_ellipsoid": hyper_ellipsoid_term,
+                        "michalewicz": michalewicz_term}
+'''Terms of the functions in all_funcs that are a sum of one term per
+coordinate (same keys), used to update the fitness of a mutant by
+only computing the change of the coordinate that changed.'''
+
+
+def coordinate_term(f: Callable[[List[float]], float]) -> Callable[[float, int, int], float] | None:
+    '''Returns the coordinate term of a function of all_funcs, None if
+    it is not registered in all_coordinate_terms.'''
+    name = getattr(f, '__name__', None)
+    if all_funcs.get(name) is f:
+        return all_coordinate_terms.get(name)
+    return None
+
+
+# Functions computed from a few sums or products of one term per coordinate
+# (accumulators), f(x) = value(accumulators(x)), a change of one coordinate
+# updates the accumulators in O(1)
+
+
+def griewank_accumulators(x: List[float]) -> Tuple[float, float]:
+    # sum of the squares and product of the cosines
+    _sum = 0
+    prod = 1
+    for i, x_i in enumerate(x, start=1):
+        _sum += x_i**2
+        prod *= cos(x_i / sqrt(i))
+    return _sum, prod
+
+
+def griewank_update(accumulators: Tuple[float, float], old_x_i: float, new_x_i: float,
+                    i: int) -> Tuple[float, float] | None:
+    _sum, prod = accumulators
+    old_cos = cos(old_x_i / sqrt(i + 1))
+    if abs(old_cos) < 1e-9: # the product can not be divided by it
+        return None
+    return _sum + new_x_i**2 - old_x_i**2, prod / old_cos * cos(new_x_i / sqrt(i + 1))
+
+
+def griewank_value(accumulators: Tuple[float, float]) -> float:
+    _sum, prod = accumulators
+    return 1 + (_sum / 4000) - prod
+
+
+def zakharov_accumulators(x: List[float]) -> Tuple[float, float]:
+    # sum of the squares and sum of 0.5 * i * x_i
+    squares = 0
+    lineal = 0
+    for i, xi in enumerate(x, start=1):
+        squares += xi**2
+        lineal += 0.5 * i * xi
+    return squares, lineal
+
+
+def zakharov_update(accumulators: Tuple[float, float], old_x_i: float, new_x_i: float,
+                    i: int) -> Tuple[float, float]:
+    squares, lineal = accumulators
+    return squares + new_x_i**2 - old_x_i**2, lineal + 0.5 * (i + 1) * (new_x_i - old_x_i)
+
+
+def zakharov_value(accumulators: Tuple[float, float]) -> float:
+    squares, lineal = accumulators
+    return squares + lineal**2 + lineal**4
+
+
+all_coordinate_accumulators = {"griewank": (griewank_accumulators, griewank_update, griewank_value),
+                               "zakharov": (zakharov_accumulators, zakharov_update, zakharov_value)}
+'''Accumulators of the functions in all_funcs that are not a sum of one
+term per coordinate (same keys): the function that computes them from a
+vector, the one that updates them when the coordinate i changes (None if
+they have to be computed again) and the one that computes the value of
+the function from them.'''
+
+
+def coordinate_accumulators(f: Callable[[List[float]], float]) -> Tuple[Callable, Callable, Callable] | None:
+    '''Returns the accumulators of a function of all_funcs, None if it
+    is not registered in all_coordinate_accumulators.'''
+    name = getattr(f, '__name__', None)
+    if all_funcs.get(name) is f:
+        return all_coordinate_accumulators.get(name)
+    return None
+
+
+def __genome_key(individual: List[int], packed: bool) -> bytes:
+    return individual.tobytes() if packed else bit_vector_key(individual) # pyright: ignore
+
+
+def __decode_individual(individual: List[int], options: dict) -> List[float]:
+    return decode_population([individual], options['v_n_bits'], options['v_intervals'],
+                             options.get('packed_genomes', False), options.get('gray_code', False))[0].tolist()
+
+
+def __read_bit(individual: List[int], j: int, packed: bool) -> int:
+    if packed:
+        return (int(individual[j >> 3]) >> (7 - (j & 7))) & 1
+    return individual[j]
+
+
+def bit_flip_mutation_with_delta(individual: List[int],
+                                 options: dict) -> Tuple[List[int], float]:
+    '''
+    Applies a bit flip mutation to the given vector of bits (like
+    bit_flip_mutation, also for packed vectors) and computes the change
+    in the value of a separable function from the only number that
+    changed, in O(bits of that number) instead of decoding and
+    evaluating the whole vector. Without a coordinate term, the
+    accumulators of the function (see all_coordinate_accumulators) are
+    updated instead, they are kept for each vector in the LRU table
+    'accumulators_table' (computed by decoding the vector if not found).
+    Args:
+        individual (List[int]): The vector of bits to be mutated.
+        options (dict): The options with the keys 'coordinate_term' (see
+            all_coordinate_terms) or 'coordinate_accumulators' and
+            'accumulators_table' (OrderedDict, with its maximum size in
+            'accumulators_table_size'), 'v_n_bits', 'v_intervals' and
+            optionally 'v_bit_starts' (first bit of each number),
+            'packed_genomes' and 'gray_code'.
+    Returns:
+        Tuple[List[int], float]: The mutated vector and the change in
+            its fitness.
+    '''
+    v_n_bits = options['v_n_bits']
+    starts = options.get('v_bit_starts')
+    if starts is None:
+        starts = options['v_bit_starts'] = list(accumulate(v_n_bits[:-1], initial=0))
+    packed = options.get('packed_genomes', False)
+
+    term = options.get('coordinate_term')
+    if term is None: # accumulators of the vector before the mutation
+        table = options['accumulators_table']
+        old_key = __genome_key(individual, packed)
+        accumulators = table.get(old_key)
+        if accumulators is None:
+            accumulators = options['coordinate_accumulators'][0](__decode_individual(individual, options))
+
+    bit = randint(0, sum(v_n_bits) - 1) if packed else randint(0, len(individual) - 1)
+    k = bisect_right(starts, bit) - 1 # number that changes
+    n_bits, (a, b) = v_n_bits[k], options['v_intervals'][k]
+
+    if packed:
+        old_n = sum(__read_bit(individual, starts[k] + i, True) << i for i in range(n_bits))
+        individual[bit >> 3] ^= 0x80 >> (bit & 7)
+    else:
+        old_n = decode_aux(individual, n_bits, starts[k])
+        individual[bit] ^= 1
+    new_n = old_n ^ (1 << (bit - starts[k])) # bits of each number are little-endian
+    if options.get('gray_code', False):
+        old_n, new_n = gray_to_binary(old_n), gray_to_binary(new_n)
+
+    delta = (b - a) / (2**n_bits - 1)
+    old_x, new_x = a + delta * old_n, a + delta * new_n
+    if term is not None:
+        dimension = len(v_n_bits)
+        return individual, term(new_x, k, dimension) - term(old_x, k, dimension)
+
+    compute_accumulators, update, value = options['coordinate_accumulators']
+    new_accumulators = update(accumulators, old_x, new_x, k)
+    if new_accumulators is None:
+        new_accumulators = compute_accumulators(__decode_individual(individual, options))
+    for key, key_accumulators in ((old_key, accumulators), (__genome_key(individual, packed), new_accumulators)):
+        table[key] = key_accumulators # the parents may be copied again
+        table.move_to_end(key)
+    while len(table) > options['accumulators_table_size']:
+        table.popitem(last=False)
+    return individual, value(new_accumulators) - value(accumulators)
+
+
 def compute_vectors_fitness(population: Population[List[int]],
                              options: dict) -> Population[List[int]]:
+    '''
+    Computes the fitness of the vectors of bits of the population (not
+    yet paired with their fitness) with the function 'f' of the options.
+    The vectors are decoded at once and, if the options have a 'batch_f'
+    (see all_batch_funcs), the ones not found in the 'fitness_cache' (see
+    new_fitness_cache) are evaluated with a single call to it. Vectors
+    repeated in the population are evaluated once, the rest count as
+    cache hits.
+    '''
 
     f = options['f']
+    batch_f = options.get('batch_f')
     v_n_bits = options['v_n_bits']
     v_intervals = options['v_intervals']
     population_fitness_sum = 0
 
     gen_best_fitness = inf
 
-    for i, individual in enumerate(population):
-        decoded_individual = decode_vector(individual, v_n_bits, v_intervals)
-        individual_fitness = f(decoded_individual)
+    cache = options.get('fitness_cache')
+    fitness_values = [None] * len(population)
+    to_evaluate = list(range(len(population)))
+    keys = []
+    repeated = [] # same key as a vector being evaluated
+    if cache is not None:
+        keys = [cache['key_f'](individual) for individual in population]
+        evaluated_keys = {}
+        to_evaluate = []
+        for i, (key, individual) in enumerate(zip(keys, population)):
+            if key in evaluated_keys:
+                repeated.append((i, evaluated_keys[key]))
+                continue
+            fitness_values[i] = fitness_cache_lookup(cache, key, individual, options, inside_ga_execution=False)
+            if fitness_values[i] is None:
+                evaluated_keys[key] = i
+                to_evaluate.append(i)
+
+    new_fitness_values = []
+    if to_evaluate: # all the vectors decoded at once
+        decoded_population = decode_population([population[i] for i in to_evaluate], v_n_bits, v_intervals,
+                                               options.get('packed_genomes', False),
+                                               options.get('gray_code', False))
+        if batch_f is not None:
+            new_fitness_values = batch_f(decoded_population).tolist()
+        else:
+            new_fitness_values = [f(decoded_vector) for decoded_vector in decoded_population.tolist()]
+
+    for i, individual_fitness in zip(to_evaluate, new_fitness_values):
+        fitness_values[i] = individual_fitness
+        if cache is not None:
+            fitness_cache_store(cache, keys[i], population[i], individual_fitness)
+    for i, original in repeated: # hits of the vectors evaluated above
+        cache['hits'] += 1 # pyright: ignore
+        fitness_values[i] = fitness_values[original]
+
+    for i, (individual, individual_fitness) in enumerate(zip(population, fitness_values)):
         population[i] = individual_fitness, individual # pyright: ignore
         population_fitness_sum += individual_fitness
 
@@ -147,16 +454,21 @@ def simple_c_f_options_handler(population: Population[List[int]],
                                v_intervals = None,
                                minimization = True,
                                calc_generational_entropy = False,
-                               distance_measure = None
+                               distance_measure = None,
+                               packed_genomes = False,
+                               gray_code = False,
+                               crossover_proba = 1
                                ) -> dict:
     if init:
         options['population_fit_avgs'] = []
         options['offspring_s'] = offspring_s
         options['next_gen_pop_s'] = next_gen_pop_s
         options['mutation_proba'] = mutation_proba
+        options['crossover_proba'] = crossover_proba # copies of the parents otherwise
         options['current_best'] = inf, None
         options['gen_fittest_fitness'] = []
         options['f'] = f
+        options['batch_f'] = batch_function(f) # generations evaluated in one call
         options['n_points'] = n_crossover_points
         if v_n_bits is None:
             v_n_bits = [20, 20]
@@ -164,6 +476,17 @@ def simple_c_f_options_handler(population: Population[List[int]],
         options['v_n_bits'] = v_n_bits
         options['v_intervals'] = v_intervals
         options['minimization'] = minimization
+        options['packed_genomes'] = packed_genomes # genomes as packed vectors of bits
+        options['gray_code'] = gray_code # numbers encoded with Gray code
+        options['coordinate_term'] = coordinate_term(f)
+        options['coordinate_accumulators'] = coordinate_accumulators(f)
+        if options['coordinate_accumulators'] is not None: # of the parents and the offspring
+            options['accumulators_table'] = OrderedDict()
+            options['accumulators_table_size'] = 2 * (offspring_s + next_gen_pop_s)
+        if options['coordinate_term'] is not None or options['coordinate_accumulators'] is not None:
+            # mutants of known vectors updated in O(1)
+            mutation = packed_bit_flip_mutation(sum(v_n_bits)) if packed_genomes else bit_flip_mutation
+            options['mutation_deltas'] = {mutation: bit_flip_mutation_with_delta}
         population = compute_vectors_fitness(population, options) # pyright: ignore
 
         if calc_generational_entropy:
@@ -184,9 +507,13 @@ def simple_c_f_options_handler(population: Population[List[int]],
                                            options['distance_measure']))
 
     if options['pop_entropy'] is not None:
-        options['pop_entropy'].append(entropy_bit_seq_population(population))
+        if options.get('packed_genomes', False):
+            n_bits = sum(options['v_n_bits'])
+            options['pop_entropy'].append(entropy_bit_seq_population(
+                [(fitness, unpackbits(genome, count=n_bits)) for fitness, genome in population]))
+        else:
+            options['pop_entropy'].append(entropy_bit_seq_population(population))
 
-    pop_only_fitness_values = list(map(lambda x: (x[0], None), population))
-    pop_only_fitness_values = transform_to_max(pop_only_fitness_values)
-    options['c_fitness_l'] = cumulative_fitness(pop_only_fitness_values) # pyright: ignore
+    max_fitness_values = fitness_values_to_max(population_fitness_values(population))
+    options['c_fitness_l'] = max_fitness_values.cumsum().tolist()
     return options
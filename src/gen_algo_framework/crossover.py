@@ -4,6 +4,7 @@ for the genetic algorithm.'''
 from typing import Any, List, Tuple, Callable, Hashable
 from random import randint
 from collections import deque
+from numpy import arange, array, ndarray, packbits, searchsorted
 from src.gen_algo_framework.genetic_algorithm import Population, T
 from src.gen_algo_framework.selection import roulette_wheel_toss
 
@@ -20,10 +21,18 @@ def order_crossover_ox1(parent1: Tuple[float, List[Hashable]],
             Second parent, represented by its fitness and chromosome.
     Returns:
         Tuple[List[Hashable], List[Hashable]]: The resulting children (individuals).
+        If the parents are integer arrays the children are arrays as well.
     '''
 
     p1_genes = parent1[1]
     p2_genes = parent2[1]
+
+    if isinstance(p1_genes, ndarray):
+        child1, child2 = order_crossover_ox1((parent1[0], p1_genes.tolist()),
+                                             (parent2[0], p2_genes.tolist()),
+                                             _)
+        return array(child1, dtype=p1_genes.dtype), array(child2, dtype=p1_genes.dtype)
+
     chromosome_size = len(p1_genes)
     assert chromosome_size == len(p2_genes)
 
@@ -251,3 +260,30 @@ def population_n_points_crossover_roulettew_s(population: Population[List],
         new_gen.append(child1)
         new_gen.append(child2)
     return new_gen
+
+
+def packed_n_points_crossover(parent1: Tuple[float, ndarray],
+                              parent2: Tuple[float, ndarray],
+                              options: dict) -> Tuple[ndarray, ndarray]:
+    '''
+    n-point crossover (like n_points_crossover_parents with random
+    points) between two packed vectors of bits (see pack_bit_vector),
+    the segments are exchanged with a mask of the bits inherited from
+    the other parent.
+    Args:
+        parent1 (Tuple[float, ndarray]): The first parent, fitness and
+            packed genome.
+        parent2 (Tuple[float, ndarray]): The second parent.
+        options (dict): A dictionary with the keys 'n_points' (number
+            of crossover points) and 'v_n_bits' (bits of each encoded
+            number, their sum is the number of bits of the genomes).
+    Returns:
+        Tuple[ndarray, ndarray]: The two children.
+    '''
+    genome1, genome2 = parent1[1], parent2[1]
+    n_bits = sum(options['v_n_bits'])
+    points = gen_n_points(options['n_points'], n_bits)
+    # bits after an odd number of points come from the other parent
+    mask = packbits(searchsorted(points, arange(n_bits), side='right') & 1)
+    exchanged = (genome1 ^ genome2) & mask
+    return genome1 ^ exchanged, genome2 ^ exchanged
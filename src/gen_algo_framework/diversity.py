@@ -6,6 +6,7 @@ population.
 from math import log
 from itertools import islice
 from typing import List, Callable
+from numpy import bitwise_count, ndarray
 from src.gen_algo_framework.genetic_algorithm import Population, T
 
 
@@ -34,6 +35,22 @@ def hamming_distance(bit_seq1: List[int],
     return diffs
 
 
+def packed_hamming_distance(packed_seq1: ndarray,
+                            packed_seq2: ndarray) -> int:
+    '''
+    Hamming distance between two packed binary sequences (see
+    pack_bit_vector), the number of ones of their xor.
+    Args:
+        packed_seq1 (ndarray): The first packed sequence.
+        packed_seq2 (ndarray): The second packed sequence, of the
+            same length.
+    Returns:
+        int: The number of differing bits between the two sequences.
+    '''
+    assert len(packed_seq1) == len(packed_seq2)
+    return int(bitwise_count(packed_seq1 ^ packed_seq2).sum())
+
+
 def jaccard_distance(bit_seq1: List[int],
                      bit_seq2: List[int]) -> float:
     '''
@@ -130,4 +147,5 @@ def entropy_bit_seq_population(population: Population[T]) -> float:
     return sum(entropy_of_gene) / n_genes
 
 all_distance_measures = {'hamming_distance': hamming_distance,
-                          'jaccard_distance': jaccard_distance}
+                          'jaccard_distance': jaccard_distance,
+                          'packed_hamming_distance': packed_hamming_distance}
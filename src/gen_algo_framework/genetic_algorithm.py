@@ -2,7 +2,8 @@
 
 from math import inf
 from random import random
-from typing import Callable, MutableSequence, MutableSet, Tuple
+from collections import OrderedDict
+from typing import Callable, Hashable, MutableSequence, MutableSet, Tuple
 from typing import TypeVar, List
 
 
@@ -30,23 +31,138 @@ def genetic_algorithm(population: Population[T],
     generation = 0
     current_population = population
     while term_cond(generation, current_population):
-        options = options_handler(current_population, options)
+        current_population = generation_step(current_population, selection, crossover, mutation,
+                                             fitness_f, replacement, options_handler, options)
+        generation += 1
 
-        offspring_size, next_gen_pop_size = options['offspring_s'], options['next_gen_pop_s']
-        indexes_selected_parents = selection(current_population, offspring_size, options)
-        offspring = population_crossover(current_population, indexes_selected_parents, offspring_size, crossover, options)
-        offspring = mutate_population(mutation, offspring, options)
-        offspring = population_fitness_computing(fitness_f, offspring, options, inside_ga_execution=True)
-        next_gen_population = replacement(current_population,
-                                        offspring,
-                                        next_gen_pop_size,
-                                        options)   # calculate next_population
+    return options['current_best']
 
 
-        generation += 1
-        current_population = next_gen_population
+def generation_step(current_population: Population[T],
+                    selection: Callable[[Population[T], int, dict], List[Tuple[int, int]]],
+                    crossover: Callable[[T, T, dict], Tuple[T, T]],
+                    mutation: Callable[[T], T],
+                    fitness_f: Callable[[T, dict, bool], float],
+                    replacement: Callable[[Population[T], Population[T], int, dict], Population[T]],
+                    options_handler: Callable[[Population[T], dict], dict],
+                    options: dict) -> Population[T]:
+    '''
+    Computes one generation of the genetic algorithm, with the same
+    arguments as genetic_algorithm. If the current population is an
+    ArrayPopulation the offspring and the next generation are copied
+    into its preallocated buffers, so the next generation is an
+    ArrayPopulation too.
+    Returns:
+        Population[T]: The next generation.
+    '''
+    from src.gen_algo_framework.population_utils import ArrayPopulation # circular import
 
-    return options['current_best']
+    options = options_handler(current_population, options)
+
+    offspring_size, next_gen_pop_size = options['offspring_s'], options['next_gen_pop_s']
+    indexes_selected_parents = selection(current_population, offspring_size, options)
+    offspring = population_crossover(current_population, indexes_selected_parents, offspring_size, crossover, options)
+    offspring = mutate_population(mutation, offspring, options)
+    offspring = population_fitness_computing(fitness_f, offspring, options, inside_ga_execution=True)
+    if isinstance(current_population, ArrayPopulation):
+        offspring = current_population.offspring_buffer(len(offspring)).assign(offspring)
+        next_population = replacement(current_population, offspring, next_gen_pop_size, options)
+        return current_population.next_generation_buffer(len(next_population)).assign(next_population)
+    return replacement(current_population,
+                       offspring,
+                       next_gen_pop_size,
+                       options)   # calculate next_population
+
+
+def new_fitness_cache(max_size: int,
+                      key_f: Callable[[T], Hashable]) -> dict:
+    '''
+    Creates an empty LRU cache of fitness values, to be used with
+    cached_fitness_f.
+    Args:
+        max_size (int): Maximum number of genomes stored, the least
+            recently used is evicted when full.
+        key_f (Callable[[T], Hashable]): Function that maps a genome to
+            a canonical hashable key (genomes with the same key have
+            the same fitness).
+    Returns:
+        dict: The cache, with the hit and miss counters in the keys
+            'hits' and 'misses'.
+    '''
+    assert max_size > 0
+    return {'entries': OrderedDict(), 'max_size': max_size, 'key_f': key_f,
+            'hits': 0, 'misses': 0}
+
+
+def cached_fitness_f(fitness_f: Callable[[T, dict, bool], float],
+                     cache: dict) -> Callable[[T, dict, bool], float]:
+    '''
+    Puts a memoization layer in front of the given fitness function.
+    The fitness function is only called (and so only counted in
+    'f_execs') for the genomes not found in the cache. If the fitness
+    function modifies the genome (e.g. local search) the resulting genome
+    is cached too and copied into the individual on a hit.
+    Args:
+        fitness_f (Callable[[T, dict, bool], float]): fitness target function.
+        cache (dict): A cache created with new_fitness_cache.
+    Returns:
+        Callable[[T, dict, bool], float]: The memoized fitness function,
+            with the cache in its attribute 'cache'.
+    '''
+    key_f = cache['key_f']
+
+    def memoized_fitness_f(individual: T, options: dict, inside_ga_execution: bool = False) -> float:
+        key = key_f(individual)
+        fitness = fitness_cache_lookup(cache, key, individual, options, inside_ga_execution)
+        if fitness is not None:
+            return fitness
+        fitness = fitness_f(individual, options, inside_ga_execution)
+        fitness_cache_store(cache, key, individual, fitness)
+        return fitness
+
+    memoized_fitness_f.cache = cache # pyright: ignore
+    return memoized_fitness_f
+
+
+def fitness_cache_lookup(cache: dict,
+                         key: Hashable,
+                         individual: T,
+                         options: dict,
+                         inside_ga_execution: bool = True) -> float | None:
+    '''
+    Looks up the genome with the given key in the cache, counting the hit
+    or miss. On a hit the cached resulting genome (if any) is copied into
+    the individual and the best solution found is updated.
+    Returns:
+        float | None: The cached fitness, None if not found.
+    '''
+    entry = cache['entries'].get(key)
+    if entry is None:
+        cache['misses'] += 1
+        return None
+    cache['entries'].move_to_end(key)
+    cache['hits'] += 1
+    fitness, resulting_genome = entry
+    if resulting_genome is not None:
+        individual[:] = resulting_genome # pyright: ignore
+    if inside_ga_execution and fitness < options['current_best'][0]:
+        options['current_best'] = fitness, individual
+    return fitness
+
+
+def fitness_cache_store(cache: dict, key: Hashable, individual: T, fitness: float) -> None:
+    '''
+    Stores the fitness of the genome that had the given key before being
+    evaluated, with the resulting genome if the evaluation modified it.
+    '''
+    resulting_genome = None
+    if cache['key_f'](individual) != key: # genome modified by the fitness function
+        resulting_genome = individual.copy() # pyright: ignore
+    entries = cache['entries']
+    entries[key] = fitness, resulting_genome
+    entries.move_to_end(key)
+    if len(entries) > cache['max_size']:
+        entries.popitem(last=False)
 
 
 def population_fitness_computing(fitness_f: Callable[[T, dict, bool], float],
@@ -63,6 +179,15 @@ def population_fitness_computing(fitness_f: Callable[[T, dict, bool], float],
                 the average population fitness for each generation.
             - 'gen_fittest_fitness' (list[float]): Variable that stores
                 the best fitness of the new generation.
+            - 'offspring_fitness' (List[float | None]): Optional, the
+                already known fitness of the individuals (None if unknown),
+                only used (and removed) inside a genetic algorithm execution.
+                Individuals with known fitness are not evaluated.
+            - 'population_evaluator' (Callable[[List[T], dict], List[Tuple[float, T]]]):
+                Optional, used instead of fitness_f inside a genetic algorithm
+                execution to evaluate all the individuals at once (e.g. in
+                parallel), it must register the executions in the options and
+                return the fitness and the (possibly modified) individuals.
     Returns:
         Population[T]: The population where each individual is now
         paired with its corresponding fitness value.
@@ -70,9 +195,24 @@ def population_fitness_computing(fitness_f: Callable[[T, dict, bool], float],
 
     population_fitness_sum = 0
     gen_best_fitness = inf
+    known_fitness = options.pop('offspring_fitness', None) if inside_ga_execution else None
+
+    evaluator = options.get('population_evaluator') if inside_ga_execution else None
+    if evaluator is not None: # evaluate all the unknown individuals at once
+        unknown = [i for i in range(len(population)) if known_fitness is None or known_fitness[i] is None]
+        if known_fitness is None:
+            known_fitness = [None] * len(population)
+        for i, (fitness, individual) in zip(unknown, evaluator([population[i] for i in unknown], options)):
+            known_fitness[i] = fitness
+            population[i] = individual
 
     for i, individual in enumerate(population):
-        individuals_fitness = fitness_f(individual, options, inside_ga_execution) # pyright: ignore
+        if known_fitness is not None and known_fitness[i] is not None:
+            individuals_fitness = known_fitness[i] # no need to evaluate
+            if individuals_fitness < options['current_best'][0]:
+                options['current_best'] = individuals_fitness, individual
+        else:
+            individuals_fitness = fitness_f(individual, options, inside_ga_execution) # pyright: ignore
         population_fitness_sum += individuals_fitness
         population[i] = individuals_fitness, individual # pyright: ignore
 
@@ -85,6 +225,98 @@ def population_fitness_computing(fitness_f: Callable[[T, dict, bool], float],
     return population
 
 
+def record_f_exec(fitness: float,
+                  solution: T,
+                  options: dict,
+                  n_execs: int = 1) -> None:
+    '''
+    Registers one execution of the target function inside a genetic
+    algorithm execution: counts it, updates the best solution found and
+    records the best fitness found every 'record_interval' executions.
+    Args:
+        fitness (float): Fitness of the evaluated solution.
+        solution (T): The evaluated solution.
+        n_execs (int): Number of executions to register at once (e.g.
+            a whole neighborhood evaluated in batch), fitness and solution
+            are then the best of them.
+        options (dict): A dictionary containing the following keys:
+            - 'f_execs' (int): Counter of target function executions.
+            - 'current_best' (Tuple[float, T]): Best solution found.
+            - 'record_interval' (int): Executions between records.
+            - 'best_fitness_found_history' (list[float]): Records of
+                the best fitness found.
+            - 'f_execs_trace' (list[Tuple[int, int, float]]): Optional,
+                the improvements of the best solution found are appended
+                to it as (previous 'f_execs', n_execs, fitness), see
+                merge_f_execs_trace.
+    '''
+    fitness = float(fitness) # not a NumPy scalar (e.g. with the matrix backend)
+    prev_f_execs = options['f_execs']
+    options['f_execs'] += n_execs
+
+    if fitness < options['current_best'][0]:
+        options['current_best'] = fitness, solution
+        if 'f_execs_trace' in options:
+            options['f_execs_trace'].append((prev_f_execs, n_execs, fitness))
+
+    record_interval = options['record_interval']
+    records = options['f_execs'] // record_interval - prev_f_execs // record_interval
+    for _ in range(records):
+        options['best_fitness_found_history'].append(round(float(options['current_best'][0]), 4))
+
+
+def merge_f_execs_trace(f_execs_trace: List[Tuple[int, int, float]],
+                        total_f_execs: int,
+                        solution: T,
+                        options: dict) -> None:
+    '''
+    Registers, with record_f_exec, the executions of the target function
+    done elsewhere (e.g. in another process) with their own counters
+    starting from zero, as if they were done here: the counters and records
+    end up the same as running them here.
+    Args:
+        f_execs_trace (List[Tuple[int, int, float]]): The improvements of the
+            best solution found there, in order (see record_f_exec).
+        total_f_execs (int): Number of executions done there.
+        solution (T): Solution with the last improvement.
+        options (dict): The options to register the executions in.
+    '''
+    registered = 0
+    for prev_f_execs, n_execs, fitness in f_execs_trace:
+        if prev_f_execs > registered: # executions without improvements
+            record_f_exec(inf, solution, options, prev_f_execs - registered)
+        record_f_exec(fitness, solution, options, n_execs)
+        registered = prev_f_execs + n_execs
+    if total_f_execs > registered:
+        record_f_exec(inf, solution, options, total_f_execs - registered)
+
+
+def same_genome(genome1: T, genome2: T) -> bool:
+    '''
+    Checks if two genomes are equal, works for lists, sets and arrays.
+    '''
+    if genome1 is genome2:
+        return True
+    if len(genome1) != len(genome2):
+        return False
+    equal = genome1 == genome2
+    return equal if isinstance(equal, bool) else bool(equal.all())
+
+
+def inherited_fitness(child: T,
+                      parent1: Tuple[float, T],
+                      parent2: Tuple[float, T]) -> float | None:
+    '''
+    Returns the fitness of the parent the child is identical to (e.g.
+    after the crossover of identical parents), None if the child is
+    different from both parents and has to be evaluated.
+    '''
+    for parent_fitness, parent_genome in (parent1, parent2):
+        if same_genome(child, parent_genome):
+            return parent_fitness
+    return None
+
+
 def population_crossover(population: Population[T],
                          indexes_selected_parents: List[Tuple[int, int]],
                          offspring_size: int,
@@ -103,19 +335,36 @@ def population_crossover(population: Population[T],
         offspring_size (int):
             The desired size of the new generation.
         options (dict): A dictionary with aditional arguments that
-            the crossover operator may use.
+            the crossover operator may use, and optionally the key
+            'crossover_proba' (float, 1 by default) with the probability
+            of recombining each couple, the couples not recombined are
+            copied to the offspring. The known fitness of the offspring
+            (that of the copied parents or of the parent a child is
+            identical to, None for the rest) is stored in the key
+            'offspring_fitness'.
     Returns:
         List[List]: A list of new individuals representing the offspring.
     '''
+    crossover_proba = options.get('crossover_proba', 1)
     new_gen = []
+    offspring_fitness = []
     for i, j in indexes_selected_parents:
         parent1 = population[i]
         parent2 = population[j]
-        child1, child2 = crossover(parent1, parent2, options)
+        if crossover_proba < 1 and random() >= crossover_proba: # not recombined
+            child1, child2 = parent1[1].copy(), parent2[1].copy()
+            fitness1, fitness2 = parent1[0], parent2[0]
+        else: # a child identical to a parent keeps its fitness
+            child1, child2 = crossover(parent1, parent2, options)
+            fitness1 = inherited_fitness(child1, parent1, parent2)
+            fitness2 = inherited_fitness(child2, parent1, parent2)
         new_gen.append(child1)
+        offspring_fitness.append(fitness1)
         if len(new_gen) < offspring_size:
             new_gen.append(child2)
+            offspring_fitness.append(fitness2)
     #assert len(new_gen) == offspring_size
+    options['offspring_fitness'] = offspring_fitness
     return new_gen
 
 
@@ -132,13 +381,35 @@ def mutate_population(mutation_func: Callable[[T], T],
         options (dict):
             A dictionary containing additional arguments for the mutation process.
             Expected to contain the key 'mutation_proba' which specifies the probability
-            of mutation for each individual.
+            of mutation for each individual. Optionally it can contain:
+            - 'offspring_fitness' (List[float | None]): The known fitness of the
+                individuals (None if unknown), kept up to date by this function.
+            - 'mutation_deltas' (Dict[Callable, Callable[[T, dict], Tuple[T, float]]]):
+                Variants of mutation operators that also return the change in the
+                fitness of the individual, by operator. The variant of mutation_func
+                (if any) is used on the individuals with known fitness so their new
+                fitness is known without evaluating them.
+            - 'deltas_between_evaluations' (int): Every this many changes computed
+                by the variants (100 by default) the mutant is evaluated instead, so
+                the rounding errors added up by the changes are dropped. The count is
+                kept in the key 'deltas_count'.
     Returns:
         Population[T]:
             The population after applying the mutation operator.
     '''
     mutation_proba = options['mutation_proba']
+    known_fitness = options.get('offspring_fitness')
+    mutation_delta = options.get('mutation_deltas', {}).get(mutation_func)
+    deltas_between_evaluations = options.get('deltas_between_evaluations', 100)
     for i, individual in enumerate(population):
         if random() < mutation_proba:
+            if known_fitness is not None and known_fitness[i] is not None and mutation_delta is not None:
+                options['deltas_count'] = options.get('deltas_count', 0) + 1
+                if options['deltas_count'] % deltas_between_evaluations != 0:
+                    population[i], delta = mutation_delta(individual, options)
+                    known_fitness[i] += delta
+                    continue
             population[i] = mutation_func(individual)
+            if known_fitness is not None:
+                known_fitness[i] = None
     return population
\ No newline at end of file
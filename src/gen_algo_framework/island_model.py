@@ -0,0 +1,266 @@
+'''Module with an island model of the genetic algorithm, where
+each island evolves its own population in a different process and
+the islands periodically exchange some individuals (migration).'''
+
+from math import inf
+from queue import Empty
+from random import Random, getrandbits, sample, seed
+from multiprocessing import Queue, get_context
+from typing import Callable, Dict, Hashable, List, Tuple
+from numpy import argpartition
+from src.gen_algo_framework.genetic_algorithm import T, Population, generation_step
+from src.gen_algo_framework.genetic_algorithm import cached_fitness_f, new_fitness_cache
+from src.gen_algo_framework.population_utils import population_fitness_values
+
+
+def migration_destinations(topology: str,
+                           n_islands: int,
+                           rng: Random) -> List[List[int]]:
+    '''
+    Returns the islands that each island sends its migrants to.
+    Args:
+        topology (str): 'ring' (each island to the next one),
+            'fully_connected' (each island to all the others) or
+            'random' (each island to another one chosen at random).
+        n_islands (int): Number of islands.
+        rng (Random): Random generator, used by the random topology.
+    Returns:
+        List[List[int]]: The destinations of each island.
+    '''
+    if n_islands < 2:
+        return [[] for _ in range(n_islands)]
+    if topology == 'ring':
+        return [[(i + 1) % n_islands] for i in range(n_islands)]
+    if topology == 'fully_connected':
+        return [[j for j in range(n_islands) if j != i] for i in range(n_islands)]
+    assert topology == 'random', f'Unknown topology: {topology}'
+    return [[(i + rng.randint(1, n_islands - 1)) % n_islands] for i in range(n_islands)]
+
+
+def best_migrants(population: Population[T], n_migrants: int) -> Population[T]:
+    '''Returns the n_migrants fittest individuals (lowest fitness).'''
+    fitness_values = population_fitness_values(population)
+    if n_migrants >= len(fitness_values):
+        return list(population)
+    return [population[i] for i in argpartition(fitness_values, n_migrants - 1)[:n_migrants].tolist()]
+
+
+def random_migrants(population: Population[T], n_migrants: int) -> Population[T]:
+    '''Returns n_migrants individuals chosen uniformly at random.'''
+    return [population[i] for i in sample(range(len(population)), min(n_migrants, len(population)))]
+
+
+all_migrant_selection_funcs = {'best': best_migrants, 'random': random_migrants}
+
+
+def receive_migrants(population: Population[T], migrants: Population[T]) -> Population[T]:
+    '''
+    The migrants replace the worst individuals of the population
+    (modifies the population given as argument and returns it).
+    '''
+    n_migrants = min(len(migrants), len(population))
+    if n_migrants == 0:
+        return population
+    fitness_values = -population_fitness_values(population)
+    worst = argpartition(fitness_values, n_migrants - 1)[:n_migrants].tolist()
+    for i, migrant in zip(worst, migrants):
+        population[i] = migrant
+    return population
+
+
+def __island_f_execs(global_f_execs: int, islands_f_execs: List[int]) -> int:
+    # executions done by each island when all of them did global_f_execs,
+    # at the same pace (the islands that finished do not count anymore)
+    active = len(islands_f_execs)
+    for f_execs in sorted(islands_f_execs):
+        if f_execs * active >= global_f_execs:
+            return global_f_execs // active
+        global_f_execs -= f_execs
+        active -= 1
+    return max(islands_f_execs)
+
+
+def __island_best(island_data: dict, f_execs: int, record_interval: int) -> float:
+    # best fitness found by the island after f_execs of its executions
+    if f_execs >= island_data['f_execs']:
+        return round(float(island_data['current_best'][0]), 4)
+    if f_execs < record_interval:
+        return inf
+    return island_data['best_fitness_found_history'][f_execs // record_interval - 1]
+
+
+def merge_islands_history(islands_data: List[dict], record_interval: int) -> List[float]:
+    '''
+    Merges the records of the best fitness found by the islands, each one
+    recorded every record_interval executions of the target function done
+    by the island, into the records of the best fitness found by all the
+    islands every len(islands_data) * record_interval executions done by
+    all of them. The islands are taken to do their executions at the same
+    pace, the ones that finished keep their best fitness.
+    Args:
+        islands_data (List[dict]): The data of each island, as returned by
+            island_model_ga.
+        record_interval (int): Executions of each island between records.
+    Returns:
+        List[float]: The records of the best fitness found by all the islands.
+    '''
+    islands_f_execs = [island_data['f_execs'] for island_data in islands_data]
+    global_interval = len(islands_data) * record_interval
+    history = []
+    for global_f_execs in range(global_interval, sum(islands_f_execs) + 1, global_interval):
+        f_execs = __island_f_execs(global_f_execs, islands_f_execs)
+        history.append(min(__island_best(island_data, f_execs, record_interval) for island_data in islands_data))
+    return history
+
+
+def __island(island: int,
+             population: Population[T],
+             operators: Tuple[Callable, ...],
+             options: dict,
+             island_seed: int,
+             schedule: List[List[List[int]]],
+             migration_interval: int,
+             generations: int,
+             select_migrants: Callable[[Population[T], int], Population[T]],
+             n_migrants: int,
+             inboxes: List[Queue],
+             results: Queue,
+             cache_size: int,
+             cache_key_f: Callable[[T], Hashable] | None) -> None:
+    seed(island_seed)
+    options.pop('np_rng', None) # created again from the seed of the island
+    if cache_size > 0: # each island with its own cache
+        fitness_f = cached_fitness_f(operators[3], new_fitness_cache(cache_size, cache_key_f))
+        operators = operators[:3] + (fitness_f,) + operators[4:]
+    pending: Dict[int, List[Population[T]]] = {}
+
+    generation = 0
+    epoch = 0
+    while generation < generations:
+        for _ in range(min(migration_interval, generations - generation)):
+            population = generation_step(population, *operators, options)
+            generation += 1
+        if generation == generations:
+            break
+
+        destinations = schedule[epoch]
+        migrants = select_migrants(population, n_migrants)
+        for destination in destinations[island]:
+            inboxes[destination].put((epoch, migrants))
+
+        # messages of the next epochs may arrive before the ones of this one
+        expected = sum(island in island_destinations for island_destinations in destinations)
+        while len(pending.get(epoch, [])) < expected:
+            message_epoch, received = inboxes[island].get()
+            pending.setdefault(message_epoch, []).append(received)
+        for received in pending.pop(epoch, []):
+            population = receive_migrants(population, received)
+            for migrant in received: # the best found by the island includes its immigrants
+                if migrant[0] < options['current_best'][0]:
+                    options['current_best'] = migrant
+        epoch += 1
+
+    island_data = {'current_best': options['current_best'],
+                   'population_fit_avgs': options.get('population_fit_avgs'),
+                   'best_fitness_found_history': options.get('best_fitness_found_history'),
+                   'f_execs': options.get('f_execs')}
+    cache = getattr(operators[3], 'cache', None) # memoized fitness function, see cached_fitness_f
+    if cache is not None:
+        island_data['fitness_cache_hits'] = cache['hits']
+        island_data['fitness_cache_misses'] = cache['misses']
+    results.put((island, island_data))
+
+
+def island_model_ga(populations: List[Population[T]],
+                    selection: Callable[[Population[T], int, dict], List[Tuple[int, int]]],
+                    crossover: Callable[[T, T, dict], Tuple[T, T]],
+                    mutation: Callable[[T], T],
+                    fitness_f: Callable[[T, dict, bool], float],
+                    replacement: Callable[[Population[T], Population[T], int, dict], Population[T]],
+                    options_handler: Callable[[Population[T], dict], dict],
+                    options: dict,
+                    generations: int,
+                    migration_interval: int = 10,
+                    n_migrants: int = 1,
+                    topology: str = 'ring',
+                    migrant_selection: str = 'best',
+                    seeds: List[int] | None = None,
+                    cache_size: int = 0,
+                    cache_key_f: Callable[[T], Hashable] | None = None
+                    ) -> Tuple[Tuple[float, T], List[dict]]:
+    '''
+    Applies the genetic algorithm to each population (island) in its own
+    process, with the same operators as genetic_algorithm, and every
+    migration_interval generations each island sends n_migrants
+    individuals to the islands given by the topology, where they replace
+    the worst individuals. Each island works with its own copy of the
+    options dictionary (already initialized, e.g. by the options handler,
+    and with the populations' fitness computed). The processes are started
+    with the method in options['mp_start_method'] ('fork', 'spawn' or
+    'forkserver', the default of the platform if missing), except with
+    'fork' the operators and the options are pickled to each process.
+    Args:
+        populations (List[Population[T]]): Initial population of each island.
+        generations (int): Generations computed by each island.
+        migration_interval (int): Generations between migrations.
+        n_migrants (int): Individuals sent by each island in each migration.
+        topology (str): See migration_destinations.
+        migrant_selection (str): 'best' or 'random', see all_migrant_selection_funcs.
+        seeds (List[int] | None): Seed of each island, drawn from the random
+            module (like the random topology) if not given.
+        cache_size (int): If positive, each island memoizes fitness_f (which
+            must not be memoized already) with its own cache of this size,
+            see cached_fitness_f.
+        cache_key_f (Callable[[T], Hashable] | None): Key function of the
+            caches, see new_fitness_cache.
+    Returns:
+        Tuple[Tuple[float, T], List[dict]]: The best solution found by all
+            the islands and, for each island, a dictionary with its
+            'current_best', 'population_fit_avgs',
+            'best_fitness_found_history' and 'f_execs' (and, with a memoized
+            fitness function, 'fitness_cache_hits' and 'fitness_cache_misses').
+    '''
+    n_islands = len(populations)
+    rng = Random(getrandbits(64))
+    if seeds is None:
+        seeds = [rng.getrandbits(32) for _ in range(n_islands)]
+    assert len(seeds) == n_islands
+
+    n_epochs = max(generations - 1, 0) // migration_interval
+    schedule = [migration_destinations(topology, n_islands, rng) for _ in range(n_epochs)]
+    operators = selection, crossover, mutation, fitness_f, replacement, options_handler
+    select_migrants = all_migrant_selection_funcs[migrant_selection]
+
+    context = get_context(options.get('mp_start_method'))
+    inboxes = [context.Queue() for _ in range(n_islands)]
+    results = context.Queue()
+    processes = [context.Process(target=__island,
+                                 args=(island, population, operators, options, seeds[island], schedule,
+                                       migration_interval, generations, select_migrants, n_migrants,
+                                       inboxes, results, cache_size, cache_key_f))
+                 for island, population in enumerate(populations)]
+    for process in processes:
+        process.start()
+
+    islands_data: List[dict] = [{} for _ in range(n_islands)]
+    received = 0
+    while received < n_islands:
+        try:
+            island, island_data = results.get(timeout=1)
+        except Empty:
+            failed = [process.exitcode for process in processes if process.exitcode not in (None, 0)]
+            if failed:
+                for process in processes:
+                    process.terminate()
+                raise RuntimeError(f'An island process failed with exit code {failed[0]}.')
+            continue
+        islands_data[island] = island_data
+        received += 1
+    for process in processes:
+        process.join()
+
+    best_found = inf, None
+    for island_data in islands_data:
+        if island_data['current_best'][0] < best_found[0]:
+            best_found = island_data['current_best']
+    return best_found, islands_data
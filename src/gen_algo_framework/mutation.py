@@ -2,7 +2,9 @@
 for the genetic algorithm.'''
 
 from random import randint, sample, random
+from functools import lru_cache, partial
 from typing import Callable, List
+from numpy import ndarray
 from src.gen_algo_framework.genetic_algorithm import Population, T, mutate_population
 
 
@@ -33,4 +35,25 @@ def bit_flip_mutation(individual: List[int]) -> List[int]:
     '''
     i = randint(0, len(individual) - 1)
     individual[i] = individual[i] ^ 1
-    return individual
\ No newline at end of file
+    return individual
+
+
+def __packed_bit_flip(individual: ndarray, n_bits: int) -> ndarray:
+    i = randint(0, n_bits - 1)
+    individual[i >> 3] ^= 0x80 >> (i & 7)
+    return individual
+
+
+@lru_cache(maxsize=None)
+def packed_bit_flip_mutation(n_bits: int) -> Callable[[ndarray], ndarray]:
+    '''
+    Returns the bit flip mutation for packed vectors of n_bits bits (see
+    pack_bit_vector), the operator flips one of the first n_bits bits of
+    the genome (not the padding of its last byte). The same operator is
+    returned for the same n_bits.
+    Args:
+        n_bits (int): Number of bits of the genomes.
+    Returns:
+        Callable[[ndarray], ndarray]: The mutation operator.
+    '''
+    return partial(__packed_bit_flip, n_bits=n_bits)
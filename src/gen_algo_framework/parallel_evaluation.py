@@ -0,0 +1,155 @@
+'''Module to evaluate the individuals of a population in parallel
+with a pool of processes, used as 'population_evaluator' by
+population_fitness_computing.'''
+
+from os import cpu_count
+from sys import maxsize
+from math import ceil, inf
+from random import getrandbits, seed
+from multiprocessing import get_context
+from multiprocessing.util import Finalize
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Tuple
+from src.gen_algo_framework.genetic_algorithm import T, merge_f_execs_trace
+from src.gen_algo_framework.genetic_algorithm import fitness_cache_lookup, fitness_cache_store
+from src.utils.shared_memory import release_shared_memory
+
+
+_worker_data = {}
+
+
+def _init_worker(fitness_f: Callable[[T, dict, bool], float], options: dict, base_seed: int, counter) -> None:
+    # the instance data is received once, when the worker starts
+    with counter.get_lock(): # each worker with its own random state
+        worker_index = counter.value
+        counter.value += 1
+    seed(base_seed + worker_index)
+    options.pop('np_rng', None)
+    options['sample_size_for_time_estimation'] = 0
+    options['execs_times_f'] = []
+    options['record_interval'] = maxsize
+    options['best_fitness_found_history'] = []
+    _worker_data['fitness_f'] = fitness_f
+    _worker_data['options'] = options
+    Finalize(None, _release_worker, exitpriority=0) # when the worker exits
+
+
+def _release_worker() -> None:
+    # the options are also kept by the pool, clear them to close the shared blocks
+    _worker_data.pop('options').clear()
+    _worker_data.clear()
+    release_shared_memory()
+
+
+def _evaluate_chunk(individuals: List[T], chunk_seed: str) -> List[Tuple[float, T, int, list]]:
+    fitness_f = _worker_data['fitness_f']
+    options = _worker_data['options']
+    # the chunks go to any worker, their random state makes runs reproducible
+    seed(chunk_seed)
+    options.pop('np_rng', None)
+    results = []
+    for individual in individuals:
+        options['f_execs'] = 0
+        options['current_best'] = inf, None
+        options['f_execs_trace'] = []
+        fitness = fitness_f(individual, options, True)
+        results.append((fitness, individual, options['f_execs'], options['f_execs_trace']))
+    return results
+
+
+class ParallelEvaluator:
+    '''
+    Evaluates lists of individuals with a fitness function in a persistent
+    pool of processes, each one initialized once with the options (the
+    instance data). The executions of the target function done by the
+    workers (counters, best solution found and records) are registered
+    in the options of the caller in the same order as the individuals.
+    With a fitness cache the lookups are done here and only the misses are
+    sent to the workers. Use it as the 'population_evaluator' key of the
+    options and call shutdown when done.
+    '''
+
+    def __init__(self,
+                 fitness_f: Callable[[T, dict, bool], float],
+                 options: dict,
+                 max_workers: int | None = None,
+                 chunks_per_worker: int = 4,
+                 start_method: str | None = None,
+                 cache: dict | None = None) -> None:
+        '''
+        Args:
+            fitness_f (Callable[[T, dict, bool], float]): fitness target function,
+                a module level function (not memoized, see cache).
+            options (dict): The options with the instance data, already
+                initialized (e.g. by the options handler), its 'seed' (drawn
+                from the random module if missing) seeds the workers.
+            max_workers (int | None): Number of processes, the number of
+                CPUs by default.
+            chunks_per_worker (int): Number of chunks the individuals are
+                split into for each process, for load balancing.
+            start_method (str | None): 'fork', 'spawn' or 'forkserver', the
+                default of the platform if not given. Except with 'fork',
+                the options are pickled to each process (see share_instance
+                to avoid copying the big arrays).
+            cache (dict | None): A cache created with new_fitness_cache, used
+                like cached_fitness_f.
+        '''
+        self.worker_options = {key: value for key, value in options.items() if key != 'population_evaluator'}
+        context = get_context(start_method)
+        self.seed = options.get('seed')
+        if self.seed is None:
+            self.seed = getrandbits(64)
+        self.executor = ProcessPoolExecutor(max_workers=max_workers,
+                                            mp_context=context,
+                                            initializer=_init_worker,
+                                            initargs=(fitness_f, self.worker_options, self.seed, context.Value('i', 0)))
+        self.n_chunks = (max_workers or cpu_count() or 1) * chunks_per_worker
+        self.cache = cache
+        self.calls = 0
+
+    def __call__(self, individuals: List[T], options: dict) -> List[Tuple[float, T]]:
+        evaluated: List[Tuple[float, T] | None] = [None] * len(individuals)
+        to_evaluate = list(range(len(individuals)))
+        keys = []
+        repeated = [] # same key as an individual being evaluated
+        if self.cache is not None:
+            keys = [self.cache['key_f'](individual) for individual in individuals]
+            evaluated_keys = {}
+            to_evaluate = []
+            for i, (key, individual) in enumerate(zip(keys, individuals)):
+                if key in evaluated_keys:
+                    repeated.append((i, evaluated_keys[key]))
+                    continue
+                fitness = fitness_cache_lookup(self.cache, key, individual, options)
+                if fitness is None:
+                    evaluated_keys[key] = i
+                    to_evaluate.append(i)
+                else:
+                    evaluated[i] = fitness, individual
+
+        if to_evaluate:
+            chunk_size = ceil(len(to_evaluate) / self.n_chunks)
+            chunks = [[individuals[i] for i in to_evaluate[start:start + chunk_size]]
+                      for start in range(0, len(to_evaluate), chunk_size)]
+            chunk_seeds = [f'{self.seed}:{self.calls}:{chunk}' for chunk in range(len(chunks))]
+            self.calls += 1
+            results = (result for chunk_results in self.executor.map(_evaluate_chunk, chunks, chunk_seeds)
+                       for result in chunk_results)
+            for i, (fitness, individual, f_execs, f_execs_trace) in zip(to_evaluate, results):
+                merge_f_execs_trace(f_execs_trace, f_execs, individual, options)
+                if self.cache is not None:
+                    fitness_cache_store(self.cache, keys[i], individual, fitness)
+                evaluated[i] = fitness, individual
+
+        for i, original in repeated: # hits of the individuals evaluated above
+            self.cache['hits'] += 1
+            fitness, resulting_genome = evaluated[original]
+            if self.cache['key_f'](resulting_genome) != keys[i]: # modified by the fitness function
+                individuals[i][:] = resulting_genome # pyright: ignore
+            evaluated[i] = fitness, individuals[i]
+        return evaluated # pyright: ignore
+
+    def shutdown(self) -> None:
+        '''Stops the processes of the pool.'''
+        self.executor.shutdown()
+        self.worker_options.clear() # kept by the pool, may reference shared arrays
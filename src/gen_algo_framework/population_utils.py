@@ -3,8 +3,9 @@ generation and others.'''
 
 from math import inf
 from random import sample
-from typing import Set, List, Tuple
-from src.continuous.binary_representation import generate_random_bit_vector
+from typing import Any, Iterator, Set, List, Sequence, Tuple
+from numpy import array, asarray, empty, float64, intp, nan, ndarray
+from src.continuous.binary_representation import generate_random_bit_vector, generate_random_packed_bit_vector
 from src.gen_algo_framework.genetic_algorithm import T, Population
 
 def generate_population_of_permutations(size: int,
@@ -34,11 +35,36 @@ def generate_population_of_permutations(size: int,
     return _population
 
 
+def generate_population_of_int_permutations(size: int,
+                                            genes: Sequence[int]) -> List[ndarray]:
+    '''
+    Generates a population of random permutations of the given
+    integer genes, each individual stored as an integer array.
+    Args:
+        size (int): The number of individuals in the population.
+        genes (Sequence[int]): The genes (e.g. ids of the cities)
+            to permute.
+    Returns:
+        List[ndarray]: A list of integer arrays, one per individual.
+    '''
+    genes_list = [int(gene) for gene in genes]
+    gene_count = len(genes_list)
+    return [array(sample(genes_list, gene_count), dtype=intp) for _ in range(size)]
+
+
 def generate_population_of_bit_vectors(size: int,
                                        v_n_bits: List[int]) -> List[List[int]]:
     return [generate_random_bit_vector(v_n_bits) for _ in range(size)]
 
 
+def generate_population_of_packed_bit_vectors(size: int,
+                                              v_n_bits: List[int]) -> List[ndarray]:
+    '''Population of random packed vectors of bits (uint8 arrays, see
+    pack_bit_vector), ArrayPopulation keeps their genomes as a single
+    (size, n_bytes) uint8 matrix.'''
+    return [generate_random_packed_bit_vector(v_n_bits) for _ in range(size)]
+
+
 def transform_to_max(population: Population[T]) -> Population[T]:
     '''
     Transforms a population's fitness values from a minimization
@@ -62,3 +88,154 @@ def transform_to_max(population: Population[T]) -> Population[T]:
         population[i] = (max_fit - fitness + 1e-6, individual)
 
     return population
+
+
+def population_fitness_values(population: Population[T]) -> ndarray:
+    '''
+    Returns the fitness values of a population (list of tuples or
+    ArrayPopulation) as an array, without building a new population.
+    Args:
+        population (Population[T]): Population with computed fitness.
+    Returns:
+        ndarray: Array of float64 with the fitness of each individual.
+    '''
+    if isinstance(population, ArrayPopulation):
+        return population.fitness
+    return array([fitness for fitness, _ in population], dtype=float64)
+
+
+def fitness_values_to_max(fitness_values: ndarray) -> ndarray:
+    '''
+    Same transformation as transform_to_max but over an array of
+    fitness values, returns a new array.
+    Args:
+        fitness_values (ndarray): Fitness values of a minimization problem.
+    Returns:
+        ndarray: The transformed fitness values (for maximization).
+    '''
+    return fitness_values.max() - fitness_values + 1e-6
+
+
+class ArrayPopulation:
+    '''
+    Population stored as a struct of arrays: the fitness values in a
+    float64 array and the genomes as rows of a 2-D matrix (or in a list
+    for genomes that do not fit in a matrix, when no dtype is given).
+    It behaves like the list of (fitness, genome) tuples that the
+    operators work with, so they can be used with it unchanged, note that
+    indexing returns the genome row itself (not a copy) and assigning a
+    tuple copies the genome into the row.
+    '''
+
+    def __init__(self, size: int, genome_len: int = 0, dtype: Any = None) -> None:
+        '''
+        Creates a population of the given size with unknown fitness (nan).
+        Args:
+            size (int): Number of individuals.
+            genome_len (int): Length of the genomes, for the matrix storage.
+            dtype (Any): Type of the genes (e.g. intp for permutations
+                or uint8 for bits), None to store the genomes in a list.
+        '''
+        self.fitness = empty(size, dtype=float64)
+        self.fitness.fill(nan)
+        self.genome_len = genome_len
+        self.dtype = dtype
+        if dtype is None:
+            self.genomes = [None] * size
+        else:
+            self.genomes = empty((size, genome_len), dtype=dtype)
+        self.__offspring = None
+        self.__next = None
+
+    @classmethod
+    def from_population(cls, population: Population[T], dtype: Any = None) -> 'ArrayPopulation':
+        '''
+        Builds an ArrayPopulation from a list of (fitness, genome) tuples.
+        Args:
+            population (Population[T]): The population to convert.
+            dtype (Any): Type of the genes, None to keep the genomes in a list.
+        Returns:
+            ArrayPopulation: The population as a struct of arrays.
+        '''
+        genome_len = len(population[0][1]) if dtype is not None else 0
+        array_population = cls(len(population), genome_len, dtype)
+        array_population.assign(population)
+        return array_population
+
+    def to_population(self) -> Population[T]:
+        '''
+        Returns:
+            Population[T]: The population as a list of (fitness, genome)
+                tuples, the genomes are copied.
+        '''
+        if self.dtype is None:
+            return list(zip(self.fitness.tolist(), self.genomes))
+        return list(zip(self.fitness.tolist(), self.genomes.copy()))
+
+    def assign(self, population: Population[T]) -> 'ArrayPopulation':
+        '''
+        Copies a list of (fitness, genome) tuples of the same size into
+        this population, reusing its storage.
+        Args:
+            population (Population[T]): The population to copy.
+        Returns:
+            ArrayPopulation: This population.
+        '''
+        assert len(population) == len(self)
+        if isinstance(population, ArrayPopulation):
+            self.fitness[:] = population.fitness
+            self.genomes[:] = population.genomes
+            return self
+        self.fitness[:] = [fitness for fitness, _ in population]
+        if self.dtype is None:
+            self.genomes[:] = [genome for _, genome in population]
+        else:
+            self.genomes[:] = [asarray(genome) for _, genome in population]
+        return self
+
+    def offspring_buffer(self, size: int) -> 'ArrayPopulation':
+        '''
+        Returns a population of the given size with the same genome
+        storage as this one, preallocated once and reused in every call
+        (its content is overwritten by the caller).
+        Args:
+            size (int): Number of offspring.
+        Returns:
+            ArrayPopulation: The offspring buffer.
+        '''
+        if self.__offspring is None or len(self.__offspring) != size:
+            self.__offspring = ArrayPopulation(size, self.genome_len, self.dtype)
+        return self.__offspring
+
+    def next_generation_buffer(self, size: int) -> 'ArrayPopulation':
+        '''
+        Returns a population of the given size with the same genome
+        storage as this one, to copy the next generation into (its
+        individuals may be rows of this population or of the offspring
+        buffer). It is preallocated once, its own next generation buffer
+        is this population and both share the offspring buffer, so the
+        same storage is reused in every generation.
+        Args:
+            size (int): Size of the next generation.
+        Returns:
+            ArrayPopulation: The next generation buffer.
+        '''
+        if self.__next is None or len(self.__next) != size:
+            self.__next = ArrayPopulation(size, self.genome_len, self.dtype)
+            self.__next.__next = self
+        self.__next.__offspring = self.__offspring
+        return self.__next
+
+    def __len__(self) -> int:
+        return len(self.fitness)
+
+    def __getitem__(self, index: int) -> Tuple[float, Any]:
+        return float(self.fitness[index]), self.genomes[index]
+
+    def __setitem__(self, index: int, individual: Tuple[float, Any]) -> None:
+        fitness, genome = individual
+        self.fitness[index] = fitness
+        self.genomes[index] = genome
+
+    def __iter__(self) -> Iterator[Tuple[float, Any]]:
+        return zip(self.fitness.tolist(), self.genomes)
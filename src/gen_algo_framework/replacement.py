@@ -2,10 +2,13 @@
 for the genetic algorithm.'''
 
 from typing import List, Tuple
-from heapq import nsmallest, nlargest
+from math import ceil
+from numpy import arange, argpartition, concatenate, cumsum
 from src.gen_algo_framework.genetic_algorithm import T, Population
 from src.gen_algo_framework.selection import roulette_wheel_toss, remove_from_fitness_list
 from src.gen_algo_framework.selection import cumulative_fitness
+from src.gen_algo_framework.selection import fenwick_tree, fenwick_add, fenwick_toss
+from src.gen_algo_framework.population_utils import population_fitness_values
 
 def full_generational_replacement(_: Population[T],
                                   offspring: Population[T],
@@ -21,29 +24,116 @@ def full_gen_replacement_elitist(_: Population[T],
 
     # ensure best is in the population
     if options['current_best'][0] < options['gen_fittest_fitness']:
-        offspring.pop()
-        offspring.append(options['current_best'])
+        offspring[-1] = options['current_best'] # also works with ArrayPopulation
         options['gen_fittest_fitness'] = options['current_best']
 
     return offspring
 
 
+def __survivors(populations: List[Population[T]], survivors_size: int) -> Population[T]:
+    '''
+    Returns the survivors_size fittest individuals (lowest fitness) of the
+    given populations, comparing only their fitness (argpartition over a
+    fitness array, linear time), without concatenating the populations.
+    The survivors are not sorted.
+    '''
+    fitness_values = concatenate([population_fitness_values(population) for population in populations])
+    assert 0 < survivors_size <= len(fitness_values)
+    if survivors_size < len(fitness_values):
+        indexes = argpartition(fitness_values, survivors_size - 1)[:survivors_size]
+    else:
+        indexes = arange(survivors_size)
+
+    starts = cumsum([0] + [len(population) for population in populations])
+    population_of_index = starts.searchsorted(indexes, side='right') - 1
+    return [populations[p][i - starts[p]] for p, i in zip(population_of_index.tolist(), indexes.tolist())]
+
+
 def replacement_of_the_worst(current_pop: Population[T],
                              offspring: Population[T],
                              new_pop_size: int,
                              options: dict) -> Population[T]:
-
+    '''
+    (mu + lambda) replacement: the next generation are the fittest
+    individuals among the current population and the offspring.
+    '''
     assert new_pop_size < len(current_pop) + len(offspring)
 
-    current_pop.extend(offspring)
-
     options['gen_fittest_fitness'] = options['current_best'][0]
 
-    next_gen = nsmallest(new_pop_size, current_pop)
+    return __survivors([current_pop, offspring], new_pop_size)
+
+
+def mu_comma_lambda_replacement(_: Population[T],
+                                offspring: Population[T],
+                                new_pop_size: int,
+                                options: dict) -> Population[T]:
+    '''
+    (mu, lambda) replacement: the next generation are the fittest
+    individuals of the offspring (which must be at least as large).
+    '''
+    next_gen = __survivors([offspring], new_pop_size)
+    options['gen_fittest_fitness'] = min(fitness for fitness, _ in next_gen)
+    return next_gen
+
+
+def truncation_replacement(current_pop: Population[T],
+                           offspring: Population[T],
+                           new_pop_size: int,
+                           options: dict) -> Population[T]:
+    '''
+    Truncation replacement: the fittest fraction 'truncation_ratio'
+    (0.5 by default) of the current population survives and the rest of
+    the next generation are the fittest individuals of the offspring.
+    '''
+    elites_size = min(ceil(options.get('truncation_ratio', 0.5) * len(current_pop)), new_pop_size)
+    assert new_pop_size - elites_size <= len(offspring)
+
+    next_gen = __survivors([current_pop], elites_size) if elites_size > 0 else []
+    if elites_size < new_pop_size:
+        next_gen.extend(__survivors([offspring], new_pop_size - elites_size))
+    options['gen_fittest_fitness'] = min(fitness for fitness, _ in next_gen)
+    return next_gen
+
+
+def steady_state_replacement(current_pop: Population[T],
+                             offspring: Population[T],
+                             new_pop_size: int,
+                             options: dict) -> Population[T]:
+    '''
+    Each individual of the offspring replaces a different individual of
+    the current population, chosen by a roulette wheel toss that favors
+    the worst ones (minimization). The best individual is never replaced,
+    so with an offspring as large as the population only its fittest
+    len(current_pop) - 1 individuals enter. The weights are kept in a
+    Fenwick tree, so each toss and removal is O(log n).
+    '''
+    assert new_pop_size == len(current_pop)
+    if len(offspring) >= len(current_pop):
+        offspring = __survivors([offspring], len(current_pop) - 1) if len(current_pop) > 1 else []
+
+    fitness_values = population_fitness_values(current_pop)
+    weights = (fitness_values - fitness_values.min() + 1e-6).tolist()
+    weights[int(fitness_values.argmin())] = 0.0
+    tree = fenwick_tree(weights)
+
+    next_gen = list(current_pop)
+    for individual in offspring:
+        index = fenwick_toss(tree)
+        while weights[index] == 0.0: # replaced, tossed only because of rounding errors
+            index = fenwick_toss(tree)
+        fenwick_add(tree, index, -weights[index])
+        weights[index] = 0.0
+        next_gen[index] = individual
 
+    options['gen_fittest_fitness'] = min(fitness for fitness, _ in next_gen)
     return next_gen
 
 
 all_replacement_funcs = {'full_generational_replacement': full_generational_replacement,
                          'full_gen_replacement_elitist': full_gen_replacement_elitist,
-                         'replacement_of_the_worst': replacement_of_the_worst}
+                         'replacement_of_the_worst': replacement_of_the_worst,
+                         'mu_plus_lambda_replacement': replacement_of_the_worst,
+                         'mu_comma_lambda_replacement': mu_comma_lambda_replacement,
+                         'truncation_replacement': truncation_replacement,
+                         'steady_state_replacement': steady_state_replacement}
@@ -3,9 +3,13 @@ for the genetic algorithm.'''
 
 from random import uniform
 from bisect import bisect_left
-from typing import List, Tuple
+from typing import List, Sequence, Tuple
 from math import ceil
+from numpy import arange, array, float64, intp, ndarray, where
+from numpy.random import Generator
 from src.gen_algo_framework.genetic_algorithm import T, Population
+from src.gen_algo_framework.population_utils import fitness_values_to_max, population_fitness_values
+from src.utils.others import numpy_rng
 
 
 def cumulative_fitness(population: Population[T],
@@ -77,6 +81,156 @@ def roulette_wheel_selection(population: Population[T],
     return [(roulette_wheel_toss(cumulative_fitness_list), roulette_wheel_toss(cumulative_fitness_list)) for _ in range(number_couples)]
 
 
+def batch_roulette_wheel_selection(population: Population[T],
+                                   offspring_size: int,
+                                   options: dict) -> ndarray:
+    '''
+    Same as roulette_wheel_selection but all the tosses of the generation
+    are done at once with NumPy, the fitness values (of a minimization
+    problem) are transformed for maximization and accumulated here, so
+    the 'c_fitness_l' key is not needed.
+    Args:
+        population (Population[T]): The current population with its
+            fitness computed.
+        offspring_size (int): The desired size of the new generation.
+        options (dict): The options of the execution, the NumPy random
+            generator is taken from it (see numpy_rng).
+    Returns:
+        ndarray: Array of shape (couples, 2) with the indices of the
+            selected individuals.
+    '''
+    cumulative_fitness_array = fitness_values_to_max(population_fitness_values(population)).cumsum()
+    number_couples = ceil(offspring_size / 2)
+    tosses = numpy_rng(options).uniform(0, cumulative_fitness_array[-1], 2 * number_couples)
+    return cumulative_fitness_array.searchsorted(tosses, side='left').reshape(number_couples, 2)
+
+
+def tournament_selection(population: Population[T],
+                         offspring_size: int,
+                         options: dict) -> ndarray:
+    '''
+    k-tournament selection done for the whole generation at once: each
+    parent is the fittest (lowest fitness, minimization) of k individuals
+    chosen uniformly at random (with replacement). It doesn't need the
+    fitness to be normalized nor the 'c_fitness_l' key.
+    Args:
+        population (Population[T]): The current population with its
+            fitness computed.
+        offspring_size (int): The desired size of the new generation.
+        options (dict): The options of the execution, optionally with the
+            key 'tournament_size' (int, 2 by default). The NumPy random
+            generator is taken from it (see numpy_rng).
+    Returns:
+        ndarray: Array of shape (couples, 2) with the indices of the
+            selected individuals.
+    '''
+    fitness_values = population_fitness_values(population)
+    number_couples = ceil(offspring_size / 2)
+    contestants = numpy_rng(options).integers(0, len(fitness_values),
+                                              (2 * number_couples, options.get('tournament_size', 2)))
+    winners = contestants[arange(len(contestants)), fitness_values[contestants].argmin(axis=1)]
+    return winners.reshape(number_couples, 2)
+
+
+def stochastic_universal_sampling(population: Population[T],
+                                  offspring_size: int,
+                                  options: dict) -> ndarray:
+    '''
+    Stochastic universal sampling: all the parents of the generation are
+    selected with a single toss, using equally spaced pointers over the
+    cumulative fitness (of a minimization problem, transformed for
+    maximization), then they are shuffled to form the couples.
+    Args:
+        population (Population[T]): The current population with its
+            fitness computed.
+        offspring_size (int): The desired size of the new generation.
+        options (dict): The options of the execution, the NumPy random
+            generator is taken from it (see numpy_rng).
+    Returns:
+        ndarray: Array of shape (couples, 2) with the indices of the
+            selected individuals.
+    '''
+    cumulative_fitness_array = fitness_values_to_max(population_fitness_values(population)).cumsum()
+    number_couples = ceil(offspring_size / 2)
+    rng = numpy_rng(options)
+    step = cumulative_fitness_array[-1] / (2 * number_couples)
+    pointers = rng.uniform(0, step) + step * arange(2 * number_couples)
+    selected = cumulative_fitness_array.searchsorted(pointers, side='left')
+    selected = selected.clip(max=len(cumulative_fitness_array) - 1) # rounding errors
+    return rng.permutation(selected).reshape(number_couples, 2)
+
+
+def build_alias_table(weights: ndarray) -> Tuple[ndarray, ndarray]:
+    '''
+    Builds in O(n) the table of Vose's alias method to sample indexes
+    with probability proportional to the given weights.
+    Args:
+        weights (ndarray): Positive weights (e.g. fitness for maximization).
+    Returns:
+        Tuple[ndarray, ndarray]: The probability of keeping each index
+            and its alias (the index taken otherwise).
+    '''
+    n = len(weights)
+    scaled = (weights * (n / weights.sum())).tolist()
+    prob = [1.0] * n
+    alias = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1]
+    large = [i for i, p in enumerate(scaled) if p >= 1]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        prob[less] = scaled[less]
+        alias[less] = more
+        scaled[more] = (scaled[more] + scaled[less]) - 1
+        if scaled[more] < 1:
+            small.append(more)
+        else:
+            large.append(more)
+    # what remains has probability 1 up to rounding errors
+    return array(prob, dtype=float64), array(alias, dtype=intp)
+
+
+def alias_draws(alias_table: Tuple[ndarray, ndarray],
+                size: int,
+                rng: Generator) -> ndarray:
+    '''
+    Draws indexes in O(1) each from an alias table.
+    Args:
+        alias_table (Tuple[ndarray, ndarray]): Table from build_alias_table.
+        size (int): Number of indexes to draw.
+        rng (Generator): NumPy random generator.
+    Returns:
+        ndarray: The indexes drawn.
+    '''
+    prob, alias = alias_table
+    indexes = rng.integers(0, len(prob), size)
+    return where(rng.random(size) < prob[indexes], indexes, alias[indexes])
+
+
+def alias_selection(population: Population[T],
+                    offspring_size: int,
+                    options: dict) -> ndarray:
+    '''
+    Fitness proportional selection (like roulette_wheel_selection) with
+    Vose's alias method: the table is built once per generation from the
+    fitness values (of a minimization problem, transformed for
+    maximization) and stored in options['alias_table'] instead of the
+    'c_fitness_l' list, then each parent is drawn in O(1).
+    Args:
+        population (Population[T]): The current population with its
+            fitness computed.
+        offspring_size (int): The desired size of the new generation.
+        options (dict): The options of the execution, the NumPy random
+            generator is taken from it (see numpy_rng).
+    Returns:
+        ndarray: Array of shape (couples, 2) with the indices of the
+            selected individuals.
+    '''
+    options['alias_table'] = build_alias_table(fitness_values_to_max(population_fitness_values(population)))
+    number_couples = ceil(offspring_size / 2)
+    draws = alias_draws(options['alias_table'], 2 * number_couples, numpy_rng(options))
+    return draws.reshape(number_couples, 2)
+
+
 def remove_from_fitness_list(index: int,
                              individual_fitness: float,
                              cumulative_fitness_list: List[float]
@@ -100,3 +254,119 @@ def remove_from_fitness_list(index: int,
         cumulative_fitness_list[i] -= individual_fitness
 
     return cumulative_fitness_list
+
+
+def fenwick_tree(weights: Sequence[float]) -> List[float]:
+    '''
+    Builds in O(n) a Fenwick tree (binary indexed tree) over the given
+    weights, that allows weighted tosses, removals and weight updates in
+    O(log n), unlike the cumulative fitness list.
+    Args:
+        weights (Sequence[float]): Non negative weights (e.g. fitness
+            for maximization).
+    Returns:
+        List[float]: The tree, its first element is unused.
+    '''
+    tree = [0.0]
+    tree.extend(weights)
+    n = len(weights)
+    for i in range(1, n + 1):
+        parent = i + (i & -i)
+        if parent <= n:
+            tree[parent] += tree[i]
+    return tree
+
+
+def fenwick_add(tree: List[float], index: int, delta: float) -> None:
+    '''
+    Adds delta to the weight of the given index (e.g. minus its weight
+    to remove it) in O(log n).
+    Args:
+        tree (List[float]): Tree from fenwick_tree.
+        index (int): Index of the weight (0-based).
+        delta (float): Change of the weight.
+    '''
+    i = index + 1
+    n = len(tree) - 1
+    while i <= n:
+        tree[i] += delta
+        i += i & -i
+
+
+def fenwick_prefix_sum(tree: List[float], end: int) -> float:
+    '''
+    Args:
+        tree (List[float]): Tree from fenwick_tree.
+        end (int): Number of weights to sum, from the start.
+    Returns:
+        float: Sum of the weights with index less than end, in O(log n).
+    '''
+    total = 0.0
+    while end > 0:
+        total += tree[end]
+        end -= end & -end
+    return total
+
+
+def fenwick_toss(tree: List[float]) -> int:
+    '''
+    Roulette wheel toss (like roulette_wheel_toss) over the weights of
+    the tree, in O(log n).
+    Args:
+        tree (List[float]): Tree from fenwick_tree, with some positive weight.
+    Returns:
+        int: The index selected.
+    '''
+    n = len(tree) - 1
+    value = uniform(0, fenwick_prefix_sum(tree, n))
+    index = 0
+    step = 1 << n.bit_length()
+    while step > 0:
+        if index + step <= n and tree[index + step] < value:
+            index += step
+            value -= tree[index]
+        step >>= 1
+    return min(index, n - 1)
+
+
+def roulette_wheel_selection_without_replacement(population: Population[T],
+                                                 offspring_size: int,
+                                                 _: dict) -> List[Tuple[int, int]]:
+    '''
+    Roulette wheel selection where each individual is selected at most
+    once until the whole population has been selected (then it starts
+    again), the weights are kept in a Fenwick tree so each toss and
+    removal is O(log n).
+    Args:
+        population (Population[T]): The current population with the fitness
+            (of a minimization problem, transformed for maximization) computed.
+        offspring_size (int): The desired size of the new generation.
+    Returns:
+        List[Tuple[int, int]]: List of tuples with the indices of the selected
+            individuals.
+    '''
+    weights = fitness_values_to_max(population_fitness_values(population)).tolist()
+    number_couples = ceil(offspring_size / 2)
+    selected = []
+    remaining = 0
+    while len(selected) < 2 * number_couples:
+        if remaining == 0:
+            tree = fenwick_tree(weights)
+            not_selected = [True] * len(weights)
+            remaining = len(weights)
+        index = fenwick_toss(tree)
+        if not not_selected[index]:
+            continue # removed, tossed only because of rounding errors
+        fenwick_add(tree, index, -weights[index])
+        not_selected[index] = False
+        remaining -= 1
+        selected.append(index)
+    return list(zip(selected[::2], selected[1::2]))
+
+
+all_selection_funcs = {'roulette_wheel_selection': roulette_wheel_selection,
+                       'batch_roulette_wheel_selection': batch_roulette_wheel_selection,
+                       'alias_selection': alias_selection,
+                       'roulette_wheel_selection_without_replacement': roulette_wheel_selection_without_replacement,
+                       'tournament_selection': tournament_selection,
+                       'stochastic_universal_sampling': stochastic_universal_sampling}
@@ -1,7 +1,11 @@
 '''Module with functions for local search
 with permutations'''
 
-from typing import List, MutableSequence, Tuple
+from collections import deque
+from random import sample
+from numpy import append, argpartition, arange, asarray, flatnonzero, inf, ndarray
+from typing import Any, Callable, Iterator, List, MutableSequence, Sequence, Tuple
+from src.gen_algo_framework.genetic_algorithm import record_f_exec
 
 
 def in_place_reverse_segment(sequence: MutableSequence,
@@ -10,18 +14,40 @@ def in_place_reverse_segment(sequence: MutableSequence,
     '''Reverses a segment of a mutable sequence in place.
     This function reverses the order of the elements between
     the given indices, modifying the sequence directly
-    without creating a new one.
+    without creating a new one (works for lists and arrays).
     Args:
         sequence (MutableSequence): The sequence to be modified.
         start (int): The starting index of the segment to reverse.
         end (int): The ending index of the segment to reverse.
     '''
     assert 0 <= start < len(sequence) and 0 <= end < len(sequence)
-    i, j = start, end
-    while i < j:
-        sequence[i], sequence[j] = sequence[j], sequence[i]
-        i += 1
-        j -= 1
+    if start < end:
+        sequence[start:end + 1] = sequence[start:end + 1][::-1]
+
+
+def iter_2_opt_cut_points(sequence_len: int,
+                          randomized: bool = False) -> Iterator[Tuple[int, int]]:
+    '''
+    Lazily generates all possible cut points for the 2-opt neighborhood,
+    the pairs of indices (i, j) where 1 <= i < j < sequence_len, using
+    O(sequence_len) memory instead of materializing all the pairs.
+    Args:
+        sequence_len (int): The length of the sequence.
+        randomized (bool): If True the values of i are visited in random
+            order, and for each i the values of j in random order.
+    Yields:
+        Tuple[int, int]: The cut points.
+    '''
+    rows = range(1, sequence_len)
+    if randomized:
+        rows = sample(rows, len(rows))
+
+    for i in rows:
+        cols = range(i + 1, sequence_len)
+        if randomized:
+            cols = sample(cols, len(cols))
+        for j in cols:
+            yield i, j
 
 
 def generate_2_opt_cut_points(sequence_len: int):
@@ -39,20 +65,197 @@ def generate_2_opt_cut_points(sequence_len: int):
     Returns:
         List[Tuple[int, int]]: A list of tuples containing the cut points.
     '''
+    return list(iter_2_opt_cut_points(sequence_len))
+
+
+def two_opt_move_delta(sequence: Sequence,
+                       i: int,
+                       j: int,
+                       fst_elem: Any,
+                       edge_weight_f: Callable[[Tuple], float]) -> float:
+    '''
+    Computes the change in the cost of the cycle formed by fst_elem
+    followed by the sequence when the segment sequence[i..j] is
+    reversed (2-opt move). Only the four edges touched by the move
+    are used, so it runs in O(1) and assumes symmetric weights.
+    Args:
+        sequence (Sequence): The tour without its first element.
+        i (int): The starting index of the segment to reverse.
+        j (int): The ending index of the segment to reverse.
+        fst_elem (Any): The first element of the tour (fixed).
+        edge_weight_f (Callable[[Tuple], float]): Function that gives
+            the weight of an edge (u, v).
+    Returns:
+        float: The cost of the neighbor minus the cost of the tour.
+    '''
+    a = sequence[i - 1] if i > 0 else fst_elem
+    b = sequence[i]
+    c = sequence[j]
+    d = sequence[j + 1] if j + 1 < len(sequence) else fst_elem
+    return (edge_weight_f((a, c)) + edge_weight_f((b, d))
+            - edge_weight_f((a, b)) - edge_weight_f((c, d)))
+
+
+def in_place_move_segment(sequence: MutableSequence,
+                          start: int,
+                          seg_len: int,
+                          k: int,
+                          reverse: bool = False) -> None:
+    '''
+    Moves in place the segment sequence[start:start + seg_len] so that
+    it ends up right after the element at index k (k = -1 puts it at the
+    beginning), optionally reversed (Or-opt move).
+    Args:
+        sequence (MutableSequence): The sequence to be modified.
+        start (int): The starting index of the segment to move.
+        seg_len (int): The length of the segment.
+        k (int): Index of the element after which the segment is
+            inserted, outside of [start - 1, start + seg_len - 1].
+        reverse (bool): If True the segment is inserted reversed.
+    '''
+    end = start + seg_len - 1
+    assert -1 <= k < len(sequence) and not start - 1 <= k <= end
+    segment = list(sequence[start:end + 1])
+    if reverse:
+        segment.reverse()
+
+    if k > end:
+        sequence[start:k + 1] = list(sequence[end + 1:k + 1]) + segment
+    else:
+        sequence[k + 1:end + 1] = segment + list(sequence[k + 1:start])
+
+
+def iter_or_opt_moves(sequence_len: int,
+                      randomized: bool = False,
+                      reverse: bool = False,
+                      max_seg_len: int = 3,
+                      min_seg_len: int = 1) -> Iterator[Tuple[int, int, int, bool]]:
+    '''
+    Lazily generates the Or-opt moves: relocating a segment of min_seg_len
+    to max_seg_len consecutive elements between two other elements, each
+    neighbor is generated once. Moving a segment back past m elements
+    (k = start - 1 - m) gives the same sequence as moving those m elements
+    forward past the segment, so it is skipped when they form a segment
+    too. With reverse, moving a segment back by one element (k = start - 2)
+    is skipped, it gives the same sequence as moving the segment that
+    starts at that element forward by one.
+    Args:
+        sequence_len (int): The length of the sequence.
+        randomized (bool): If True the segments and the insertion points
+            are visited in random order.
+        reverse (bool): If True the segments are inserted reversed
+            (Or-3opt moves).
+        max_seg_len (int): The maximum length of the moved segments.
+        min_seg_len (int): The minimum length of the moved segments.
+    Yields:
+        Tuple[int, int, int, bool]: The moves as (start, seg_len, k, reverse),
+            see in_place_move_segment.
+    '''
+    segments = [(start, seg_len) for seg_len in range(min_seg_len, max_seg_len + 1)
+                if sequence_len - seg_len >= 2
+                for start in range(sequence_len - seg_len + 1)]
+    if randomized:
+        segments = sample(segments, len(segments))
+
+    if reverse:
+        skipped_back_moves = range(1, 2)
+    else: # lengths of the segments that can be moved forward instead
+        skipped_back_moves = range(min_seg_len, min(max_seg_len, sequence_len - 2) + 1)
+
+    for start, seg_len in segments:
+        insertion_points = range(-1, sequence_len)
+        if randomized:
+            insertion_points = sample(insertion_points, len(insertion_points))
+        for k in insertion_points:
+            if not start - 1 <= k <= start + seg_len - 1 and start - 1 - k not in skipped_back_moves:
+                yield start, seg_len, k, reverse
+
+
+def iter_or_3opt_moves(sequence_len: int,
+                       randomized: bool = False) -> Iterator[Tuple[int, int, int, bool]]:
+    '''
+    Lazily generates the Or-3opt moves: Or-opt moves where the relocated
+    segment is inserted reversed. A reversed single element is the same
+    element, so the segments have at least 2 elements (the moves of 1
+    element are Or-opt moves).
+    '''
+    return iter_or_opt_moves(sequence_len, randomized, True, min_seg_len=2)
+
+
+def or_opt_move_delta(sequence: Sequence,
+                      start: int,
+                      seg_len: int,
+                      k: int,
+                      reverse: bool,
+                      fst_elem: Any,
+                      edge_weight_f: Callable[[Tuple], float]) -> float:
+    '''
+    Computes in O(1) the change in the cost of the cycle formed by fst_elem
+    followed by the sequence when the segment sequence[start:start + seg_len]
+    is moved after the element at index k (see in_place_move_segment).
+    Assumes symmetric weights.
+    Returns:
+        float: The cost of the neighbor minus the cost of the tour.
+    '''
+    size = len(sequence)
+    prev_seg = sequence[start - 1] if start > 0 else fst_elem
+    seg_fst = sequence[start]
+    seg_last = sequence[start + seg_len - 1]
+    next_seg = sequence[start + seg_len] if start + seg_len < size else fst_elem
+    u = sequence[k] if k >= 0 else fst_elem
+    v = sequence[k + 1] if k + 1 < size else fst_elem
+
+    if reverse:
+        seg_fst, seg_last = seg_last, seg_fst
+
+    return (edge_weight_f((prev_seg, next_seg)) + edge_weight_f((u, seg_fst))
+            + edge_weight_f((seg_last, v)) - edge_weight_f((u, v))
+            - edge_weight_f((prev_seg, sequence[start]))
+            - edge_weight_f((sequence[start + seg_len - 1], next_seg)))
+
+
+__move_families = {'2_opt': (iter_2_opt_cut_points, two_opt_move_delta, in_place_reverse_segment),
+                   'or_opt': (iter_or_opt_moves, or_opt_move_delta, in_place_move_segment),
+                   'or_3opt': (iter_or_3opt_moves, or_opt_move_delta, in_place_move_segment)}
+
+
+def swap_move_delta(sequence: Sequence,
+                    i: int,
+                    j: int,
+                    fst_elem: Any,
+                    edge_weight_f: Callable[[Tuple], float]) -> float:
+    '''
+    Computes in O(1) the change in the cost of the cycle formed by fst_elem
+    followed by the sequence when the elements sequence[i] and sequence[j]
+    are swapped, i < j. Assumes symmetric weights.
+    Returns:
+        float: The cost of the neighbor minus the cost of the tour.
+    '''
+    size = len(sequence)
+    a, b = sequence[i], sequence[j]
+    prev_a = sequence[i - 1] if i > 0 else fst_elem
+    next_b = sequence[j + 1] if j + 1 < size else fst_elem
+
+    if j == i + 1: # adjacent, the edge (a, b) stays
+        return (edge_weight_f((prev_a, b)) + edge_weight_f((a, next_b))
+                - edge_weight_f((prev_a, a)) - edge_weight_f((b, next_b)))
 
-    cut_points: List[Tuple] = []
-    for i in range(1, sequence_len):
-        for j in range(i + 1, sequence_len):
-            cut_points.append((i, j))
-    return cut_points
+    next_a = sequence[i + 1]
+    prev_b = sequence[j - 1]
+    return (edge_weight_f((prev_a, b)) + edge_weight_f((b, next_a))
+            + edge_weight_f((prev_b, a)) + edge_weight_f((a, next_b))
+            - edge_weight_f((prev_a, a)) - edge_weight_f((a, next_a))
+            - edge_weight_f((prev_b, b)) - edge_weight_f((b, next_b)))
 
 
 def local_search_2_opt(initial_solution: MutableSequence,
                        options: dict,
                        inside_ga_execution: bool = False) -> float:
     '''
-    Performs local search to the given solution using the 2-opt neighborhood for TSP.
-    Modifies the given solution.
+    Performs local search to the given solution using the 2-opt neighborhood for TSP,
+    optionally chained with Or-opt neighborhoods (variable neighborhood descent).
+    Modifies the given solution. Stops early when no neighborhood improves the
+    solution (local optimum).
     Args:
         initial_solution (MutableSequence): The initial solution or tour
             (sequence of cities) to improve using the local search.
@@ -60,7 +263,26 @@ def local_search_2_opt(initial_solution: MutableSequence,
             - 'target_f' (Callable[[MutableSequence, dict], float]): The objective
               function that computes the quality (distance) of a tour.
             - 'local_s_iters' (int): The maximum number of iterations to perform
-              in the local search.
+              in the local search, each iteration scans one neighborhood.
+            - 'ls_delta_eval' (bool): Optional, if True each move is scored
+              in O(1) with the edges it changes ('edge_weight_f' and
+              'fst_city' are then needed) and the segment is only reversed
+              when the move is accepted. Each scored move still counts as
+              one target function execution.
+            - 'ls_scan' (str): Optional, how each iteration scans the
+              neighborhood: 'sweep' (default) applies every improving move
+              found during the scan, 'first' applies the first improving
+              move and ends the iteration, 'best' applies the best move of
+              the whole neighborhood.
+            - 'ls_random_order' (bool): Optional, if True the neighborhood
+              is scanned in random order.
+            - 'ls_moves' (List[str]): Optional, the neighborhoods to chain,
+              any of '2_opt' (default ['2_opt']), 'or_opt' (relocation of
+              segments of 1 to 3 elements) and 'or_3opt' (same, inserting
+              the segment reversed). After an iteration that improves the
+              solution the search goes back to the first neighborhood,
+              otherwise it moves on to the next one. The Or-opt
+              neighborhoods always use delta evaluation.
         inside_ga_execution (bool): Flag to indicate that the function is being used
             inside a genetic algorithm execution.
     Returns:
@@ -68,25 +290,294 @@ def local_search_2_opt(initial_solution: MutableSequence,
     '''
     f = options['target_f']
     iterations = options['local_s_iters']
+    scan = options.get('ls_scan', 'sweep')
+    randomized = options.get('ls_random_order', False)
+    neighborhoods = options.get('ls_moves', ['2_opt'])
+    assert scan in ('sweep', 'first', 'best'), f'Unknown scan: {scan}'
+
+    delta_eval = options.get('ls_delta_eval', False)
+    if delta_eval or neighborhoods != ['2_opt']:
+        edge_weight_f = options['edge_weight_f']
+        fst_city = options['fst_city']
 
     x = initial_solution
     best_f_x = f(x, options, inside_ga_execution)
-    cut_points = generate_2_opt_cut_points(len(x))
+    current_neighborhood = 0
 
     for _ in range(iterations):
-        #iter_best_f_x = best_f_x
+        iter_best_f_x = best_f_x
+        best_move, best_move_f = None, best_f_x
+        neighborhood = neighborhoods[current_neighborhood]
+        gen_moves, move_delta, apply_move = __move_families[neighborhood]
+        move_delta_eval = delta_eval or neighborhood != '2_opt'
 
-        for i, j in cut_points: # iterating through neighborhood
+        for move in gen_moves(len(x), randomized): # iterating through neighborhood
 
-            in_place_reverse_segment(x, i, j) # compute neighbor using x
-            f_neighbor_x = f(x, options, inside_ga_execution)
+            if move_delta_eval:
+                f_neighbor_x = best_f_x + move_delta(x, *move, fst_city, edge_weight_f)
+                if inside_ga_execution:
+                    record_f_exec(f_neighbor_x, x, options)
+            else:
+                in_place_reverse_segment(x, *move) # compute neighbor using x
+                f_neighbor_x = f(x, options, inside_ga_execution)
+                if scan == 'best' or f_neighbor_x >= best_f_x: # an accepted neighbor stays in x
+                    in_place_reverse_segment(x, *move) # recompute x
 
-            if f_neighbor_x < best_f_x:
+            if scan == 'best':
+                if f_neighbor_x < best_move_f:
+                    best_move, best_move_f = move, f_neighbor_x
+            elif f_neighbor_x < best_f_x:
+                if move_delta_eval:
+                    apply_move(x, *move) # move accepted
                 best_f_x = f_neighbor_x
-            else: # not better neighbor
-                in_place_reverse_segment(x, i, j) # recompute x
+                if scan == 'first':
+                    break
 
-        #if iter_best_f_x == best_f_x: # local optima
-        #    break
+        if best_move is not None:
+            apply_move(x, *best_move)
+            best_f_x = best_move_f
+
+        if iter_best_f_x == best_f_x: # no improvement, next neighborhood
+            current_neighborhood += 1
+            if current_neighborhood == len(neighborhoods): # local optima
+                break
+        else:
+            current_neighborhood = 0
 
     return best_f_x
+
+
+def __reverse_cyclic_segment(tour: List, positions: List[int], i: int, j: int) -> None:
+    '''
+    Reverses the cyclic segment tour[i..j] (going forward from i, possibly
+    wrapping around), or its complement when it is shorter, both give the
+    same cycle. Keeps the positions of the elements up to date.
+    '''
+    size = len(tour)
+    length = (j - i) % size + 1
+    if 2 * length > size: # reverse the complement
+        i, j = (j + 1) % size, (i - 1) % size
+        length = size - length
+
+    for _ in range(length // 2):
+        u, v = tour[i], tour[j]
+        tour[i], tour[j] = v, u
+        positions[v], positions[u] = i, j
+        i = (i + 1) % size
+        j = (j - 1) % size
+
+
+def local_search_2_opt_neighbor_lists(initial_solution: MutableSequence,
+                                      options: dict,
+                                      inside_ga_execution: bool = False) -> float:
+    '''
+    Performs 2-opt local search to the given solution trying only the
+    moves whose new edge joins a city with one of its nearest neighbors,
+    and using don't-look bits: only the cities that are active (initially
+    all of them, later the endpoints of the applied moves) are examined.
+    The elements of the solution must be the integer ids of the cities.
+    Modifies the given solution.
+    Args:
+        initial_solution (MutableSequence): The initial tour (sequence of
+            city ids) to improve, without the first city.
+        options (dict): A dictionary containing the following keys:
+            - 'target_f' (Callable[[MutableSequence, dict], float]): The objective
+              function that computes the quality (distance) of a tour.
+            - 'local_s_iters' (int): The maximum number of sweeps, each sweep
+              examines as many active cities as there are in the tour.
+            - 'edge_weight_f' (Callable[[Tuple], float]): Weight of an edge.
+            - 'fst_city' (int): Id of the first city in the tour.
+            - 'neighbor_lists' (ndarray): Ids of the nearest neighbors of
+              each city, sorted by increasing distance.
+        inside_ga_execution (bool): Flag to indicate that the function is being used
+            inside a genetic algorithm execution.
+    Returns:
+        float: The fitness of the best tour found during the local search.
+    '''
+    f = options['target_f']
+    iterations = options['local_s_iters']
+    edge_weight_f = options['edge_weight_f']
+    fst_city = options['fst_city']
+    neighbor_lists = options['neighbor_lists'].tolist()
+
+    x = initial_solution
+    best_f_x = f(x, options, inside_ga_execution)
+
+    tour = [fst_city] + [int(city) for city in x]
+    size = len(tour)
+    positions = [0] * len(neighbor_lists)
+    for i, city in enumerate(tour):
+        positions[city] = i
+
+    active = deque(tour)
+    is_active = [False] * len(neighbor_lists)
+    for city in tour:
+        is_active[city] = True
+
+    max_examined = iterations * size
+    examined = 0
+    while active and examined < max_examined:
+        a = active.popleft()
+        is_active[a] = False
+        examined += 1
+
+        for step in (1, -1): # successor and predecessor directions
+            pos_a = positions[a]
+            b = tour[(pos_a + step) % size]
+            w_ab = edge_weight_f((a, b))
+            applied = False
+
+            for c in neighbor_lists[a]:
+                w_ac = edge_weight_f((a, c))
+                if w_ac >= w_ab: # no gain possible with farther neighbors
+                    break
+                pos_c = positions[c]
+                d = tour[(pos_c + step) % size]
+                if c == b or d == a:
+                    continue
+
+                f_neighbor_x = best_f_x + w_ac + edge_weight_f((b, d)) \
+                    - w_ab - edge_weight_f((c, d))
+
+                if f_neighbor_x < best_f_x:
+                    if step == 1:
+                        __reverse_cyclic_segment(tour, positions, (pos_a + 1) % size, pos_c)
+                    else:
+                        __reverse_cyclic_segment(tour, positions, pos_a, (pos_c - 1) % size)
+                    best_f_x = f_neighbor_x
+                    for city in (a, b, c, d):
+                        if not is_active[city]:
+                            is_active[city] = True
+                            active.append(city)
+                    applied = True
+
+                if inside_ga_execution:
+                    record_f_exec(f_neighbor_x, x, options)
+                if applied:
+                    break
+            if applied:
+                break
+
+    fst_pos = positions[fst_city]
+    x[:] = tour[fst_pos + 1:] + tour[:fst_pos]
+    return best_f_x
+
+
+def two_opt_neighborhood_deltas(tour: ndarray,
+                                fst_city: int,
+                                dist_matrix: ndarray) -> ndarray:
+    '''
+    Computes with a single NumPy broadcast the change in cost of every
+    2-opt move (i, j), 1 <= i < j < len(tour), of the given tour of city
+    ids (without its first city).
+    Args:
+        tour (ndarray): The tour as an integer array.
+        fst_city (int): Id of the first city in the tour.
+        dist_matrix (ndarray): Distances between cities, indexed by id.
+    Returns:
+        ndarray: A (n - 1, n - 1) matrix, where n = len(tour), the entry
+            [i - 1, j - 1] has the delta of the move (i, j), the entries
+            that do not correspond to a move are inf.
+    '''
+    a = tour[:-1]                        # tour[i - 1]
+    b = tour[1:]                         # tour[i]
+    c = tour[1:]                         # tour[j]
+    d = append(tour[2:], fst_city)       # tour[j + 1]
+
+    deltas = dist_matrix[a[:, None], c[None, :]]
+    deltas += dist_matrix[b[:, None], d[None, :]]
+    deltas -= dist_matrix[a, b][:, None]
+    deltas -= dist_matrix[c, d][None, :]
+
+    indexes = arange(len(a))
+    deltas[indexes[:, None] >= indexes[None, :]] = inf # j <= i are not moves
+    return deltas
+
+
+def __non_overlapping_moves(deltas: ndarray, max_candidates: int) -> list:
+    '''
+    Greedily picks, from the most improving moves, a set of 2-opt moves
+    that do not share edges, so their deltas can be added up.
+    Returns:
+        list: The picked moves (i, j) with their deltas.
+    '''
+    flat_deltas = deltas.ravel()
+    improving = flatnonzero(flat_deltas < 0)
+    if len(improving) > max_candidates:
+        best = argpartition(flat_deltas[improving], max_candidates)[:max_candidates]
+        improving = improving[best]
+    improving = improving[flat_deltas[improving].argsort(kind='stable')]
+
+    size = deltas.shape[1]
+    picked: list = []
+    for index in improving.tolist():
+        i, j = index // size + 1, index % size + 1
+        if all(j + 2 <= p or q + 2 <= i for p, q, _ in picked):
+            picked.append((i, j, flat_deltas[index]))
+    return picked
+
+
+def local_search_2_opt_vectorized(initial_solution: MutableSequence,
+                                  options: dict,
+                                  inside_ga_execution: bool = False) -> float:
+    '''
+    Performs best-improvement 2-opt local search computing the deltas of
+    the whole neighborhood at array speed on each sweep. The elements of
+    the solution must be the integer ids of the cities. Modifies the given
+    solution. Stops early when a sweep does not improve the solution.
+    Args:
+        initial_solution (MutableSequence): The initial tour (sequence of
+            city ids) to improve, without the first city.
+        options (dict): A dictionary containing the following keys:
+            - 'target_f' (Callable[[MutableSequence, dict], float]): The objective
+              function that computes the quality (distance) of a tour.
+            - 'local_s_iters' (int): The maximum number of sweeps.
+            - 'fst_city' (int): Id of the first city in the tour.
+            - 'dist_matrix' (ndarray): Distances between cities, indexed by id.
+            - 'ls_apply' (str): Optional, 'best' (default) applies the best
+              move of each sweep, 'non_overlapping' applies a set of
+              improving moves that do not share edges.
+        inside_ga_execution (bool): Flag to indicate that the function is being used
+            inside a genetic algorithm execution.
+    Returns:
+        float: The fitness of the best tour found during the local search.
+    '''
+    f = options['target_f']
+    iterations = options['local_s_iters']
+    fst_city = options['fst_city']
+    dist_matrix = options['dist_matrix']
+    apply_all = options.get('ls_apply', 'best') == 'non_overlapping'
+
+    x = initial_solution
+    best_f_x = f(x, options, inside_ga_execution)
+    tour = asarray(x)
+    n_moves = (len(tour) - 1) * (len(tour) - 2) // 2
+
+    for _ in range(iterations):
+        deltas = two_opt_neighborhood_deltas(tour, fst_city, dist_matrix)
+
+        if apply_all:
+            moves = __non_overlapping_moves(deltas, len(tour))
+        else:
+            index = int(deltas.argmin())
+            size = deltas.shape[1]
+            moves = [(index // size + 1, index % size + 1, deltas.flat[index])]
+
+        moves = [(i, j, delta) for i, j, delta in moves if best_f_x + delta < best_f_x]
+        for i, j, delta in moves:
+            in_place_reverse_segment(x, i, j)
+            best_f_x += delta
+        tour = asarray(x)
+
+        if inside_ga_execution:
+            record_f_exec(best_f_x, x, options, n_moves)
+
+        if not moves: # local optima
+            break
+
+    return float(best_f_x)
+
+
+all_local_search_funcs = {'2_opt': local_search_2_opt,
+                          '2_opt_neighbor_lists': local_search_2_opt_neighbor_lists,
+                          '2_opt_vectorized': local_search_2_opt_vectorized}
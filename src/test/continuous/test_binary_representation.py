@@ -1,7 +1,12 @@
 from random import randint, uniform
 from math import isclose
+from numpy import arange, uint64
 
-from src.continuous.binary_representation import decode_vector, encode_vector, generate_random_bit_vector
+from src.continuous.binary_representation import decode, decode_vector, encode_vector, generate_random_bit_vector
+from src.continuous.binary_representation import bit_vector_key, pack_bit_vector, unpack_bit_vector
+from src.continuous.binary_representation import binary_to_gray, gray_to_binary, decode_table, MAX_DECODE_TABLE_BITS
+from src.continuous.binary_representation import decode_population, decode_packed_vector, encode_packed_vector, generate_random_packed_bit_vector
+from src.gen_algo_framework.diversity import hamming_distance, packed_hamming_distance
 
 
 def test_encode_decode_vector():
@@ -44,3 +49,82 @@ def test_generate_random_bit_vector():
 
         for original, decoded in zip(real_val_vec, re_decoded):
             assert isclose(original, decoded, abs_tol=1e-5), f'{original}, {decoded} are not similar'
+
+
+def test_bit_vector_key():
+    for _ in range(1000):
+        v_n_bits = [randint(1, 30) for _ in range(randint(1, 10))]
+        bits = generate_random_bit_vector(v_n_bits)
+        flipped = bits.copy()
+        flipped[randint(0, len(bits) - 1)] ^= 1
+        assert bit_vector_key(bits) == bit_vector_key(bits.copy())
+        assert bit_vector_key(bits) != bit_vector_key(flipped)
+
+
+def test_packed_bit_vectors():
+    for _ in range(1000):
+        v_n_bits = [randint(1, 30) for _ in range(randint(1, 10))]
+        v_intervals = [(-500.0, 500.0) for _ in v_n_bits]
+        n_bits = sum(v_n_bits)
+        bits = generate_random_bit_vector(v_n_bits)
+        packed = pack_bit_vector(bits)
+        assert len(packed) == (n_bits + 7) // 8
+        assert unpack_bit_vector(packed, n_bits) == bits
+        assert decode_packed_vector(packed, v_n_bits, v_intervals) == decode_vector(bits, v_n_bits, v_intervals)
+
+        vector = [uniform(-500.0, 500.0) for _ in v_n_bits]
+        assert (encode_packed_vector(vector, v_n_bits, v_intervals) ==
+                pack_bit_vector(encode_vector(vector, v_n_bits, v_intervals))).all()
+
+        other = generate_random_packed_bit_vector(v_n_bits)
+        assert len(other) == len(packed)
+        assert (pack_bit_vector(unpack_bit_vector(other, n_bits)) == other).all() # padding bits are 0
+        assert packed_hamming_distance(packed, other) == hamming_distance(bits, unpack_bit_vector(other, n_bits))
+
+
+def test_decode_population():
+    for _ in range(200):
+        dimension = randint(1, 10)
+        if randint(0, 1):
+            v_n_bits = [randint(1, 64)] * dimension
+        else:
+            v_n_bits = [randint(1, 30) for _ in range(dimension)]
+        v_intervals = [(uniform(-500.0, 0.0), uniform(1.0, 500.0)) for _ in range(dimension)]
+        population = [generate_random_bit_vector(v_n_bits) for _ in range(randint(1, 30))]
+        expected = [decode_vector(bits, v_n_bits, v_intervals) for bits in population]
+
+        decoded = decode_population(population, v_n_bits, v_intervals)
+        gray_expected = [decode_vector(bits, v_n_bits, v_intervals, gray=True) for bits in population]
+        assert decode_population(population, v_n_bits, v_intervals, gray=True).tolist() == gray_expected
+        assert decoded.shape == (len(population), dimension)
+        assert decoded.tolist() == expected
+        packed = [pack_bit_vector(bits) for bits in population]
+        assert decode_population(packed, v_n_bits, v_intervals, packed=True).tolist() == expected
+
+
+def test_gray_code():
+    for n in range(2**12):
+        assert gray_to_binary(binary_to_gray(n)) == n
+        assert bin(binary_to_gray(n) ^ binary_to_gray(n + 1)).count('1') == 1
+    integers = arange(2**16, dtype=uint64) * 977
+    assert gray_to_binary(integers ^ (integers >> 1)).tolist() == integers.tolist()
+    assert gray_to_binary(binary_to_gray(2**100 + 12345)) == 2**100 + 12345
+
+    for _ in range(200):
+        v_n_bits = [randint(1, 30) for _ in range(randint(1, 10))]
+        v_intervals = [(-500.0, 500.0) for _ in v_n_bits]
+        vector = [uniform(-500.0, 500.0) for _ in v_n_bits]
+        encoded = encode_vector(vector, v_n_bits, v_intervals, gray=True)
+        assert decode_vector(encoded, v_n_bits, v_intervals, gray=True) == \
+            decode_vector(encode_vector(vector, v_n_bits, v_intervals), v_n_bits, v_intervals)
+
+
+def test_decode_table():
+    for gray in (False, True):
+        for n_bits in (1, 5, MAX_DECODE_TABLE_BITS):
+            table = decode_table(n_bits, -5.12, 5.12, gray)
+            assert table is decode_table(n_bits, -5.12, 5.12, gray) # built once
+            assert len(table) == 2**n_bits and not table.flags.writeable
+            for n in range(0, 2**n_bits, max(2**n_bits // 100, 1)):
+                bits = [(n >> i) & 1 for i in range(n_bits)]
+                assert table[n] == decode(bits, n_bits, -5.12, 5.12, gray=gray)
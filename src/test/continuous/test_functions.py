@@ -0,0 +1,179 @@
+from random import randint, uniform
+from collections import OrderedDict
+from math import isclose
+from numpy import array
+from src.continuous.binary_representation import generate_random_bit_vector, generate_random_packed_bit_vector, decode_vector
+from src.continuous.functions import all_funcs, all_batch_funcs, batch_function, compute_vectors_fitness
+from src.continuous.functions import all_coordinate_terms, bit_flip_mutation_with_delta, coordinate_term
+from src.continuous.functions import all_coordinate_accumulators, coordinate_accumulators, simple_c_f_options_handler
+from src.gen_algo_framework.crossover import gen_n_points, n_points_crossover_parents, packed_n_points_crossover
+from src.gen_algo_framework.genetic_algorithm import generation_step
+from src.gen_algo_framework.mutation import bit_flip_mutation, packed_bit_flip_mutation
+from src.gen_algo_framework.replacement import full_generational_replacement, replacement_of_the_worst
+from src.gen_algo_framework.selection import roulette_wheel_selection
+from src.gen_algo_framework.genetic_algorithm import new_fitness_cache
+from src.continuous.binary_representation import bit_vector_key, decode_population, pack_bit_vector
+
+
+def test_batch_funcs_parity():
+    assert all_batch_funcs.keys() == all_funcs.keys()
+    for name, f in all_funcs.items():
+        batch_f = all_batch_funcs[name]
+        assert batch_function(f) is batch_f
+        for _ in range(50):
+            dimension = 2 if name == 'easom' else randint(1, 20)
+            bound = uniform(0.5, 10.0)
+            x = [[uniform(-bound, bound) for _ in range(dimension)] for _ in range(randint(1, 30))]
+            values = batch_f(array(x))
+            assert values.shape == (len(x),)
+            for x_i, value in zip(x, values.tolist()):
+                assert isclose(value, f(x_i), rel_tol=1e-9, abs_tol=1e-9), f'{name}: {value}, {f(x_i)}'
+    assert batch_function(lambda x: 0.0) is None
+
+
+def test_compute_vectors_fitness():
+    v_n_bits = [16] * 5
+    v_intervals = [(-5.12, 5.12)] * 5
+    for name, f in all_funcs.items():
+        if name == 'easom':
+            continue
+        population = [generate_random_bit_vector(v_n_bits) for _ in range(40)]
+        population += population[:10] # repeated vectors
+        expected = [f(decode_vector(bits, v_n_bits, v_intervals)) for bits in population]
+        for batch_f in (None, all_batch_funcs[name]):
+            for cache in (None, new_fitness_cache(50, bit_vector_key)):
+                evaluated_rows = []
+                def counted_batch_f(x):
+                    evaluated_rows.append(len(x))
+                    return batch_f(x) # pyright: ignore
+                options = {'f': f, 'batch_f': batch_f and counted_batch_f, 'v_n_bits': v_n_bits,
+                           'v_intervals': v_intervals, 'current_best': (float('inf'), None), 'fitness_cache': cache}
+                evaluated = compute_vectors_fitness(list(population), options)
+                for (fitness, bits), expected_fitness, original in zip(evaluated, expected, population):
+                    assert bits is original
+                    assert isclose(fitness, expected_fitness, rel_tol=1e-9, abs_tol=1e-9)
+                assert options['gen_fittest_fitness'] == min(fitness for fitness, _ in evaluated)
+                if cache is not None:
+                    assert cache['hits'] == 10 and cache['misses'] == 40
+                    assert all(entry[1] is None for entry in cache['entries'].values()) # (fitness, genome)
+                    if batch_f is not None: # the repeated vectors are not evaluated
+                        assert evaluated_rows == [40]
+
+
+def test_bit_flip_mutation_with_delta():
+    for name, term in all_coordinate_terms.items():
+        f = all_funcs[name]
+        assert coordinate_term(f) is term
+        for packed, gray in ((False, False), (False, True), (True, False), (True, True)):
+            dimension = randint(1, 30)
+            v_n_bits = [randint(1, 20) for _ in range(dimension)]
+            v_intervals = [(-3.0, 3.0)] * dimension
+            options = {'coordinate_term': term, 'v_n_bits': v_n_bits, 'v_intervals': v_intervals,
+                       'packed_genomes': packed, 'gray_code': gray}
+            bits = generate_random_bit_vector(v_n_bits)
+            individual = pack_bit_vector(bits) if packed else bits
+            fitness = f(decode_population([individual], v_n_bits, v_intervals, packed, gray)[0].tolist())
+            for _ in range(100):
+                individual, delta = bit_flip_mutation_with_delta(individual, options)
+                fitness += delta
+                expected = f(decode_population([individual], v_n_bits, v_intervals, packed, gray)[0].tolist())
+                assert isclose(fitness, expected, rel_tol=1e-7, abs_tol=1e-7)
+    assert coordinate_term(all_funcs['ackley']) is None
+
+
+def test_bit_flip_mutation_with_accumulators():
+    for name, accumulators in all_coordinate_accumulators.items():
+        f = all_funcs[name]
+        assert coordinate_accumulators(f) is accumulators and coordinate_term(f) is None
+        assert isclose(accumulators[2](accumulators[0]([0.5, -1.5, 2.0])), f([0.5, -1.5, 2.0]))
+        for packed, gray in ((False, False), (False, True), (True, False), (True, True)):
+            dimension = randint(1, 30)
+            v_n_bits = [randint(1, 20) for _ in range(dimension)]
+            v_intervals = [(-3.0, 3.0)] * dimension
+            options = {'coordinate_accumulators': accumulators, 'accumulators_table': OrderedDict(),
+                       'accumulators_table_size': 10, 'v_n_bits': v_n_bits, 'v_intervals': v_intervals,
+                       'packed_genomes': packed, 'gray_code': gray}
+            bits = generate_random_bit_vector(v_n_bits)
+            individual = pack_bit_vector(bits) if packed else bits
+            fitness = f(decode_population([individual], v_n_bits, v_intervals, packed, gray)[0].tolist())
+            for _ in range(100):
+                individual, delta = bit_flip_mutation_with_delta(individual, options)
+                fitness += delta
+                expected = f(decode_population([individual], v_n_bits, v_intervals, packed, gray)[0].tolist())
+                assert isclose(fitness, expected, rel_tol=1e-7, abs_tol=1e-7)
+            assert len(options['accumulators_table']) <= 10
+    assert coordinate_accumulators(all_funcs['sphere']) is None
+
+
+def test_options_handler_crossover_proba():
+    v_n_bits = [10] * 4
+    v_intervals = [(-5.12, 5.12)] * 4
+    population = [generate_random_bit_vector(v_n_bits) for _ in range(20)]
+    options = simple_c_f_options_handler(population, {}, True, 20, 20, 0.5, all_funcs['sphere'], 1, v_n_bits,
+                                         v_intervals, crossover_proba=0.5)
+    assert options['crossover_proba'] == 0.5
+    assert options['mutation_deltas'][bit_flip_mutation] is bit_flip_mutation_with_delta
+    assert packed_bit_flip_mutation(40) not in options['mutation_deltas'] # only with packed genomes
+
+    evaluated = []
+    def fitness_f(bits, options, _):
+        evaluated.append(bits)
+        return all_funcs['sphere'](decode_vector(bits, options['v_n_bits'], options['v_intervals']))
+
+    def crossover(parent1, parent2, options):
+        return n_points_crossover_parents(parent1, parent2, gen_n_points(options['n_points'], len(parent1[1])))
+
+    for _ in range(10):
+        population = generation_step(population, roulette_wheel_selection, crossover, bit_flip_mutation, fitness_f,
+                                     full_generational_replacement, simple_c_f_options_handler, options)
+        for fitness, bits in population: # copies of the parents and their mutants scored without evaluations
+            assert isclose(fitness, all_funcs['sphere'](decode_vector(bits, v_n_bits, v_intervals)), abs_tol=1e-7)
+    assert len(evaluated) < 10 * 20
+    population = [generate_random_bit_vector([20, 20]) for _ in range(5)]
+    assert simple_c_f_options_handler(population, {}, True, f=all_funcs['ackley']).get('mutation_deltas') is None
+
+
+def test_options_handler_packed_genomes():
+    v_n_bits = [10] * 4
+    v_intervals = [(-5.12, 5.12)] * 4
+    population = [generate_random_packed_bit_vector(v_n_bits) for _ in range(20)]
+    options = simple_c_f_options_handler(population, {}, True, 20, 20, 0.5, all_funcs['rastrigin'], 2, v_n_bits,
+                                         v_intervals, packed_genomes=True, crossover_proba=0.5)
+    assert list(options['mutation_deltas']) == [packed_bit_flip_mutation(sum(v_n_bits))]
+
+    def fitness_f(bits, options, _):
+        return all_funcs['rastrigin'](decode_population([bits], v_n_bits, v_intervals, True)[0].tolist())
+
+    for _ in range(10):
+        population = generation_step(population, roulette_wheel_selection, packed_n_points_crossover,
+                                     packed_bit_flip_mutation(sum(v_n_bits)), fitness_f,
+                                     full_generational_replacement, simple_c_f_options_handler, options)
+        for fitness, bits in population:
+            assert isclose(fitness, fitness_f(bits, options, True), rel_tol=1e-7, abs_tol=1e-7)
+
+
+def test_genetic_algorithm_crossover_proba():
+    v_n_bits = [12] * 6
+    v_intervals = [(-5.12, 5.12)] * 6
+
+    def fitness_f(bits, options, _):
+        return options['f'](decode_population([bits], v_n_bits, v_intervals)[0].tolist())
+
+    def crossover(parent1, parent2, options):
+        return n_points_crossover_parents(parent1, parent2, gen_n_points(options['n_points'], len(parent1[1])))
+
+    for name in ('sphere', 'rastrigin', 'griewank', 'zakharov'):
+        for deltas_between_evaluations in (1, 7, 100):
+            population = [generate_random_bit_vector(v_n_bits) for _ in range(20)]
+            options = simple_c_f_options_handler(population, {'deltas_between_evaluations': deltas_between_evaluations},
+                                                 True, 20, 20, 0.5, all_funcs[name], 1, v_n_bits, v_intervals,
+                                                 crossover_proba=0.3)
+            for _ in range(30):
+                population = generation_step(population, roulette_wheel_selection, crossover, bit_flip_mutation,
+                                             fitness_f, replacement_of_the_worst, simple_c_f_options_handler, options)
+            assert options['deltas_count'] > 0
+            if name in all_coordinate_accumulators: # only filled by the changes
+                assert bool(options['accumulators_table']) == (deltas_between_evaluations > 1)
+            # the stored fitness, also of mutants scored by the changes, is that of a full evaluation
+            for fitness, bits in population + [options['current_best']]:
+                assert isclose(fitness, fitness_f(bits, options, False), rel_tol=1e-9, abs_tol=1e-9)
@@ -1,9 +1,10 @@
-from random import randint, sample
+from random import getstate, randint, sample, setstate
 from typing import Set, Tuple, List
 from src.gen_algo_framework.crossover import gen_n_points, n_points_crossover_parents, population_n_points_crossover_roulettew_s
-from src.gen_algo_framework.crossover import __full_random_subintervals, order_crossover_ox1
+from src.gen_algo_framework.crossover import __full_random_subintervals, order_crossover_ox1, packed_n_points_crossover
+from src.continuous.binary_representation import pack_bit_vector, unpack_bit_vector
 from src.gen_algo_framework.genetic_algorithm import population_crossover
-from src.gen_algo_framework.population_utils import generate_population_of_permutations
+from src.gen_algo_framework.population_utils import generate_population_of_permutations, generate_population_of_int_permutations
 from src.gen_algo_framework.selection import cumulative_fitness
 
 
@@ -64,6 +65,47 @@ def test_population_crossover():
                 assert child != adult
 
 
+def test_population_crossover_proba():
+    for crossover_proba in [0, 0.5]:
+        genes = set(sample(range(100), 50))
+        population = generate_population_of_permutations(20, genes)
+        population = list(map(lambda x : (float(sum(x[:5])), x), population))
+        indexes_selected_parents = list(zip(sample(range(20), 10), sample(range(20), 10)))
+        options = {'crossover_proba': crossover_proba}
+        new_gen = population_crossover(population, indexes_selected_parents, 20, order_crossover_ox1, options)
+
+        copies = 0
+        for child, known_fitness, (i, j) in zip(new_gen, options['offspring_fitness'],
+                                               [couple for couple in indexes_selected_parents for _ in range(2)]):
+            if known_fitness is None:
+                continue
+            copies += 1
+            assert child in (population[i][1], population[j][1])
+            assert child is not population[i][1] and child is not population[j][1]
+            assert known_fitness == float(sum(child[:5]))
+
+        if crossover_proba == 0:
+            assert copies == 20
+
+
+def test_population_crossover_identical_parents():
+    genes = set(sample(range(100), 50))
+    population = generate_population_of_permutations(20, genes)
+    population = list(map(lambda x : (float(sum(x[:5])), x), population))
+    for _ in range(100):
+        i, j = randint(0, 19), randint(0, 19)
+        options = {}
+        new_gen = population_crossover(population, [(i, i), (i, j)], 4, order_crossover_ox1, options)
+        known = options['offspring_fitness']
+        assert new_gen[0] == population[i][1] and known[0] == population[i][0]
+        assert new_gen[1] == population[i][1] and known[1] == population[i][0]
+        for child, known_fitness in zip(new_gen[2:], known[2:]):
+            if child in (population[i][1], population[j][1]):
+                assert known_fitness == float(sum(child[:5]))
+            else:
+                assert known_fitness is None
+
+
 def test_gen_n_points():
     for _ in range(10000):
         size = randint(11, 30)
@@ -107,6 +149,25 @@ def test_n_points_crossover_parents():
                 assert b_c2 == b_p1
 
 
+def test_packed_n_points_crossover():
+    for _ in range(1000):
+        v_n_bits = [randint(1, 20) for _ in range(randint(1, 5))]
+        n_bits = sum(v_n_bits)
+        if n_bits < 2:
+            continue
+        p1 = [randint(0, 1) for _ in range(n_bits)]
+        p2 = [randint(0, 1) for _ in range(n_bits)]
+        options = {'v_n_bits': v_n_bits, 'n_points': randint(1, n_bits - 1)}
+
+        state = getstate()
+        c1, c2 = packed_n_points_crossover((None, pack_bit_vector(p1)), (None, pack_bit_vector(p2)), options)
+        setstate(state) # same points
+        expected = n_points_crossover_parents((None, p1), (None, p2), gen_n_points(options['n_points'], n_bits))
+        assert unpack_bit_vector(c1, n_bits) == expected[0]
+        assert unpack_bit_vector(c2, n_bits) == expected[1]
+        assert (pack_bit_vector(expected[0]) == c1).all()
+
+
 def test_population_n_points_crossover_roulettew_s():
     for _ in range(250):
         individual_size = randint(5, 10)
@@ -127,3 +188,16 @@ def test_population_n_points_crossover_roulettew_s():
 
         assert population_size - 200 < mixed_children
         assert mixed_children < population_size + 200
+
+
+def test_order_crossover_ox1_int_arrays():
+    for _ in range(500):
+        population = generate_population_of_int_permutations(2, range(1, 42))
+        p1, p2 = population
+        child1, child2 = order_crossover_ox1((0, p1), (0, p2), None)
+        assert child1.dtype == p1.dtype and child2.dtype == p1.dtype
+        assert set(child1.tolist()) == set(range(1, 42))
+        assert set(child2.tolist()) == set(range(1, 42))
+
+        for gen_p1, gen_c1, gen_c2 in zip(p1, child1, child2):
+            assert gen_p1 == gen_c1 or gen_p1 == gen_c2
@@ -0,0 +1,86 @@
+from math import atan2, inf, isclose
+from random import Random, randint
+from src.gen_algo_framework.crossover import order_crossover_ox1
+from src.gen_algo_framework.genetic_algorithm import population_fitness_computing
+from numpy import array, intp
+from src.gen_algo_framework.island_model import island_model_ga, migration_destinations, receive_migrants
+from src.gen_algo_framework.island_model import merge_islands_history
+from src.gen_algo_framework.mutation import swap_mutation
+from src.gen_algo_framework.population_utils import generate_population_of_int_permutations
+from src.gen_algo_framework.replacement import replacement_of_the_worst
+from src.gen_algo_framework.selection import tournament_selection
+from src.tsp.euclidean_tsp import simple_euc_tsp_options_handler, tour_distance
+from src.utils.input_output import parse_tsp_data, read_file
+
+
+def test_migration_destinations():
+    rng = Random(0)
+    for _ in range(100):
+        n_islands = randint(2, 10)
+        assert migration_destinations('ring', n_islands, rng) == [[(i + 1) % n_islands] for i in range(n_islands)]
+        for i, destinations in enumerate(migration_destinations('fully_connected', n_islands, rng)):
+            assert sorted(destinations + [i]) == list(range(n_islands))
+        for i, destinations in enumerate(migration_destinations('random', n_islands, rng)):
+            assert len(destinations) == 1 and destinations[0] != i and 0 <= destinations[0] < n_islands
+
+
+def test_receive_migrants():
+    for _ in range(100):
+        population = [(float(randint(1, 100)), None) for _ in range(randint(2, 30))]
+        migrants = [(0.0, 'migrant') for _ in range(randint(1, len(population)))]
+        expected = sorted(fitness for fitness, _ in population)[:len(population) - len(migrants)]
+        population = receive_migrants(population, migrants)
+        assert sum(genome == 'migrant' for _, genome in population) == len(migrants)
+        assert sorted(fitness for fitness, genome in population if genome is None) == expected
+
+
+def test_island_model_ga():
+    berlin52 = parse_tsp_data(read_file('instances/euc_TSP/berlin52.tsp'), 'matrix')
+    berlin52.update({'pop_size': 20, 'gens': 15, 'local_s_iters': 0, 'max_records': 100,
+                     'mutation_proba': 0.1, 'selection': 'tournament_selection'})
+    populations = [generate_population_of_int_permutations(20, berlin52['rest_of_cities']) for _ in range(3)]
+    berlin52 = simple_euc_tsp_options_handler(populations[0], berlin52, True)
+    populations = [population_fitness_computing(tour_distance, population, berlin52) for population in populations]
+
+    for topology in ('ring', 'fully_connected', 'random'):
+        best_found, islands_data = island_model_ga(populations, tournament_selection, order_crossover_ox1,
+                                                   swap_mutation, tour_distance, replacement_of_the_worst,
+                                                   simple_euc_tsp_options_handler, berlin52, berlin52['gens'],
+                                                   migration_interval=4, n_migrants=2, topology=topology)
+        assert len(islands_data) == 3
+        assert best_found[0] == min(island_data['current_best'][0] for island_data in islands_data)
+        assert isclose(best_found[0], tour_distance(best_found[1], berlin52))
+        for island_data in islands_data:
+            assert len(island_data['population_fit_avgs']) == len(berlin52['population_fit_avgs']) + berlin52['gens']
+            assert island_data['f_execs'] > 0
+    assert berlin52['current_best'] == (inf, None) # each island works with its own copy
+
+
+def test_immigrants_update_current_best():
+    berlin52 = parse_tsp_data(read_file('instances/euc_TSP/berlin52.tsp'), 'matrix')
+    berlin52.update({'pop_size': 10, 'gens': 2, 'local_s_iters': 0, 'max_records': 100, 'mutation_proba': 0.1})
+    cities = berlin52['cities']
+    center_x = sum(x for x, _ in cities) / len(cities)
+    center_y = sum(y for _, y in cities) / len(cities)
+    # visiting the cities by their angle around the center is far better than a random tour
+    good_tour = array(sorted(berlin52['rest_of_cities'].tolist(),
+                             key=lambda c: atan2(cities[c][1] - center_y, cities[c][0] - center_x)), dtype=intp)
+    populations = [generate_population_of_int_permutations(10, berlin52['rest_of_cities']) for _ in range(2)]
+    populations[0][0] = good_tour
+    berlin52 = simple_euc_tsp_options_handler(populations[0], berlin52, True)
+    populations = [population_fitness_computing(tour_distance, population, berlin52) for population in populations]
+
+    _, islands_data = island_model_ga(populations, tournament_selection, order_crossover_ox1, swap_mutation,
+                                      tour_distance, replacement_of_the_worst, simple_euc_tsp_options_handler,
+                                      berlin52, 2, migration_interval=1, n_migrants=1)
+    # the good tour survives in island 0 and its best migrates to island 1
+    assert islands_data[1]['current_best'][0] <= tour_distance(good_tour, berlin52)
+
+
+def test_merge_islands_history():
+    islands_data = [{'f_execs': 40, 'current_best': (5.0, None), 'best_fitness_found_history': [9.0, 8.0, 6.0, 5.0]},
+                    {'f_execs': 20, 'current_best': (7.0, None), 'best_fitness_found_history': [10.0, 7.0]},
+                    {'f_execs': 30, 'current_best': (1.0, None), 'best_fitness_found_history': [20.0, 15.0, 1.0]}]
+    # every 30 executions of all the islands: 10 and 20 of each one, then the second
+    # island finished and the first one goes on alone after 30, up to 40
+    assert merge_islands_history(islands_data, 10) == [9.0, 7.0, 1.0]
@@ -2,9 +2,15 @@
 
 from random import randint, sample
 from src.gen_algo_framework.population_utils import generate_population_of_bit_vectors, generate_population_of_permutations
-from src.gen_algo_framework.mutation import bit_flip_mutation, swap_mutation
+from src.gen_algo_framework.mutation import bit_flip_mutation, packed_bit_flip_mutation, swap_mutation
+from src.continuous.binary_representation import pack_bit_vector, unpack_bit_vector
 from src.gen_algo_framework.genetic_algorithm import mutate_population
 from copy import deepcopy
+from pickle import dumps, loads
+from math import isclose
+from numpy import array, array_equal
+from src.tsp.euclidean_tsp import edge_weight_function, swap_mutation_with_delta, tour_distance
+from src.utils.input_output import parse_tsp_data, read_file
 
 
 def test_swap_mutation():
@@ -15,6 +21,15 @@ def test_swap_mutation():
         assert individual != individual_
 
 
+def test_swap_mutation_int_array():
+    for _ in range(500):
+        individual = array(sample(range(200), randint(10, 20)))
+        individual_ = individual.copy()
+        individual = swap_mutation(individual)
+        assert not array_equal(individual, individual_)
+        assert sorted(individual) == sorted(individual_)
+
+
 def test_swap_mutation_population():
     for _ in range(100):
         gene_set = set(sample(range(100), randint(5, 15)))
@@ -42,6 +57,18 @@ def test_bit_flip_mutation():
         assert individual != individual_
 
 
+def test_packed_bit_flip_mutation():
+    for _ in range(500):
+        n_bits = randint(1, 40)
+        bits = [randint(0, 1) for _ in range(n_bits)]
+        individual = packed_bit_flip_mutation(n_bits)(pack_bit_vector(bits))
+        flipped = unpack_bit_vector(individual, n_bits)
+        assert sum(b1 != b2 for b1, b2 in zip(bits, flipped)) == 1
+        assert (pack_bit_vector(flipped) == individual).all()
+    assert packed_bit_flip_mutation(12) is packed_bit_flip_mutation(12)
+    assert loads(dumps(packed_bit_flip_mutation(12)))(pack_bit_vector([0] * 12)).sum() > 0
+
+
 def test_bit_flip_mutation_population():
     for _ in range(100):
         population = generate_population_of_bit_vectors(2000, [randint(5, 15)])
@@ -55,3 +82,35 @@ def test_bit_flip_mutation_population():
                 changed_count += 1
 
         assert 150 <= changed_count and changed_count <= 250
+
+
+def test_mutate_population_with_delta():
+    berlin52 = parse_tsp_data(read_file('instances/euc_TSP/berlin52.tsp'))
+    berlin52['edge_weight_f'] = edge_weight_function(berlin52)
+    berlin52['mutation_proba'] = 0.5
+    berlin52['mutation_deltas'] = {swap_mutation: swap_mutation_with_delta}
+    berlin52['deltas_between_evaluations'] = 3
+    for _ in range(50):
+        population = generate_population_of_permutations(20, berlin52['rest_of_cities'])
+        known = [tour_distance(tour, berlin52) for tour in population[:10]] + [None] * 10
+        berlin52['offspring_fitness'] = known.copy()
+        prev_deltas_count = berlin52.get('deltas_count', 0)
+
+        population = mutate_population(swap_mutation, population, berlin52)
+
+        evaluated = 0 # every third mutant of a known tour is evaluated instead
+        for tour, prev_fitness, fitness in zip(population, known, berlin52['offspring_fitness']):
+            if prev_fitness is None:
+                assert fitness is None
+            elif fitness is None:
+                evaluated += 1
+            else:
+                assert isclose(fitness, tour_distance(tour, berlin52), rel_tol=1e-9)
+        assert evaluated == berlin52['deltas_count'] // 3 - prev_deltas_count // 3
+
+    # the variant of another operator is not used, the fitness of the mutants is unknown
+    population = generate_population_of_permutations(20, berlin52['rest_of_cities'])
+    berlin52['offspring_fitness'] = [tour_distance(tour, berlin52) for tour in population]
+    berlin52['mutation_proba'] = 1
+    population = mutate_population(lambda tour: swap_mutation(swap_mutation(tour)), population, berlin52)
+    assert berlin52['offspring_fitness'] == [None] * 20
@@ -0,0 +1,109 @@
+from math import inf, isclose
+from random import seed
+from src.gen_algo_framework.genetic_algorithm import population_fitness_computing, new_fitness_cache, cached_fitness_f
+from src.gen_algo_framework.parallel_evaluation import ParallelEvaluator
+from src.gen_algo_framework.population_utils import generate_population_of_int_permutations
+from src.local_search.permutation import local_search_2_opt
+from src.tsp.euclidean_tsp import canonical_tour_key
+from src.tsp.euclidean_tsp import edge_weight_function, tour_distance
+from src.utils.input_output import parse_tsp_data, read_file
+
+
+def __options(instance: dict) -> dict:
+    options = dict(instance)
+    options['target_f'] = tour_distance
+    options['edge_weight_f'] = edge_weight_function(options)
+    options['local_s_iters'] = 2
+    options['ls_delta_eval'] = True
+    options['f_execs'] = 0
+    options['current_best'] = inf, None
+    options['best_fitness_found_history'] = []
+    options['population_fit_avgs'] = []
+    options['record_interval'] = 37
+    options['execs_times_f'] = []
+    options['sample_size_for_time_estimation'] = 0
+    return options
+
+
+def test_parallel_evaluator():
+    berlin52 = parse_tsp_data(read_file('instances/euc_TSP/berlin52.tsp'), 'matrix')
+    population = generate_population_of_int_permutations(13, berlin52['rest_of_cities'])
+
+    for fitness_f in (tour_distance, local_search_2_opt):
+        sequential = __options(berlin52)
+        sequential_population = population_fitness_computing(fitness_f, [tour.copy() for tour in population],
+                                                             sequential, inside_ga_execution=True)
+
+        parallel = __options(berlin52)
+        evaluator = ParallelEvaluator(fitness_f, parallel, max_workers=3)
+        parallel['population_evaluator'] = evaluator
+        parallel_population = population_fitness_computing(fitness_f, [tour.copy() for tour in population],
+                                                           parallel, inside_ga_execution=True)
+
+        # individuals with known fitness are not sent to the workers
+        parallel['offspring_fitness'] = [fitness for fitness, _ in sequential_population[:5]] + [None] * 8
+        known_population = population_fitness_computing(fitness_f, [tour.copy() for _, tour in sequential_population[:5]] +
+                                                        [tour.copy() for tour in population[5:]],
+                                                        parallel, inside_ga_execution=True)
+        evaluator.shutdown()
+
+        for (fitness, tour), (parallel_fitness, parallel_tour) in zip(sequential_population, parallel_population):
+            assert fitness == parallel_fitness
+            assert (tour == parallel_tour).all()
+        assert parallel['current_best'][0] == sequential['current_best'][0]
+        assert isclose(parallel['current_best'][0], tour_distance(parallel['current_best'][1], berlin52))
+        assert parallel['population_fit_avgs'][0] == sequential['population_fit_avgs'][0]
+        assert parallel['population_fit_avgs'][1] == sequential['population_fit_avgs'][0]
+        for (fitness, _), (known_fitness, _) in zip(sequential_population, known_population):
+            assert fitness == known_fitness
+
+        sequential_population = population_fitness_computing(fitness_f, [tour.copy() for tour in population[5:]],
+                                                             sequential, inside_ga_execution=True)
+        assert parallel['f_execs'] == sequential['f_execs']
+        assert parallel['best_fitness_found_history'] == sequential['best_fitness_found_history']
+
+
+def test_parallel_evaluator_cache():
+    berlin52 = parse_tsp_data(read_file('instances/euc_TSP/berlin52.tsp'), 'matrix')
+    population = generate_population_of_int_permutations(10, berlin52['rest_of_cities'])
+    population += [tour.copy() for tour in population[:4]] + [tour[::-1].copy() for tour in population[4:6]]
+
+    for fitness_f in (tour_distance, local_search_2_opt):
+        sequential = __options(berlin52)
+        sequential_cache = new_fitness_cache(100, canonical_tour_key)
+        sequential_population = population_fitness_computing(cached_fitness_f(fitness_f, sequential_cache),
+                                                             [tour.copy() for tour in population],
+                                                             sequential, inside_ga_execution=True)
+
+        parallel = __options(berlin52)
+        parallel_cache = new_fitness_cache(100, canonical_tour_key)
+        evaluator = ParallelEvaluator(fitness_f, parallel, max_workers=2, start_method='spawn', cache=parallel_cache)
+        parallel['population_evaluator'] = evaluator
+        parallel_population = population_fitness_computing(fitness_f, [tour.copy() for tour in population],
+                                                           parallel, inside_ga_execution=True)
+        evaluator.shutdown()
+
+        assert (parallel_cache['hits'], parallel_cache['misses']) == (sequential_cache['hits'], sequential_cache['misses'])
+        assert parallel_cache['hits'] == 6
+        for (fitness, tour), (parallel_fitness, parallel_tour) in zip(sequential_population, parallel_population):
+            assert fitness == parallel_fitness
+            assert (tour == parallel_tour).all()
+        assert parallel['f_execs'] == sequential['f_execs']
+
+
+def test_parallel_evaluator_reproducible():
+    berlin52 = parse_tsp_data(read_file('instances/euc_TSP/berlin52.tsp'), 'matrix')
+    population = generate_population_of_int_permutations(12, berlin52['rest_of_cities'])
+    results = []
+    for max_workers in (2, 3, 3):
+        options = __options(berlin52)
+        options['ls_random_order'] = True
+        options['seed'] = 11
+        evaluator = ParallelEvaluator(local_search_2_opt, options, max_workers=max_workers, chunks_per_worker=1)
+        options['population_evaluator'] = evaluator
+        seed(5)
+        evaluated = population_fitness_computing(local_search_2_opt, [tour.copy() for tour in population],
+                                                 options, inside_ga_execution=True)
+        evaluator.shutdown()
+        results.append([fitness for fitness, _ in evaluated])
+    assert results[1] == results[2]
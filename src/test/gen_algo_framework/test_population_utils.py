@@ -1,6 +1,10 @@
 from random import randint, uniform
 from typing import Set
+from numpy import intp, uint8
 from src.gen_algo_framework.population_utils import generate_population_of_bit_vectors, generate_population_of_permutations, transform_to_max
+from src.gen_algo_framework.population_utils import ArrayPopulation, fitness_values_to_max, population_fitness_values
+from src.gen_algo_framework.population_utils import generate_population_of_int_permutations
+from src.gen_algo_framework.selection import cumulative_fitness
 
 
 def test_gen_pop_of_permutations():
@@ -57,3 +61,48 @@ def test_transform_to_max():
         for i in range(1, len(to_max_popu)):
             assert to_max_popu[i - 1][0] > to_max_popu[i][0]
             assert to_max_popu[i][0] > 0
+
+
+def test_fitness_values_to_max():
+    for _ in range(100):
+        population = [(uniform(2.0, 2000.0), None) for _ in range(randint(1, 40))]
+        fitness_values = fitness_values_to_max(population_fitness_values(population))
+        expected_c_fitness_l = cumulative_fitness(transform_to_max(population))
+        assert fitness_values.cumsum().tolist() == expected_c_fitness_l
+
+
+def test_array_population():
+    for dtype in (intp, None):
+        genomes = generate_population_of_int_permutations(randint(5, 20), range(30))
+        population = [(uniform(0, 100), genome) for genome in genomes]
+        array_population = ArrayPopulation.from_population(population, dtype)
+
+        assert len(array_population) == len(population)
+        assert population_fitness_values(array_population) is array_population.fitness
+        for (fitness, genome), (array_fitness, array_genome) in zip(population, array_population):
+            assert fitness == array_fitness and (genome == array_genome).all()
+        for (fitness, genome), (fitness_copy, genome_copy) in zip(population, array_population.to_population()):
+            assert fitness == fitness_copy and (genome == genome_copy).all()
+
+        array_population[0] = 1.5, genomes[-1][::-1]
+        assert array_population[0][0] == 1.5
+        assert (array_population[0][1] == genomes[-1][::-1]).all()
+
+        offspring = array_population.offspring_buffer(len(population))
+        assert offspring is array_population.offspring_buffer(len(population))
+        assert offspring.assign(population) is offspring
+        assert population_fitness_values(offspring).tolist() == [fitness for fitness, _ in population]
+
+        next_population = array_population.next_generation_buffer(len(population)).assign(offspring)
+        assert next_population is not array_population
+        assert next_population.next_generation_buffer(len(population)) is array_population # reused in turns
+        assert next_population.offspring_buffer(len(population)) is offspring
+        assert population_fitness_values(next_population).tolist() == [fitness for fitness, _ in population]
+
+
+def test_array_population_of_bit_vectors():
+    population = [(float(i), bits) for i, bits in enumerate(generate_population_of_bit_vectors(10, [8, 8]))]
+    array_population = ArrayPopulation.from_population(population, uint8)
+    assert array_population.genomes.shape == (10, 16)
+    for (_, bits), (_, array_bits) in zip(population, array_population):
+        assert array_bits.tolist() == bits
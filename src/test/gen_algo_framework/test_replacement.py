@@ -1,7 +1,10 @@
-from random import randint, sample
+from math import ceil
+from random import randint, sample, uniform
 
 from src.gen_algo_framework.population_utils import generate_population_of_permutations
-from src.gen_algo_framework.replacement import full_generational_replacement
+from src.gen_algo_framework.replacement import full_generational_replacement, steady_state_replacement
+from src.gen_algo_framework.replacement import replacement_of_the_worst, mu_comma_lambda_replacement, truncation_replacement
+from src.gen_algo_framework.population_utils import generate_population_of_int_permutations
 from src.gen_algo_framework.selection import cumulative_fitness
 
 
@@ -10,4 +13,87 @@ def test_full_generational_replacement():
         genes = set([randint(0, 50) for _ in range(randint(20, 50))])
         parents = generate_population_of_permutations(randint(20, 50), genes)
         children = generate_population_of_permutations(randint(20, 50), genes)
-        assert full_generational_replacement(parents, children, 0, {}) == children
\ No newline at end of file
+        assert full_generational_replacement(parents, children, 0, {}) == children
+
+
+def test_steady_state_replacement():
+    for _ in range(500):
+        pop_size = randint(2, 50)
+        parents = [(float(randint(1, 1000)), ('parent', i)) for i in range(pop_size)]
+        children = [(float(randint(1, 1000)), ('child', i)) for i in range(randint(1, pop_size - 1))]
+        options = {}
+        next_gen = steady_state_replacement(list(parents), children, pop_size, options)
+
+        assert len(next_gen) == pop_size
+        assert sorted(individual for individual in next_gen if individual[1][0] == 'child') == sorted(children)
+        best_parent = min(parents, key=lambda individual: individual[0])
+        assert best_parent in next_gen
+        assert options['gen_fittest_fitness'] == min(fitness for fitness, _ in next_gen)
+
+
+def test_steady_state_replacement_large_offspring():
+    for _ in range(500):
+        pop_size = randint(1, 50)
+        parents = [(float(randint(1, 1000)), ('parent', i)) for i in range(pop_size)]
+        children = [(float(randint(1, 1000)), ('child', i)) for i in range(randint(pop_size, 2 * pop_size))]
+        options = {}
+        next_gen = steady_state_replacement(list(parents), children, pop_size, options)
+
+        assert len(next_gen) == pop_size
+        entered = sorted(individual for individual in next_gen if individual[1][0] == 'child')
+        assert len(entered) == pop_size - 1
+        if entered: # the fittest children enter
+            worst_entered = max(fitness for fitness, _ in entered)
+            assert all(fitness >= worst_entered for fitness, child in children if (fitness, child) not in entered)
+        best_parent = min(parents, key=lambda individual: individual[0])
+        assert best_parent in next_gen
+
+
+def __random_populations():
+    parents = [(float(randint(1, 20)), genome)
+               for genome in generate_population_of_int_permutations(randint(2, 40), range(10))]
+    children = [(float(randint(1, 20)), genome)
+                for genome in generate_population_of_int_permutations(randint(2, 40), range(10))]
+    return parents, children
+
+
+def test_replacement_of_the_worst():
+    for _ in range(500):
+        parents, children = __random_populations() # ties between incomparable genomes
+        new_pop_size = randint(1, len(parents) + len(children) - 1)
+        options = {'current_best': min(parents + children, key=lambda individual: individual[0])}
+        next_gen = replacement_of_the_worst(parents, children, new_pop_size, options)
+
+        all_individuals = parents + children
+        assert len(next_gen) == new_pop_size
+        assert len(set(map(id, next_gen))) == new_pop_size
+        assert set(map(id, next_gen)) <= set(map(id, all_individuals))
+        assert sorted(fitness for fitness, _ in next_gen) == sorted(fitness for fitness, _ in all_individuals)[:new_pop_size]
+        assert len(all_individuals) == len(parents) + len(children)
+
+
+def test_mu_comma_lambda_replacement():
+    for _ in range(500):
+        parents, children = __random_populations()
+        new_pop_size = randint(1, len(children))
+        options = {}
+        next_gen = mu_comma_lambda_replacement(parents, children, new_pop_size, options)
+
+        assert set(map(id, next_gen)) <= set(map(id, children))
+        assert sorted(fitness for fitness, _ in next_gen) == sorted(fitness for fitness, _ in children)[:new_pop_size]
+        assert options['gen_fittest_fitness'] == min(fitness for fitness, _ in next_gen)
+
+
+def test_truncation_replacement():
+    for _ in range(500):
+        parents, children = __random_populations()
+        new_pop_size = len(parents)
+        options = {'truncation_ratio': uniform(0, 1)}
+        elites_size = ceil(options['truncation_ratio'] * len(parents))
+        if new_pop_size - elites_size > len(children):
+            continue
+        next_gen = truncation_replacement(parents, children, new_pop_size, options)
+
+        elites = [individual for individual in next_gen if any(individual is parent for parent in parents)]
+        assert len(next_gen) == new_pop_size
+        assert sorted(fitness for fitness, _ in elites) == sorted(fitness for fitness, _ in parents)[:elites_size]
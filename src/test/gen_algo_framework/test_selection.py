@@ -1,7 +1,12 @@
 from math import isclose
-from random import randint
+from random import randint, seed
 from typing import List, Optional, Tuple
+from numpy import allclose, array
 from src.gen_algo_framework.selection import cumulative_fitness, remove_from_fitness_list, roulette_wheel_toss, roulette_wheel_selection
+from src.gen_algo_framework.selection import batch_roulette_wheel_selection, build_alias_table, alias_selection
+from src.gen_algo_framework.selection import fenwick_tree, fenwick_add, fenwick_prefix_sum, fenwick_toss
+from src.gen_algo_framework.selection import roulette_wheel_selection_without_replacement
+from src.gen_algo_framework.selection import tournament_selection, stochastic_universal_sampling
 
 
 def __random_c_list():
@@ -86,6 +91,63 @@ def test_roulette_wheel_selection():
             assert selected_parents_size * 2 == offspring_size + 1
 
 
+def test_batch_roulette_wheel_selection():
+    for _ in range(500):
+        _, _, _popu = __random_c_list()
+        popu_size = len(_popu)
+        offspring_size = randint(2, popu_size)
+        selected_parents = batch_roulette_wheel_selection(_popu, offspring_size, {})
+        assert selected_parents.shape == ((offspring_size + 1) // 2, 2)
+        assert 0 <= selected_parents.min() and selected_parents.max() < popu_size
+
+    # minimization: fitness 1 (best) to 4 (worst) map to 3, 2, 1, 0 (plus 1e-6)
+    options = {}
+    fixed_popu = [(1.0, None), (2.0, None), (3.0, None), (4.0, None)]
+    tosses = 100000
+    selected = batch_roulette_wheel_selection(fixed_popu, 2 * tosses, options).ravel()
+    for index, expected_rate in zip(range(4), [.5, 1 / 3, 1 / 6, 0]):
+        assert isclose((selected == index).sum() / (2 * tosses), expected_rate, abs_tol=0.01)
+
+    seed(1)
+    same_seed_selection = batch_roulette_wheel_selection(fixed_popu, 100, {})
+    seed(1)
+    assert (same_seed_selection == batch_roulette_wheel_selection(fixed_popu, 100, {})).all()
+
+
+def test_build_alias_table():
+    for _ in range(500):
+        weights = array([float(randint(1, 1000)) for _ in range(randint(1, 60))])
+        prob, alias = build_alias_table(weights)
+        # each index gets its own kept mass plus the mass of the columns aliasing it
+        recovered = prob.copy()
+        for i, alias_i in enumerate(alias):
+            recovered[alias_i] += 1 - prob[i]
+        assert allclose(recovered / len(weights), weights / weights.sum())
+
+
+def test_alias_selection():
+    for _ in range(500):
+        _, _, _popu = __random_c_list()
+        popu_size = len(_popu)
+        offspring_size = randint(2, popu_size)
+        selected_parents = alias_selection(_popu, offspring_size, {})
+        assert selected_parents.shape == ((offspring_size + 1) // 2, 2)
+        assert 0 <= selected_parents.min() and selected_parents.max() < popu_size
+
+    options = {}
+    fixed_popu = [(1.0, None), (2.0, None), (3.0, None), (4.0, None)]
+    tosses = 100000
+    selected = alias_selection(fixed_popu, 2 * tosses, options).ravel()
+    assert 'alias_table' in options
+    for index, expected_rate in zip(range(4), [.5, 1 / 3, 1 / 6, 0]):
+        assert isclose((selected == index).sum() / (2 * tosses), expected_rate, abs_tol=0.01)
+
+    seed(1)
+    same_seed_selection = alias_selection(fixed_popu, 100, {})
+    seed(1)
+    assert (same_seed_selection == alias_selection(fixed_popu, 100, {})).all()
+
+
 def test_remove_from_fitness_list():
     for _ in range(1000):
         c_list, _, _popu = __random_c_list()
@@ -104,3 +166,77 @@ def test_remove_from_fitness_list():
             assert recalc_c_list == c_list
             assert recalc_c_list is not c_list
             assert recalc_f == c_list[-1]
+
+
+def test_fenwick_tree():
+    for _ in range(500):
+        c_list, _, _popu = __random_c_list()
+        weights = [fitness for fitness, _ in _popu]
+        tree = fenwick_tree(weights)
+        for _ in range(randint(0, 20)):
+            index = randint(0, len(weights) - 1)
+            delta = float(randint(-int(weights[index]), 100))
+            weights[index] += delta
+            fenwick_add(tree, index, delta)
+        c_list = cumulative_fitness([(weight, None) for weight in weights])
+        for end in range(1, len(weights) + 1):
+            assert isclose(fenwick_prefix_sum(tree, end), c_list[end - 1])
+        index = fenwick_toss(tree)
+        assert 0 <= index < len(weights) and weights[index] > 0
+
+    tree = fenwick_tree([25.0, 50.0, 0.0, 25.0])
+    tosses = 100000
+    selected = [fenwick_toss(tree) for _ in range(tosses)]
+    for index, expected_rate in zip(range(4), [.25, .5, 0, .25]):
+        assert isclose(selected.count(index) / tosses, expected_rate, abs_tol=0.01)
+
+
+def test_roulette_wheel_selection_without_replacement():
+    for _ in range(500):
+        _, _, _popu = __random_c_list()
+        popu_size = len(_popu)
+        offspring_size = randint(2, 3 * popu_size)
+        selected_parents = roulette_wheel_selection_without_replacement(_popu, offspring_size, {})
+        assert len(selected_parents) == (offspring_size + 1) // 2
+        selected = [index for couple in selected_parents for index in couple]
+        for start in range(0, len(selected), popu_size):
+            pool = selected[start:start + popu_size]
+            assert len(set(pool)) == len(pool)
+            assert set(pool) <= set(range(popu_size))
+
+
+def test_tournament_selection():
+    for _ in range(500):
+        _, _, _popu = __random_c_list()
+        popu_size = len(_popu)
+        offspring_size = randint(2, popu_size)
+        selected_parents = tournament_selection(_popu, offspring_size, {'tournament_size': randint(1, 5)})
+        assert selected_parents.shape == ((offspring_size + 1) // 2, 2)
+        assert 0 <= selected_parents.min() and selected_parents.max() < popu_size
+
+    # binary tournament: the i-th best (of n) wins with probability (2 * (n - i) - 1) / n ** 2
+    fixed_popu = [(1.0, None), (2.0, None), (3.0, None), (4.0, None)]
+    tosses = 100000
+    selected = tournament_selection(fixed_popu, 2 * tosses, {}).ravel()
+    for index, expected_rate in zip(range(4), [7 / 16, 5 / 16, 3 / 16, 1 / 16]):
+        assert isclose((selected == index).sum() / (2 * tosses), expected_rate, abs_tol=0.01)
+
+    selected = tournament_selection(fixed_popu, 100, {'tournament_size': 100}).ravel()
+    assert (selected == 0).all()
+
+
+def test_stochastic_universal_sampling():
+    for _ in range(500):
+        _, _, _popu = __random_c_list()
+        popu_size = len(_popu)
+        offspring_size = randint(2, popu_size)
+        selected_parents = stochastic_universal_sampling(_popu, offspring_size, {})
+        assert selected_parents.shape == ((offspring_size + 1) // 2, 2)
+        assert 0 <= selected_parents.min() and selected_parents.max() < popu_size
+
+    # minimization: fitness 1 (best) to 4 (worst) map to 3, 2, 1, 0 (plus 1e-6),
+    # so with 6 pointers the individuals get exactly 3, 2, 1 and 0 of them
+    fixed_popu = [(1.0, None), (2.0, None), (3.0, None), (4.0, None)]
+    for _ in range(100):
+        selected = stochastic_universal_sampling(fixed_popu, 6, {}).ravel().tolist()
+        assert [selected.count(index) for index in range(4)] == [3, 2, 1, 0]
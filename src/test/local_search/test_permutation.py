@@ -0,0 +1,251 @@
+from math import inf, isclose
+from random import choice, randint, sample
+from src.gen_algo_framework.population_utils import generate_population_of_int_permutations
+from src.local_search.permutation import in_place_reverse_segment, local_search_2_opt, two_opt_move_delta
+from src.local_search.permutation import local_search_2_opt_neighbor_lists, iter_2_opt_cut_points
+from src.local_search.permutation import local_search_2_opt_vectorized, two_opt_neighborhood_deltas
+from src.local_search.permutation import in_place_move_segment, iter_or_opt_moves, iter_or_3opt_moves, or_opt_move_delta
+from src.local_search.permutation import swap_move_delta
+from src.tsp.euclidean_tsp import build_neighbor_lists, edge_weight_function, tour_distance
+from src.utils.input_output import parse_tsp_data, read_file
+
+
+def __local_search_options(instance: dict, iterations: int) -> dict:
+    instance['target_f'] = tour_distance
+    instance['edge_weight_f'] = edge_weight_function(instance)
+    instance['local_s_iters'] = iterations
+    instance['f_execs'] = 0
+    instance['current_best'] = inf, None
+    instance['best_fitness_found_history'] = []
+    instance['record_interval'] = 100
+    instance['execs_times_f'] = []
+    instance['sample_size_for_time_estimation'] = 0
+    return instance
+
+
+def test_in_place_reverse_segment():
+    for _ in range(500):
+        sequence = list(range(randint(2, 30)))
+        i = randint(0, len(sequence) - 1)
+        j = randint(i, len(sequence) - 1)
+        expected = sequence[:i] + sequence[i:j + 1][::-1] + sequence[j + 1:]
+        in_place_reverse_segment(sequence, i, j)
+        assert sequence == expected
+
+
+def test_iter_2_opt_cut_points():
+    for size in range(2, 40):
+        expected = [(i, j) for i in range(1, size) for j in range(i + 1, size)]
+        assert list(iter_2_opt_cut_points(size)) == expected
+        randomized = list(iter_2_opt_cut_points(size, True))
+        assert len(randomized) == len(expected)
+        assert set(randomized) == set(expected)
+
+
+def test_two_opt_move_delta():
+    for backend in ['dict', 'matrix']:
+        eil51 = parse_tsp_data(read_file('instances/euc_TSP/eil51.tsp'), backend)
+        edge_weight_f = edge_weight_function(eil51)
+        for tour in generate_population_of_int_permutations(20, range(1, 51)):
+            if backend == 'dict':
+                tour = [eil51['rest_of_cities'][city_id - 1] for city_id in tour]
+            tour_cost = tour_distance(tour, eil51)
+            for _ in range(50):
+                i = randint(1, len(tour) - 2)
+                j = randint(i + 1, len(tour) - 1)
+                delta = two_opt_move_delta(tour, i, j, eil51['fst_city'], edge_weight_f)
+                in_place_reverse_segment(tour, i, j)
+                assert isclose(tour_cost + delta, tour_distance(tour, eil51), rel_tol=1e-9)
+                in_place_reverse_segment(tour, i, j)
+
+
+def test_local_search_2_opt_delta_eval():
+    eil51 = parse_tsp_data(read_file('instances/euc_TSP/eil51.tsp'), 'matrix')
+    for tour, scan in zip(generate_population_of_int_permutations(6, range(1, 51)), ['sweep', 'first', 'best'] * 2):
+        full_eval = __local_search_options(eil51.copy(), 2)
+        delta_eval = __local_search_options(eil51.copy(), 2)
+        delta_eval['ls_delta_eval'] = True
+        full_eval['ls_scan'] = delta_eval['ls_scan'] = scan
+        tour_copy = tour.copy()
+
+        f_full = local_search_2_opt(tour, full_eval, True)
+        f_delta = local_search_2_opt(tour_copy, delta_eval, True)
+
+        assert isclose(f_full, f_delta, rel_tol=1e-9)
+        assert list(tour) == list(tour_copy)
+        assert isclose(f_delta, tour_distance(tour_copy, eil51), rel_tol=1e-9)
+        assert full_eval['f_execs'] == delta_eval['f_execs']
+        assert len(full_eval['best_fitness_found_history']) == len(delta_eval['best_fitness_found_history'])
+
+
+def test_local_search_2_opt_neighbor_lists():
+    kroA100 = parse_tsp_data(read_file('instances/euc_TSP/kroA100.tsp'), 'matrix')
+    kroA100['neighbor_lists'] = build_neighbor_lists(kroA100['cities'], 8)
+    for tour in generate_population_of_int_permutations(10, range(1, 100)):
+        options = __local_search_options(kroA100.copy(), 5)
+        initial_cost = tour_distance(tour, kroA100)
+
+        f_tour = local_search_2_opt_neighbor_lists(tour, options, True)
+
+        assert sorted(tour.tolist()) == list(range(1, 100))
+        assert isclose(f_tour, tour_distance(tour, kroA100), rel_tol=1e-9)
+        assert f_tour < initial_cost
+        assert options['current_best'][0] == f_tour
+        assert options['f_execs'] > 1
+
+
+def test_local_search_2_opt_scans():
+    eil51 = parse_tsp_data(read_file('instances/euc_TSP/eil51.tsp'), 'matrix')
+    edge_weight_f = edge_weight_function(eil51)
+    for scan in ['sweep', 'first', 'best']:
+        for randomized in [False, True]:
+            for tour in generate_population_of_int_permutations(3, range(1, 51)):
+                options = __local_search_options(eil51.copy(), 10**6)
+                options['ls_delta_eval'] = True
+                options['ls_scan'] = scan
+                options['ls_random_order'] = randomized
+                initial_cost = tour_distance(tour, eil51)
+
+                f_tour = local_search_2_opt(tour, options, True)
+
+                assert f_tour < initial_cost
+                assert sorted(tour.tolist()) == list(range(1, 51))
+                assert isclose(f_tour, tour_distance(tour, eil51), rel_tol=1e-9)
+                # stopped at a local optimum
+                for i, j in iter_2_opt_cut_points(len(tour)):
+                    assert two_opt_move_delta(tour, i, j, eil51['fst_city'], edge_weight_f) > -1e-7
+
+
+def test_two_opt_neighborhood_deltas():
+    eil51 = parse_tsp_data(read_file('instances/euc_TSP/eil51.tsp'), 'matrix')
+    edge_weight_f = edge_weight_function(eil51)
+    for tour in generate_population_of_int_permutations(10, range(1, 51)):
+        deltas = two_opt_neighborhood_deltas(tour, eil51['fst_city'], eil51['dist_matrix'])
+        moves = 0
+        for i in range(1, len(tour)):
+            for j in range(1, len(tour)):
+                if j <= i:
+                    assert deltas[i - 1, j - 1] == inf
+                    continue
+                moves += 1
+                expected = two_opt_move_delta(tour, i, j, eil51['fst_city'], edge_weight_f)
+                assert isclose(deltas[i - 1, j - 1], expected, rel_tol=1e-9, abs_tol=1e-9)
+        assert moves == len(list(iter_2_opt_cut_points(len(tour))))
+
+
+def test_local_search_2_opt_vectorized():
+    kroA100 = parse_tsp_data(read_file('instances/euc_TSP/kroA100.tsp'), 'matrix')
+    for ls_apply in ['best', 'non_overlapping']:
+        for tour in generate_population_of_int_permutations(5, range(1, 100)):
+            options = __local_search_options(kroA100.copy(), 10**6)
+            options['ls_apply'] = ls_apply
+            initial_cost = tour_distance(tour, kroA100)
+
+            f_tour = local_search_2_opt_vectorized(tour, options, True)
+
+            assert f_tour < initial_cost
+            assert sorted(tour.tolist()) == list(range(1, 100))
+            assert isclose(f_tour, tour_distance(tour, kroA100), rel_tol=1e-9)
+            assert options['current_best'][0] == f_tour
+            deltas = two_opt_neighborhood_deltas(tour, kroA100['fst_city'], kroA100['dist_matrix'])
+            assert deltas.min() > -1e-7 # local optimum
+
+
+def test_in_place_move_segment():
+    for _ in range(500):
+        size = randint(5, 30)
+        sequence = list(range(size))
+        start, seg_len, k, reverse = choice(list(iter_or_opt_moves(size, reverse=bool(randint(0, 1)))))
+        segment = sequence[start:start + seg_len]
+        if reverse:
+            segment.reverse()
+        rest = sequence[:start] + sequence[start + seg_len:]
+        insert_at = k + 1 if k < start else k + 1 - seg_len
+        expected = rest[:insert_at] + segment + rest[insert_at:]
+
+        in_place_move_segment(sequence, start, seg_len, k, reverse)
+        assert sequence == expected
+
+
+def test_or_opt_moves_not_repeated():
+    for size in list(range(3, 20)) + [50]:
+        neighbors = set()
+        all_neighbors = set() # relocating every segment after every other element
+        for seg_len in range(1, 4):
+            for start in range(size - seg_len + 1):
+                for k in range(-1, size):
+                    if size - seg_len >= 2 and not start - 1 <= k <= start + seg_len - 1:
+                        sequence = list(range(size))
+                        in_place_move_segment(sequence, start, seg_len, k)
+                        all_neighbors.add(tuple(sequence))
+        for move in iter_or_opt_moves(size):
+            sequence = list(range(size))
+            in_place_move_segment(sequence, *move)
+            neighbors.add(tuple(sequence))
+        assert len(neighbors) == len(list(iter_or_opt_moves(size)))
+        assert neighbors == all_neighbors
+    assert len(list(iter_or_opt_moves(8))) == 83 and len(list(iter_or_opt_moves(50))) == 6635
+
+
+def test_or_3opt_moves_not_repeated():
+    for size in range(8, 20):
+        neighbors = set()
+        for start, seg_len, k, reverse in iter_or_3opt_moves(size):
+            assert seg_len >= 2 and reverse
+            sequence = list(range(size))
+            in_place_move_segment(sequence, start, seg_len, k, reverse)
+            neighbors.add(tuple(sequence))
+        or_opt_neighbors = set()
+        for move in iter_or_opt_moves(size):
+            sequence = list(range(size))
+            in_place_move_segment(sequence, *move)
+            or_opt_neighbors.add(tuple(sequence))
+        assert len(neighbors) == len(list(iter_or_3opt_moves(size)))
+        assert not neighbors & or_opt_neighbors
+
+
+def test_or_opt_move_delta():
+    eil51 = parse_tsp_data(read_file('instances/euc_TSP/eil51.tsp'), 'matrix')
+    edge_weight_f = edge_weight_function(eil51)
+    for tour in generate_population_of_int_permutations(5, range(1, 51)):
+        tour_cost = tour_distance(tour, eil51)
+        moves = list(iter_or_opt_moves(len(tour))) + list(iter_or_3opt_moves(len(tour)))
+        for move in sample(moves, 300):
+            delta = or_opt_move_delta(tour, *move, eil51['fst_city'], edge_weight_f)
+            neighbor = tour.copy()
+            in_place_move_segment(neighbor, *move)
+            assert isclose(tour_cost + delta, tour_distance(neighbor, eil51), rel_tol=1e-9)
+
+
+def test_local_search_vnd():
+    eil51 = parse_tsp_data(read_file('instances/euc_TSP/eil51.tsp'), 'matrix')
+    edge_weight_f = edge_weight_function(eil51)
+    for tour in generate_population_of_int_permutations(3, range(1, 51)):
+        options = __local_search_options(eil51.copy(), 10**6)
+        options['ls_delta_eval'] = True
+        options['ls_moves'] = ['2_opt', 'or_opt', 'or_3opt']
+        initial_cost = tour_distance(tour, eil51)
+
+        f_tour = local_search_2_opt(tour, options, True)
+
+        assert f_tour < initial_cost
+        assert sorted(tour.tolist()) == list(range(1, 51))
+        assert isclose(f_tour, tour_distance(tour, eil51), rel_tol=1e-9)
+        # local optimum for all the neighborhoods
+        for i, j in iter_2_opt_cut_points(len(tour)):
+            assert two_opt_move_delta(tour, i, j, eil51['fst_city'], edge_weight_f) > -1e-7
+        for move in list(iter_or_opt_moves(len(tour))) + list(iter_or_3opt_moves(len(tour))):
+            assert or_opt_move_delta(tour, *move, eil51['fst_city'], edge_weight_f) > -1e-7
+
+
+def test_swap_move_delta():
+    eil51 = parse_tsp_data(read_file('instances/euc_TSP/eil51.tsp'), 'matrix')
+    edge_weight_f = edge_weight_function(eil51)
+    for tour in generate_population_of_int_permutations(20, range(1, 51)):
+        tour_cost = tour_distance(tour, eil51)
+        for i in range(len(tour)):
+            for j in range(i + 1, len(tour)):
+                delta = swap_move_delta(tour, i, j, eil51['fst_city'], edge_weight_f)
+                neighbor = tour.copy()
+                neighbor[i], neighbor[j] = neighbor[j], neighbor[i]
+                assert isclose(tour_cost + delta, tour_distance(neighbor, eil51), rel_tol=1e-9)
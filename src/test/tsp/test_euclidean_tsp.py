@@ -1,9 +1,12 @@
 
 from math import inf, sqrt, isclose
+from numpy import allclose, array_equal, floor, int32
 from random import randint, uniform
-from src.gen_algo_framework.genetic_algorithm import population_fitness_computing
-from src.gen_algo_framework.population_utils import generate_population_of_permutations
-from src.tsp.euclidean_tsp import build_weight_dict, euclidean_distance, tour_distance
+from src.gen_algo_framework.genetic_algorithm import population_fitness_computing, new_fitness_cache, cached_fitness_f
+from src.gen_algo_framework.population_utils import generate_population_of_permutations, generate_population_of_int_permutations
+from src.tsp.euclidean_tsp import build_neighbor_lists, build_weight_dict, euclidean_distance, tour_distance
+from src.tsp.euclidean_tsp import canonical_tour_key, distance_storages
+from src.local_search.permutation import two_opt_neighborhood_deltas
 from src.utils.input_output import parse_tsp_data, read_file
 
 
@@ -74,6 +77,63 @@ def test_standard_fitness_computing_for_euc_tsp():
         assert berlin52['population_fit_avgs'][-1] == pop_untransformed_f_sum / len(population)
 
 
+def test_fitness_computing_known_fitness():
+    berlin52 = parse_tsp_data(read_file('instances/euc_TSP/berlin52.tsp'))
+    berlin52['f_execs'] = 0
+    berlin52['current_best'] = inf, None
+    berlin52['best_fitness_found_history'] = []
+    berlin52['population_fit_avgs'] = []
+    berlin52['record_interval'] = 1
+    berlin52['execs_times_f'] = []
+    berlin52['sample_size_for_time_estimation'] = 0
+
+    population = generate_population_of_permutations(20, berlin52['rest_of_cities'])
+    berlin52['offspring_fitness'] = [tour_distance(tour, berlin52) for tour in population[:5]] + [None] * 15
+    population = population_fitness_computing(tour_distance, population, berlin52, inside_ga_execution=True) # pyright: ignore
+
+    assert berlin52['f_execs'] == 15
+    assert 'offspring_fitness' not in berlin52
+    for fitness, tour in population:
+        assert fitness == tour_distance(tour, berlin52) # pyright: ignore
+    assert berlin52['current_best'][0] == min(fitness for fitness, _ in population)
+
+
+
+def test_canonical_tour_key():
+    for _ in range(100):
+        tour = generate_population_of_int_permutations(1, range(1, randint(3, 40)))[0]
+        assert canonical_tour_key(tour) == canonical_tour_key(tour[::-1])
+        assert canonical_tour_key(tour) == canonical_tour_key(tour.tolist())
+        assert canonical_tour_key(tour) in (tuple(tour.tolist()), tuple(tour[::-1].tolist()))
+
+
+def test_cached_fitness_computing():
+    berlin52 = parse_tsp_data(read_file('instances/euc_TSP/berlin52.tsp'))
+    berlin52['f_execs'] = 0
+    berlin52['current_best'] = inf, None
+    berlin52['best_fitness_found_history'] = []
+    berlin52['population_fit_avgs'] = []
+    berlin52['record_interval'] = 1
+    berlin52['execs_times_f'] = []
+    berlin52['sample_size_for_time_estimation'] = 0
+
+    cache = new_fitness_cache(25, canonical_tour_key)
+    cached_tour_distance = cached_fitness_f(tour_distance, cache)
+    tours = generate_population_of_permutations(20, berlin52['rest_of_cities'])
+    population = tours + [tour[::-1] for tour in tours[:10]] + [tour.copy() for tour in tours[10:]]
+    population = population_fitness_computing(cached_tour_distance, population, berlin52, inside_ga_execution=True) # pyright: ignore
+
+    assert (cache['hits'], cache['misses']) == (20, 20)
+    assert berlin52['f_execs'] == 20
+    for fitness, tour in population:
+        assert isclose(fitness, tour_distance(tour, berlin52)) # pyright: ignore
+
+    new_tours = generate_population_of_permutations(10, berlin52['rest_of_cities'])
+    population_fitness_computing(cached_tour_distance, new_tours, berlin52, inside_ga_execution=True)
+    assert len(cache['entries']) == 25
+    assert canonical_tour_key(tours[0]) not in cache['entries'] # least recently used evicted
+
+
 def test_build_weight_dict():
     berlin52 = parse_tsp_data(read_file('instances/euc_TSP/berlin52.tsp'))
     cities = berlin52['rest_of_cities'].copy()
@@ -87,3 +147,68 @@ def test_build_weight_dict():
             assert berlin52['weights'][(v, u)] == eucd
 
     cities.pop()
+
+
+def test_build_distance_matrix():
+    berlin52 = parse_tsp_data(read_file('instances/euc_TSP/berlin52.tsp'), 'matrix')
+    cities = berlin52['cities']
+    dist_matrix = berlin52['dist_matrix']
+    assert dist_matrix.shape == (52, 52)
+    assert cities[berlin52['fst_city']] == (565.0, 575.0)
+    for i, u in enumerate(cities):
+        assert dist_matrix[i, i] == 0
+        for j, v in enumerate(cities):
+            assert isclose(dist_matrix[i, j], euclidean_distance(u, v), rel_tol=1e-12)
+
+
+def test_tour_distance_matrix_backend():
+    berlin52 = parse_tsp_data(read_file('instances/euc_TSP/berlin52.tsp'))
+    berlin52_m = parse_tsp_data(read_file('instances/euc_TSP/berlin52.tsp'), 'matrix')
+    cities = berlin52_m['cities']
+    for individual in generate_population_of_int_permutations(50, berlin52_m['rest_of_cities']):
+        tour = [cities[city_id] for city_id in individual]
+        assert isclose(tour_distance(individual, berlin52_m),
+                       tour_distance(tour, berlin52), rel_tol=1e-9)
+
+
+def test_compact_distance_matrix():
+    berlin52_m = parse_tsp_data(read_file('instances/euc_TSP/berlin52.tsp'), 'matrix')
+    dist_matrix = berlin52_m['dist_matrix']
+    tour = berlin52_m['rest_of_cities'][::-1].copy()
+    ids = berlin52_m['rest_of_cities']
+    for storage in distance_storages[1:]:
+        compact = parse_tsp_data(read_file('instances/euc_TSP/berlin52.tsp'), 'matrix', storage)
+        compact_matrix = compact['dist_matrix']
+        expected = floor(dist_matrix + 0.5) if storage.endswith('nint') else dist_matrix
+        if storage.startswith('condensed'):
+            assert compact_matrix.values.shape == (52 * 51 // 2,)
+        if storage.endswith('nint'):
+            assert compact_matrix.values.dtype == int32
+        assert compact_matrix.shape == (52, 52)
+        assert compact_matrix[0, 0] == 0 and compact_matrix[51, 51] == 0
+        assert allclose(compact_matrix[ids[:, None], ids[None, :]], expected[ids[:, None], ids[None, :]])
+        assert allclose(compact_matrix[0, ids], expected[0, ids])
+        for i in range(52):
+            for j in range(52):
+                assert isclose(compact_matrix[i, j], expected[i, j], rel_tol=1e-6)
+        assert type(compact_matrix[3, 7]) is float and type(compact_matrix[ids[6], ids[2]]) is float
+        assert compact_matrix[ids[6], ids[2]] == compact_matrix[ids[2:3], ids[6:7]][0]
+        if storage == 'condensed':
+            assert array_equal(compact_matrix[ids[:, None], ids[None, :]], dist_matrix[ids[:, None], ids[None, :]])
+        assert isclose(tour_distance(tour, compact), tour_distance(tour, berlin52_m), rel_tol=1e-3)
+        assert allclose(two_opt_neighborhood_deltas(tour, 0, compact_matrix),
+                        two_opt_neighborhood_deltas(tour, 0, expected), atol=1e-3)
+
+
+def test_build_neighbor_lists():
+    for _ in range(20):
+        dimension = randint(2, 3)
+        cities = [tuple(uniform(-100, 100) for _ in range(dimension)) for _ in range(randint(20, 200))]
+        k = randint(1, 12)
+        neighbor_lists = build_neighbor_lists(cities, k)
+        assert neighbor_lists.shape == (len(cities), k)
+        for i, u in enumerate(cities):
+            distances = sorted(euclidean_distance(u, v) for j, v in enumerate(cities) if j != i)
+            assert i not in neighbor_lists[i]
+            for rank, j in enumerate(neighbor_lists[i]):
+                assert isclose(euclidean_distance(u, cities[j]), distances[rank], rel_tol=1e-9)
@@ -0,0 +1,96 @@
+from math import isclose
+from pytest import raises
+from src.tsp.ga_for_euclidean_tsp import genetic_algorithm_for_euctsp
+from src.tsp.euclidean_tsp import tour_distance
+from src.utils.shared_memory import _blocks
+
+
+INSTANCE_PATH = 'instances/euc_TSP/berlin52.tsp'
+
+
+def __params(**params) -> dict:
+    default_params = {'pop_size': 10, 'gens': 5, 'mutation_proba': 0.2, 'local_s_iters': 0,
+                      'replacement': 'full_gen_replacement_elitist', 'max_records': 20, 'seed': 7}
+    default_params.update(params)
+    return default_params
+
+
+def test_steady_state_replacement_run():
+    for distance_backend in ('dict', 'matrix'):
+        best_found, data = genetic_algorithm_for_euctsp(INSTANCE_PATH, __params(replacement='steady_state_replacement',
+                                                                                distance_backend=distance_backend))
+        assert best_found[0] == tour_distance(best_found[1], data)
+        assert data['best_fitness_found_history'][-1] == best_found[0]
+
+
+def test_parallel_evaluation_with_cache_run():
+    params = __params(local_s_iters=1, distance_backend='matrix', local_search='2_opt', eval_workers=2,
+                      mp_start_method='spawn', fitness_cache_size=1000, ls_random_order=True)
+    best_found, data = genetic_algorithm_for_euctsp(INSTANCE_PATH, dict(params))
+    assert data['fitness_cache_hits'] + data['fitness_cache_misses'] > 0
+    assert data['fitness_cache_misses'] > 0
+    best_found_again, _ = genetic_algorithm_for_euctsp(INSTANCE_PATH, dict(params))
+    assert best_found_again[0] == best_found[0] # reproducible from the seed
+
+
+def test_island_model_cache_stats_run():
+    for mp_start_method in ('fork', 'spawn'): # the cache of each island is created there
+        best_found, data = genetic_algorithm_for_euctsp(INSTANCE_PATH, __params(islands=2, migration_interval=2,
+                                                                                fitness_cache_size=100,
+                                                                                mp_start_method=mp_start_method))
+        assert data['fitness_cache_misses'] > 0
+        assert data['fitness_cache_hits'] == sum(island['fitness_cache_hits'] for island in data['islands_data'])
+        assert data['fitness_cache_misses'] == sum(island['fitness_cache_misses'] for island in data['islands_data'])
+        assert data['islands_data'][0] is not data['islands_data'][1]
+        assert isclose(best_found[0], tour_distance(best_found[1], data), rel_tol=1e-9)
+
+
+def test_shared_memory_released():
+    params = __params(local_s_iters=1, distance_backend='matrix', local_search='2_opt', eval_workers=2,
+                      mp_start_method='spawn', shared_memory=True)
+    for _ in range(3):
+        best_found, data = genetic_algorithm_for_euctsp(INSTANCE_PATH, dict(params))
+        assert not _blocks
+        assert best_found[0] == tour_distance(best_found[1], data) # private copies of the arrays
+    best_found, data = genetic_algorithm_for_euctsp(INSTANCE_PATH, __params(islands=2, distance_backend='matrix',
+                                                                            shared_memory=True))
+    assert not _blocks and best_found[0] == tour_distance(best_found[1], data)
+
+    with raises(KeyError): # released on errors too
+        genetic_algorithm_for_euctsp(INSTANCE_PATH, __params(replacement='unknown', distance_backend='matrix',
+                                                             shared_memory=True))
+    assert not _blocks
+
+
+def test_history_records_real_executions():
+    for params in (__params(), __params(islands=2, migration_interval=2), __params(distance_backend='matrix'),
+                   __params(distance_backend='matrix', local_s_iters=1, local_search='2_opt_vectorized')):
+        best_found, data = genetic_algorithm_for_euctsp(INSTANCE_PATH, params)
+        history = data['best_fitness_found_history']
+        assert all(type(record) is float for record in history) # not NumPy scalars
+        # offspring with known fitness are not evaluated, no records for them
+        n_islands = len(data.get('islands_data', [data]))
+        assert len(history) - 1 == data['f_execs'] // (n_islands * data['record_interval'])
+        assert history[-1] == best_found[0]
+        assert all(round(later, 4) <= earlier for earlier, later in zip(history, history[1:]))
+
+
+def test_crossover_proba_run():
+    for distance_backend in ('dict', 'matrix'):
+        params = __params(crossover_proba=0.5, mutation_proba=0.5, distance_backend=distance_backend)
+        best_found, data = genetic_algorithm_for_euctsp(INSTANCE_PATH, params)
+        assert data['crossover_proba'] == 0.5
+        # copies of the parents and their swap mutants are scored without evaluations
+        assert data['f_execs'] < data['pop_size'] * (data['gens'] + 1)
+        assert isclose(best_found[0], tour_distance(best_found[1], data), rel_tol=1e-9) # deltas added up
+
+
+def test_array_population_run():
+    for replacement in ('full_gen_replacement_elitist', 'replacement_of_the_worst', 'steady_state_replacement'):
+        for distance_backend in ('dict', 'matrix'):
+            params = __params(replacement=replacement, distance_backend=distance_backend, gens=8)
+            best_found, data = genetic_algorithm_for_euctsp(INSTANCE_PATH, dict(params, array_population=True))
+            expected_best, expected_data = genetic_algorithm_for_euctsp(INSTANCE_PATH, dict(params))
+            assert best_found[0] == expected_best[0] # same run as with the list of tuples
+            assert data['best_fitness_found_history'] == expected_data['best_fitness_found_history']
+            assert isclose(best_found[0], tour_distance(best_found[1], data), rel_tol=1e-9)
@@ -1,5 +1,7 @@
 
-from src.utils.input_output import parse_tsp_data, read_file
+from os import listdir
+from numpy import array_equal
+from src.utils.input_output import parse_tsp_data, read_file, read_tsp_instance, tsp_solution_to_lines
 
 
 def test_read_and_parse():
@@ -18,3 +20,31 @@ def test_read_and_parse():
     for city in cities:
         assert berlin52['ids'][city] == curr_id
         curr_id += 1
+
+
+def test_solution_to_lines_matrix_backend():
+    berlin52 = parse_tsp_data(read_file('instances/euc_TSP/berlin52.tsp'))
+    berlin52_m = parse_tsp_data(read_file('instances/euc_TSP/berlin52.tsp'), 'matrix')
+    assert berlin52_m['fst_city'] == 0
+    assert list(berlin52_m['rest_of_cities']) == list(range(1, 52))
+
+    tour_ids = berlin52_m['rest_of_cities'][::-1]
+    tour = [berlin52_m['cities'][city_id] for city_id in tour_ids]
+    assert tsp_solution_to_lines(berlin52_m['fst_city'], tour_ids, berlin52_m) == \
+        tsp_solution_to_lines(berlin52['fst_city'], tour, berlin52)
+
+
+def test_read_tsp_instance_cached(tmp_path):
+    for file_path in ['instances/euc_TSP/berlin52.tsp', 'instances/euc_TSP/saturn.tsp']:
+        parsed = parse_tsp_data(read_file(file_path))
+        for _ in range(2): # the second read loads the cache
+            assert read_tsp_instance(file_path, cache_dir=str(tmp_path)) == parsed
+
+        parsed_m = parse_tsp_data(read_file(file_path), 'matrix')
+        for _ in range(2):
+            cached_m = read_tsp_instance(file_path, 'matrix', str(tmp_path))
+            assert array_equal(cached_m.pop('dist_matrix'), parsed_m['dist_matrix'])
+            assert array_equal(cached_m.pop('rest_of_cities'), parsed_m['rest_of_cities'])
+            assert cached_m == {key: value for key, value in parsed_m.items()
+                                if key not in ('dist_matrix', 'rest_of_cities')}
+    assert len(listdir(tmp_path)) == 6
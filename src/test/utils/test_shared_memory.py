@@ -0,0 +1,73 @@
+from math import inf
+from pickle import dumps, loads
+from numpy import array_equal
+from src.gen_algo_framework.genetic_algorithm import population_fitness_computing
+from src.gen_algo_framework.parallel_evaluation import ParallelEvaluator
+from src.gen_algo_framework.population_utils import generate_population_of_int_permutations
+from src.local_search.permutation import local_search_2_opt
+from src.tsp.euclidean_tsp import build_distance_matrix, edge_weight_function, tour_distance
+from src.utils.input_output import parse_tsp_data, read_file
+from src.utils.shared_memory import SharedArray, share_instance, unshare_instance, release_shared_memory, _blocks
+
+
+def test_share_instance():
+    pr152 = parse_tsp_data(read_file('instances/euc_TSP/pr152.tsp'), 'matrix')
+    dist_matrix = pr152['dist_matrix'].copy()
+    pr152 = share_instance(pr152)
+    assert isinstance(pr152['dist_matrix'], SharedArray)
+    assert array_equal(pr152['dist_matrix'], dist_matrix)
+    assert share_instance(pr152)['dist_matrix'] is pr152['dist_matrix']
+
+    pickled = dumps(pr152['dist_matrix'])
+    assert len(pickled) < 1000 # only the name of the block
+    attached = loads(pickled)
+    assert array_equal(attached, dist_matrix)
+    attached[0, 1] = -1.0 # same memory
+    assert pr152['dist_matrix'][0, 1] == -1.0
+    pr152['dist_matrix'][0, 1] = dist_matrix[0, 1]
+
+    edge_weight_f = loads(dumps(edge_weight_function(pr152)))
+    assert edge_weight_f((3, 7)) == dist_matrix[3, 7]
+
+    row = loads(dumps(pr152['dist_matrix'][2]))
+    assert array_equal(row, dist_matrix[2]) and not isinstance(row, SharedArray)
+    assert array_equal(build_distance_matrix(pr152['cities']), dist_matrix)
+
+    del attached, edge_weight_f
+    pr152 = unshare_instance(pr152)
+    assert not isinstance(pr152['dist_matrix'], SharedArray)
+    release_shared_memory()
+    assert not _blocks
+    assert array_equal(pr152['dist_matrix'], dist_matrix)
+
+
+def test_parallel_evaluator_with_shared_instance():
+    berlin52 = share_instance(parse_tsp_data(read_file('instances/euc_TSP/berlin52.tsp'), 'matrix'))
+    berlin52['target_f'] = tour_distance
+    berlin52['edge_weight_f'] = edge_weight_function(berlin52)
+    berlin52['local_s_iters'] = 1
+    berlin52['ls_delta_eval'] = True
+    population = generate_population_of_int_permutations(6, berlin52['rest_of_cities'])
+
+    results = []
+    for start_method in (None, 'spawn'):
+        options = dict(berlin52)
+        options.update({'f_execs': 0, 'current_best': (inf, None), 'best_fitness_found_history': [],
+                        'population_fit_avgs': [], 'record_interval': 10, 'execs_times_f': [],
+                        'sample_size_for_time_estimation': 0})
+        if start_method is not None:
+            options['population_evaluator'] = ParallelEvaluator(local_search_2_opt, options, 2,
+                                                                start_method=start_method)
+        evaluated = population_fitness_computing(local_search_2_opt, [tour.copy() for tour in population],
+                                                 options, inside_ga_execution=True)
+        if start_method is not None:
+            options['population_evaluator'].shutdown()
+        results.append((evaluated, options['f_execs'], options['best_fitness_found_history']))
+
+    (sequential, sequential_execs, sequential_history), (parallel, parallel_execs, parallel_history) = results
+    assert [fitness for fitness, _ in sequential] == [fitness for fitness, _ in parallel]
+    assert sequential_execs == parallel_execs
+    assert sequential_history == parallel_history
+    del options, berlin52
+    release_shared_memory()
+    assert not _blocks
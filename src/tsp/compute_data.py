@@ -10,12 +10,17 @@ ITERATIONS = 30
 all_instances = ['berlin52', 'ch130', 'eil51', 'kroA100', 'pr152']
 general_output_path = 'results/tsp/'
 general_instance_path = 'instances/euc_TSP/'
+instance_cache_dir = 'instances/.cache/'
 memetic_params = {'replacement': 'full_gen_replacement_elitist',
                   'pop_size': 15,
                   'gens': 15,
                   'mutation_proba': 0.01,
+                  'crossover_proba': 1.0,
                   'local_s_iters': 3,
+                  'ls_delta_eval': True,
                   'max_records': 2000,
+                  'instance_cache_dir': instance_cache_dir,
+                  'distance_backend': 'matrix',
                   'seed': None}
 
 params = {'berlin52':
@@ -46,9 +51,12 @@ for instance_name in all_instances:
             instance['pop_size'] = pop_size
             instance['gens'] = gens
             instance['mutation_proba'] = mutation_proba
+            instance['crossover_proba'] = 1.0 # copies of the parents otherwise
             instance['local_s_iters'] = 0
             instance['replacement'] = replacement_name
             instance['max_records'] = 2000
+            instance['instance_cache_dir'] = instance_cache_dir
+            instance['distance_backend'] = 'matrix' # the cached distances are used without copies
             instance['seed'] = None
         else:
             instance = memetic_params
@@ -72,6 +80,7 @@ for instance_name in all_instances:
                   ', pop_size:', data['pop_size'],
                   ', gens:', data['gens'],
                   ', mutation_proba:', data['mutation_proba'],
+                  ', crossover_proba:', data['crossover_proba'],
                   ', local_s_iters:', data['local_s_iters'],
                   ', seed:', data['seed'])
             print('record size:', len(data['best_fitness_found_history']))
@@ -2,13 +2,16 @@
 to be used in the genetic algorithm.'''
 
 from time import time
-from typing import List, Tuple
-from math import sqrt, inf
+from random import sample
+from itertools import product
+from typing import Callable, Dict, List, Sequence, Tuple
+from math import sqrt, inf, prod
+from numpy import argsort, array, asarray, empty, float32, float64, floor, int32, int64, integer, intp, ndarray
+from numpy import maximum, minimum, where
 
-from src.gen_algo_framework.genetic_algorithm import Population, population_fitness_computing
-from src.gen_algo_framework.population_utils import transform_to_max
-from src.gen_algo_framework.selection import cumulative_fitness
-from src.local_search.permutation import local_search_2_opt
+from src.gen_algo_framework.genetic_algorithm import Population, population_fitness_computing, record_f_exec
+from src.gen_algo_framework.population_utils import fitness_values_to_max, population_fitness_values
+from src.local_search.permutation import swap_move_delta
 
 
 EucCity = Tuple[float | int, ...]
@@ -18,6 +21,11 @@ EucTSPPermutation = List[EucCity]
 '''Type for solutions. Does not
 include de first city.'''
 
+IndexTSPPermutation = ndarray
+'''Type for solutions of the distance matrix
+backend, integer ids of the cities. Does not
+include de first city (id 0).'''
+
 
 def euclidean_distance(u: EucCity, v: EucCity) -> float:
     '''
@@ -49,6 +57,9 @@ def tour_distance(seq_of_cities: EucTSPPermutation,
             - 'weights' (dict): A dictionary where keys are tuples of
                 city pairs (u, v) and values are the Euclidean
                 distances between those cities.
+            - 'dist_matrix' (ndarray): Only with the distance matrix
+                backend, used instead of 'weights' when present. The
+                tour and 'fst_city' are then integer ids of the cities.
         inside_ga_execution (bool): Flag to indicate that the function is being used
             inside a genetic algorithm execution.
     Returns:
@@ -61,22 +72,21 @@ def tour_distance(seq_of_cities: EucTSPPermutation,
     if inside_ga_execution and measuring_time:
         start = time()
 
-    if inside_ga_execution:
-        options['f_execs'] += 1
     fst_city = options['fst_city']
-    weights = options['weights']
 
-    distance = weights[(fst_city, seq_of_cities[0])]
-    distance += weights[(seq_of_cities[-1], fst_city)]
+    if 'dist_matrix' in options:
+        distance = matrix_tour_distance(seq_of_cities, fst_city, options['dist_matrix'])
+    else:
+        weights = options['weights']
 
-    for i in range(1, len(seq_of_cities)):
-        distance += weights[(seq_of_cities[i - 1], seq_of_cities[i])]
+        distance = weights[(fst_city, seq_of_cities[0])]
+        distance += weights[(seq_of_cities[-1], fst_city)]
 
-    if inside_ga_execution and distance < options['current_best'][0]:
-        options['current_best'] = distance, seq_of_cities
+        for i in range(1, len(seq_of_cities)):
+            distance += weights[(seq_of_cities[i - 1], seq_of_cities[i])]
 
-    if inside_ga_execution and options['f_execs'] % options['record_interval'] == 0:
-        options['best_fitness_found_history'].append(round(options['current_best'][0], 4))
+    if inside_ga_execution:
+        record_f_exec(distance, seq_of_cities, options)
 
     if inside_ga_execution and measuring_time:
         end = time()
@@ -90,6 +100,284 @@ def tour_distance(seq_of_cities: EucTSPPermutation,
     return distance
 
 
+def matrix_tour_distance(seq_of_cities: Sequence[int],
+                         fst_city: int,
+                         dist_matrix: ndarray) -> float:
+    '''
+    Calculate the total distance of a TSP tour given as integer
+    ids of the cities, using a distance matrix.
+    Args:
+        seq_of_cities (Sequence[int]): Ids of the cities in the tour,
+            excluding the starting city.
+        fst_city (int): Id of the first city in the tour.
+        dist_matrix (ndarray): Matrix with the distance between each
+            pair of cities, indexed by their ids.
+    Returns:
+        float: The total distance of the tour, including the return to
+        the starting city.
+    '''
+    tour = asarray(seq_of_cities)
+    distance = dist_matrix[fst_city, tour[0]] + dist_matrix[tour[-1], fst_city]
+    distance += dist_matrix[tour[:-1], tour[1:]].sum()
+    return float(distance)
+
+
+def swap_mutation_with_delta(individual: EucTSPPermutation,
+                             options: dict) -> Tuple[EucTSPPermutation, float]:
+    '''
+    Applies a swap mutation to the given tour (like swap_mutation) and
+    computes in O(1) the change in its distance.
+    Args:
+        individual (EucTSPPermutation): The tour to be mutated.
+        options (dict): The instance, with the keys 'fst_city' and
+            'edge_weight_f'.
+    Returns:
+        Tuple[EucTSPPermutation, float]: The mutated tour and the
+            change in its distance.
+    '''
+    i, j = sorted(sample(range(len(individual)), 2))
+    delta = swap_move_delta(individual, i, j, options['fst_city'], options['edge_weight_f'])
+    individual[i], individual[j] = individual[j], individual[i]
+    return individual, delta
+
+
+def canonical_tour_key(seq_of_cities: EucTSPPermutation) -> Tuple:
+    '''
+    Returns a hashable key identifying the tour regardless of its
+    direction, the rotation is already fixed by the starting city
+    (not included in the sequence).
+    Args:
+        seq_of_cities (EucTSPPermutation): Cities in the tour,
+            excluding the starting city.
+    Returns:
+        Tuple: Same key for a tour and its reverse.
+    '''
+    if isinstance(seq_of_cities, ndarray):
+        seq_of_cities = seq_of_cities.tolist()
+    if seq_of_cities[0] <= seq_of_cities[-1]:
+        return tuple(seq_of_cities)
+    return tuple(reversed(seq_of_cities))
+
+
+def edge_weight_function(options: dict) -> Callable[[Tuple], float]:
+    '''
+    Returns a function that gives the weight (distance) of an edge
+    (u, v) of the instance, for either distance backend.
+    Args:
+        options (dict): The instance, with 'dist_matrix' or 'weights'.
+    Returns:
+        Callable[[Tuple], float]: Function mapping an edge to its weight.
+    '''
+    if 'dist_matrix' in options:
+        return options['dist_matrix'].__getitem__
+    return options['weights'].__getitem__
+
+
+def build_distance_matrix(cities: Sequence[EucCity],
+                          rows_per_block: int = 256) -> ndarray:
+    '''
+    Build a dense matrix with the Euclidean distance between each
+    pair of cities, the rows and columns are indexed by the position
+    of the cities in the given sequence (their integer ids).
+    Args:
+        cities (Sequence[EucCity]): The cities of the instance.
+        rows_per_block (int): Rows computed at once, bounds the size
+            of the temporary arrays used.
+    Returns:
+        ndarray: A (n, n) float64 matrix of distances.
+    '''
+    coords = array(cities, dtype=float64)
+    size = len(coords)
+    dist_matrix = empty((size, size), dtype=float64)
+
+    for start in range(0, size, rows_per_block):
+        end = min(start + rows_per_block, size)
+        diff = coords[start:end, None, :] - coords[None, :, :]
+        dist_matrix[start:end] = (diff**2).sum(axis=-1)**0.5
+
+    return dist_matrix
+
+
+class CompactDistanceMatrix:
+    '''
+    Distance matrix stored with less memory than the dense float64
+    one: only its upper triangle (condensed, n * (n - 1) / 2 entries)
+    and/or the distances as float32 or rounded to the nearest integer
+    (TSPLIB nint, as int32). It is indexed like the dense matrix,
+    m[i, j] with ids or (broadcastable) arrays of ids, and the
+    distances are returned as float64, so it can be used as the
+    'dist_matrix' of an instance.
+    '''
+
+    def __init__(self, values: ndarray, size: int, condensed: bool) -> None:
+        '''
+        Args:
+            values (ndarray): The stored distances, the (n, n) matrix or
+                its upper triangle row by row.
+            size (int): Number of cities n.
+            condensed (bool): If values is the upper triangle.
+        '''
+        self.values = values
+        self.size = size
+        self.condensed = condensed
+        self.shape = size, size
+
+    def __getitem__(self, key: Tuple) -> float | ndarray:
+        i, j = key
+        if isinstance(i, (int, integer)) and isinstance(j, (int, integer)): # single edge, no arrays
+            if not self.condensed:
+                return float(self.values[i, j])
+            if i == j:
+                return 0.0
+            low, high = (int(i), int(j)) if i < j else (int(j), int(i))
+            return float(self.values[low * (2 * self.size - low - 3) // 2 + high - 1])
+
+        if not self.condensed:
+            return self.values[i, j].astype(float64)
+
+        i, j = asarray(i, dtype=int64), asarray(j, dtype=int64)
+        low, high = minimum(i, j), maximum(i, j)
+        position = low * (2 * self.size - low - 3) // 2 + high - 1
+        # the diagonal (low == high) reads a valid position, masked as 0
+        return where(low == high, 0.0, self.values[position].astype(float64))
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        '''Memory used by the stored distances.'''
+        return self.values.nbytes
+
+
+distance_storages = ('float64', 'float32', 'nint', 'condensed', 'condensed_float32', 'condensed_nint')
+'''Ways to store the distances of the matrix backend, see
+build_compact_distance_matrix.'''
+
+
+def build_compact_distance_matrix(cities: Sequence[EucCity],
+                                  storage: str,
+                                  rows_per_block: int = 256) -> CompactDistanceMatrix:
+    '''
+    Build the distances between each pair of cities like
+    build_distance_matrix, stored as given by storage.
+    Args:
+        cities (Sequence[EucCity]): The cities of the instance.
+        storage (str): 'float32' or 'nint' for a dense matrix with
+            those distances, 'condensed' for the upper triangle with
+            float64 distances, 'condensed_float32' or 'condensed_nint'.
+        rows_per_block (int): Rows computed at once, bounds the size
+            of the temporary arrays used.
+    Returns:
+        CompactDistanceMatrix: The distances, without building the
+            dense float64 matrix.
+    '''
+    assert storage in distance_storages[1:], f'Unknown distance storage: {storage}'
+    condensed = storage.startswith('condensed')
+    value_type = storage.removeprefix('condensed').removeprefix('_') or 'float64'
+    dtype = {'float64': float64, 'float32': float32, 'nint': int32}[value_type]
+
+    coords = array(cities, dtype=float64)
+    size = len(coords)
+    values = empty(size * (size - 1) // 2 if condensed else (size, size), dtype=dtype)
+
+    position = 0
+    for start in range(0, size, rows_per_block):
+        end = min(start + rows_per_block, size)
+        diff = coords[start:end, None, :] - coords[None, :, :]
+        block = (diff**2).sum(axis=-1)**0.5
+        if value_type == 'nint':
+            block = floor(block + 0.5)
+        if not condensed:
+            values[start:end] = block
+            continue
+        for row, i in enumerate(range(start, end)):
+            values[position:position + size - i - 1] = block[row, i + 1:]
+            position += size - i - 1
+
+    return CompactDistanceMatrix(values, size, condensed)
+
+
+def __grid_cells(coords: ndarray) -> Tuple[Dict[Tuple[int, ...], List[int]], ndarray, float]:
+    '''
+    Buckets the given points into a uniform grid of cubic cells,
+    sized so that each cell holds about two points on average.
+    Dimensions narrower than a cell are not split.
+    Returns:
+        Tuple[Dict[Tuple[int, ...], List[int]], ndarray, float]: The
+            non empty cells with the indices of their points, the cell
+            of each point and the side of the cells.
+    '''
+    mins = coords.min(axis=0)
+    extents = (coords.max(axis=0) - mins).tolist()
+    target_cells = max(len(coords) / 2, 1)
+
+    cell_side = max(extents) if max(extents) > 0 else 1.0
+    split_extents = [extent for extent in extents if extent > 0]
+    while split_extents:
+        cell_side = (prod(split_extents) / target_cells)**(1 / len(split_extents))
+        narrow = [extent for extent in split_extents if extent < cell_side]
+        if not narrow:
+            break
+        split_extents = [extent for extent in split_extents if extent >= cell_side]
+
+    point_cells = floor((coords - mins) / cell_side).astype(intp)
+
+    cells: Dict[Tuple[int, ...], List[int]] = {}
+    for i, cell in enumerate(map(tuple, point_cells.tolist())):
+        cells.setdefault(cell, []).append(i)
+    return cells, point_cells, cell_side
+
+
+def build_neighbor_lists(cities: Sequence[EucCity], k: int) -> ndarray:
+    '''
+    Computes the k nearest neighbors of each city using a uniform grid
+    as spatial index: the cells around the city are visited in growing
+    shells until the k-th nearest candidate found is closer than any
+    city in the shells not yet visited.
+    Args:
+        cities (Sequence[EucCity]): The cities, indexed by their ids.
+        k (int): Number of neighbors per city (at most n - 1).
+    Returns:
+        ndarray: A (n, k) integer matrix, row i has the ids of the
+            neighbors of city i sorted by increasing distance.
+    '''
+    coords = array(cities, dtype=float64)
+    size = len(coords)
+    k = min(k, size - 1)
+    cells, point_cells, cell_side = __grid_cells(coords)
+    neighbor_lists = empty((size, k), dtype=intp)
+
+    last_cell = point_cells.max(axis=0).tolist()
+
+    for i in range(size):
+        center = point_cells[i].tolist()
+        candidates: List[int] = []
+        radius = 0
+        while True:
+            offset_ranges = [range(max(-radius, -c), min(radius, last - c) + 1)
+                             for c, last in zip(center, last_cell)]
+            for offset in product(*offset_ranges):
+                if max(map(abs, offset), default=0) != radius:
+                    continue    # cell already visited in a previous shell
+                cell = tuple(c + o for c, o in zip(center, offset))
+                candidates.extend(cells.get(cell, ()))
+
+            if len(candidates) > k:
+                candidates_arr = array(candidates)
+                distances = ((coords[candidates_arr] - coords[i])**2).sum(axis=1)**0.5
+                order = argsort(distances, kind='stable')
+                # nearest k candidates, skipping the city itself
+                nearest = [c for c in candidates_arr[order[:k + 1]].tolist() if c != i][:k]
+                kth_distance = distances[order[k]]
+                if kth_distance <= radius * cell_side or len(candidates) == size:
+                    neighbor_lists[i] = nearest
+                    break
+            radius += 1
+
+    return neighbor_lists
+
+
 def build_weight_dict(fst_city: EucCity,
                       rest_of_cities: EucTSPPermutation) -> dict:
     '''
@@ -134,10 +422,15 @@ def simple_euc_tsp_options_handler(population: Population[EucTSPPermutation],
         options['next_gen_pop_s'] = population_size
         options['total_f_execs'] = population_size * options['gens']
         options['execs_times_f'] = []
+        options['edge_weight_f'] = edge_weight_function(options)
 
         local_s_iters = options['local_s_iters']
         if local_s_iters > 0:
             options['target_f'] = tour_distance
+            if options.get('local_search') == '2_opt_neighbor_lists':
+                assert 'dist_matrix' in options, 'Neighbor lists need the matrix distance backend.'
+                options['neighbor_lists'] = build_neighbor_lists(options['cities'],
+                                                                 options.get('ls_neighbors', 10))
             gene_set_size = len(population[0]) + 1
             options['total_f_execs'] *= ((gene_set_size - 2) * (gene_set_size - 3) * local_s_iters) // 2 + 1
 
@@ -146,7 +439,7 @@ def simple_euc_tsp_options_handler(population: Population[EucTSPPermutation],
         options['record_interval'] = max(options['total_f_execs'] // options['max_records'], 1)
         return options
 
-    pop_only_fitness_values = [(x[0], None) for x in population]
-    pop_only_fitness_values = transform_to_max(pop_only_fitness_values) # pyright: ignore
-    options['c_fitness_l'] = cumulative_fitness(pop_only_fitness_values) # pyright: ignore
+    if options.get('selection', 'roulette_wheel_selection') == 'roulette_wheel_selection':
+        max_fitness_values = fitness_values_to_max(population_fitness_values(population))
+        options['c_fitness_l'] = max_fitness_values.cumsum().tolist()
     return options
@@ -3,48 +3,123 @@ from time import time
 from typing import Tuple
 from ast import literal_eval
 from collections.abc import Collection
-from src.utils.input_output import parse_tsp_data, read_file, write_file, write_line_to_csv_file, tsp_solution_to_lines
+from numpy import intp
+from src.utils.input_output import read_tsp_instance, write_file, write_line_to_csv_file, tsp_solution_to_lines
 from src.utils.others import seed_in_use
+from src.utils.shared_memory import share_instance, unshare_instance, release_shared_memory
 from src.gen_algo_framework.replacement import all_replacement_funcs
 from src.gen_algo_framework.genetic_algorithm import genetic_algorithm, population_fitness_computing, T
-from src.gen_algo_framework.selection import roulette_wheel_selection
+from src.gen_algo_framework.genetic_algorithm import new_fitness_cache, cached_fitness_f
+from src.gen_algo_framework.selection import all_selection_funcs
+from src.gen_algo_framework.island_model import island_model_ga, merge_islands_history
+from src.gen_algo_framework.parallel_evaluation import ParallelEvaluator
 from src.gen_algo_framework.crossover import order_crossover_ox1
 from src.gen_algo_framework.mutation import swap_mutation
-from src.gen_algo_framework.population_utils import generate_population_of_permutations
-from src.local_search.permutation import local_search_2_opt
-from src.tsp.euclidean_tsp import tour_distance, simple_euc_tsp_options_handler
+from src.gen_algo_framework.population_utils import generate_population_of_permutations, generate_population_of_int_permutations
+from src.gen_algo_framework.population_utils import ArrayPopulation
+from src.local_search.permutation import all_local_search_funcs
+from src.tsp.euclidean_tsp import tour_distance, simple_euc_tsp_options_handler, swap_mutation_with_delta
+from src.tsp.euclidean_tsp import canonical_tour_key, edge_weight_function
 
 
 def genetic_algorithm_for_euctsp(instance_file_path: str,
                                  params: dict) -> Tuple[T, dict]:
 
-    instance: dict = parse_tsp_data(read_file(instance_file_path))
+    distance_backend = params.get('distance_backend', 'dict')
+    instance: dict = read_tsp_instance(instance_file_path, distance_backend, params.get('instance_cache_dir'),
+                                       params.get('distance_storage', 'float64'))
     for key, value in params.items():
         instance[key] = value
 
     instance['seed'] = seed_in_use(instance['seed'])
-
-    fitness_function: callable = tour_distance
-    if instance['local_s_iters'] > 0:
-        fitness_function: callable = local_search_2_opt
-
-    replacement_function: callable = all_replacement_funcs[instance['replacement']]
-
-    initial_population = generate_population_of_permutations(instance['pop_size'], set(instance['rest_of_cities']))
-    instance = simple_euc_tsp_options_handler(initial_population, instance, True)
-    initial_population = population_fitness_computing(tour_distance, initial_population, instance)
-
-
-    best_found = genetic_algorithm(population=initial_population,
-                                   selection=roulette_wheel_selection,
-                                   crossover=order_crossover_ox1,
-                                   mutation=swap_mutation,
-                                   fitness_f=fitness_function,
-                                   replacement=replacement_function,
-                                   term_cond=lambda gen_count, _ : gen_count < instance['gens'],
-                                   options_handler=simple_euc_tsp_options_handler,
-                                   options=instance)
-    instance['best_fitness_found_history'].append(best_found[0])
+    if instance.get('shared_memory', False): # arrays used by the processes without copies
+        share_instance(instance)
+
+    evaluator = None
+    try:
+        fitness_function: callable = tour_distance
+        if instance['local_s_iters'] > 0:
+            fitness_function: callable = all_local_search_funcs[instance.get('local_search', '2_opt')]
+        else: # offspring copied from scored parents are mutated and scored in O(1)
+            instance['mutation_deltas'] = {swap_mutation: swap_mutation_with_delta}
+
+        evaluated_function = fitness_function # without the cache, for the parallel evaluator and the islands
+        cache = None
+        if instance.get('fitness_cache_size', 0) > 0: # memoize tours already scored
+            cache = new_fitness_cache(instance['fitness_cache_size'], canonical_tour_key)
+            fitness_function = cached_fitness_f(fitness_function, cache)
+
+        replacement_function: callable = all_replacement_funcs[instance['replacement']]
+        selection_function: callable = all_selection_funcs[instance.get('selection', 'roulette_wheel_selection')]
+
+        n_islands = instance.get('islands', 1)
+        if distance_backend == 'matrix':
+            populations = [generate_population_of_int_permutations(instance['pop_size'], instance['rest_of_cities'])
+                           for _ in range(n_islands)]
+        else:
+            populations = [generate_population_of_permutations(instance['pop_size'], set(instance['rest_of_cities']))
+                           for _ in range(n_islands)]
+        instance = simple_euc_tsp_options_handler(populations[0], instance, True)
+        if instance.get('shared_memory', False):
+            share_instance(instance)
+        populations = [population_fitness_computing(tour_distance, population, instance) for population in populations]
+        if instance.get('array_population', False): # fitness array and genome matrix reused every generation
+            genes_dtype = intp if distance_backend == 'matrix' else None
+            populations = [ArrayPopulation.from_population(population, genes_dtype) for population in populations]
+
+        if n_islands > 1:
+            best_found, islands_data = island_model_ga(populations=populations,
+                                                       selection=selection_function,
+                                                       crossover=order_crossover_ox1,
+                                                       mutation=swap_mutation,
+                                                       fitness_f=evaluated_function,
+                                                       replacement=replacement_function,
+                                                       options_handler=simple_euc_tsp_options_handler,
+                                                       options=instance,
+                                                       generations=instance['gens'],
+                                                       migration_interval=instance.get('migration_interval', 10),
+                                                       n_migrants=instance.get('n_migrants', 1),
+                                                       topology=instance.get('topology', 'ring'),
+                                                       migrant_selection=instance.get('migrant_selection', 'best'),
+                                                       cache_size=instance.get('fitness_cache_size', 0),
+                                                       cache_key_f=canonical_tour_key)
+            instance['islands_data'] = islands_data
+            if cache is not None: # each island has its own cache
+                instance['fitness_cache_hits'] = sum(island_data['fitness_cache_hits'] for island_data in islands_data)
+                instance['fitness_cache_misses'] = sum(island_data['fitness_cache_misses'] for island_data in islands_data)
+            # best found by all the islands after each record of their executions
+            instance['f_execs'] = sum(island_data['f_execs'] for island_data in islands_data)
+            instance['best_fitness_found_history'] = merge_islands_history(islands_data, instance['record_interval'])
+        else:
+            if instance.get('eval_workers', 1) > 1: # evaluate the offspring in parallel
+                evaluator = ParallelEvaluator(evaluated_function, instance, instance['eval_workers'],
+                                              start_method=instance.get('mp_start_method'), cache=cache)
+                instance['population_evaluator'] = evaluator
+
+            best_found = genetic_algorithm(population=populations[0],
+                                           selection=selection_function,
+                                           crossover=order_crossover_ox1,
+                                           mutation=swap_mutation,
+                                           fitness_f=fitness_function,
+                                           replacement=replacement_function,
+                                           term_cond=lambda gen_count, _ : gen_count < instance['gens'],
+                                           options_handler=simple_euc_tsp_options_handler,
+                                           options=instance)
+
+            if cache is not None:
+                instance['fitness_cache_hits'] = cache['hits']
+                instance['fitness_cache_misses'] = cache['misses']
+
+        instance['best_fitness_found_history'].append(float(best_found[0]))
+    finally:
+        if evaluator is not None:
+            evaluator.shutdown()
+            instance.pop('population_evaluator', None)
+        if instance.get('shared_memory', False): # the returned instance keeps private copies
+            unshare_instance(instance)
+            if 'edge_weight_f' in instance:
+                instance['edge_weight_f'] = edge_weight_function(instance)
+            release_shared_memory()
     return best_found, instance
 
 
@@ -77,5 +152,7 @@ if __name__ == "__main__":
 
     end = time()
     print('runtime in seconds:', end - start)
+    for island, island_data in enumerate(data.get('islands_data', [])):
+        print(f'best fitness found by island {island}:', island_data['current_best'][0])
     print('best fitness found:', result[0])
     __write_results(result, data, OUTPUT_FILE_PATH)
\ No newline at end of file
@@ -1,23 +1,28 @@
 
 from statistics import mean, median, stdev
-from numpy import ndarray
+from numpy import append, concatenate, ndarray, zeros
 from src.utils.input_output import read_lines_from_csv_file
 from src.utils.plot_functions import box_plot, generate_line_from_data, plot_evolution
 
 
 def get_results_and_performance_avgs_for_executions(executions_data_path: str) -> ndarray:
-    accumulated_sum = None
-    number_executions = 0
+    # the records of each execution end with its result, executions that
+    # skipped evaluations have less records: each record is averaged over
+    # the executions that reached it
+    accumulated_sum = zeros(0)
+    executions_per_record = zeros(0)
     results = []
     for single_exec in read_lines_from_csv_file(executions_data_path):
         results.append(single_exec[-1])
-        number_executions += 1
-        if accumulated_sum is None:
-            accumulated_sum = single_exec
-        else:
-            accumulated_sum += single_exec
-
-    return accumulated_sum / number_executions, results # pyright: ignore
+        records = single_exec[:-1]
+        if len(records) > len(accumulated_sum):
+            accumulated_sum = concatenate((accumulated_sum, zeros(len(records) - len(accumulated_sum))))
+            executions_per_record = concatenate((executions_per_record,
+                                                 zeros(len(records) - len(executions_per_record))))
+        accumulated_sum[:len(records)] += records
+        executions_per_record[:len(records)] += 1
+
+    return append(accumulated_sum / executions_per_record, mean(results)), results # pyright: ignore
 
 
 def calculate_statistics(data):
@@ -1,15 +1,19 @@
 '''Module with functions for reading and writing files'''
 
-from os.path import dirname
-from os import makedirs
+from os.path import dirname, exists, join
+from os import getpid, makedirs, replace
+from json import dump, load
+from hashlib import sha256
 from ast import literal_eval
 from itertools import islice
 from typing import Callable, List, Tuple, Generator
 from traceback import print_exc
 from csv import writer, reader
-from numpy import array, ndarray
+from numpy import arange, array, empty, float64, intp, ndarray
+from numpy import load as load_array, save as save_array
 
-from src.tsp.euclidean_tsp import EucCity, EucTSPPermutation, build_weight_dict
+from src.tsp.euclidean_tsp import EucCity, EucTSPPermutation, build_weight_dict, build_distance_matrix
+from src.tsp.euclidean_tsp import CompactDistanceMatrix, build_compact_distance_matrix
 
 
 def read_file(file_path: str) -> List[str]:
@@ -72,9 +76,20 @@ def to_number(num_as_str: str) -> float | int:
     raise ValueError(f"'{num_as_str}' is not a valid number")
 
 
-def parse_tsp_data(lines_of_the_file: List[str]) -> dict:
+def parse_tsp_data(lines_of_the_file: List[str],
+                   distance_backend: str = 'dict',
+                   distance_storage: str = 'float64') -> dict:
     '''Extracts and parses the tsp instance details from
-    a list of lines.'''
+    a list of lines.
+
+    With the 'dict' distance backend the cities are their
+    coordinates and the distances are stored in 'weights'.
+    With the 'matrix' backend each city is mapped to an integer
+    id (its position in 'cities', 0 for the first city), the tours
+    are integer arrays and the distances are stored in the
+    'dist_matrix' array. For big instances distance_storage can keep
+    less memory, e.g. 'condensed_float32' (see distance_storages in
+    euclidean_tsp), with the same indexing of 'dist_matrix'.'''
 
     instance_details = {'SOLUTION': False, 'NAME': None,
         'TYPE': None, 'COMMENT': None, 'DIMENSION': None,
@@ -118,6 +133,21 @@ def parse_tsp_data(lines_of_the_file: List[str]) -> dict:
     assert instance_details['DIMENSION'] == (
         len(instance_details['rest_of_cities']) + 1)
 
+    instance_details['distance_backend'] = distance_backend
+
+    if distance_backend == 'matrix':
+        cities = [instance_details['fst_city']] + instance_details['rest_of_cities']
+        instance_details['cities'] = cities
+        if distance_storage == 'float64':
+            instance_details['dist_matrix'] = build_distance_matrix(cities)
+        else:
+            instance_details['dist_matrix'] = build_compact_distance_matrix(cities, distance_storage)
+        instance_details['fst_city'] = 0
+        instance_details['rest_of_cities'] = arange(1, len(cities), dtype=intp)
+        return instance_details
+
+    assert distance_backend == 'dict', f'Unknown distance backend: {distance_backend}'
+
     instance_details['weights'] = build_weight_dict(
         instance_details['fst_city'],
         instance_details['rest_of_cities'])
@@ -125,6 +155,109 @@ def parse_tsp_data(lines_of_the_file: List[str]) -> dict:
     return instance_details
 
 
+__NOT_HEADER_KEYS = ('ids', 'fst_city', 'rest_of_cities', 'cities', 'dist_matrix', 'weights', 'distance_backend')
+
+
+def read_tsp_instance(file_path: str,
+                      distance_backend: str = 'dict',
+                      cache_dir: str | None = None,
+                      distance_storage: str = 'float64') -> dict:
+    '''Reads and parses a tsp instance (like parse_tsp_data).
+
+    With a cache directory, the first time an instance file is read
+    its parsed data is written there (a .json file with the header
+    and the cities, and a .npy file with the distances, named after
+    the hash of the instance file), the next reads load them and
+    memory-map the distances instead of computing them again. The
+    result is the same as parsing the file.'''
+
+    if cache_dir is None:
+        return parse_tsp_data(read_file(file_path), distance_backend, distance_storage)
+
+    with open(file_path, 'rb') as file:
+        file_hash = sha256(file.read()).hexdigest()
+    metadata_path = join(cache_dir, file_hash + '.json')
+    distances_file = f'{file_hash}_{distance_backend}'
+    if distance_backend == 'matrix' and distance_storage != 'float64':
+        distances_file += '_' + distance_storage
+    distances_path = join(cache_dir, distances_file + '.npy')
+
+    if exists(metadata_path) and exists(distances_path):
+        instance = __load_cached_tsp_instance(metadata_path, distances_path, distance_backend, distance_storage)
+        print(f"Loaded cached instance of file '{file_path}'")
+        return instance
+
+    instance = parse_tsp_data(read_file(file_path), distance_backend, distance_storage)
+    __write_tsp_instance_cache(instance, metadata_path, distances_path)
+    return instance
+
+
+def __write_tsp_instance_cache(instance: dict, metadata_path: str, distances_path: str) -> None:
+    makedirs(dirname(metadata_path), exist_ok=True)
+    if instance['distance_backend'] == 'matrix':
+        cities = instance['cities']
+        distances = instance['dist_matrix']
+        if isinstance(distances, CompactDistanceMatrix):
+            distances = distances.values
+    else: # the exact distances of the weights dictionary
+        cities = [instance['fst_city']] + instance['rest_of_cities']
+        weights = instance['weights']
+        distances = empty((len(cities), len(cities)), dtype=float64)
+        for i, u in enumerate(cities):
+            distances[i] = [weights[(u, v)] if u != v else 0.0 for v in cities]
+
+    metadata = {key: value for key, value in instance.items() if key not in __NOT_HEADER_KEYS}
+    metadata['cities'] = cities
+    metadata['ids'] = list(instance['ids'].items())
+
+    # written to temporary files first, other executions may be reading them
+    tmp_suffix = f'.{getpid()}.tmp'
+    with open(metadata_path + tmp_suffix, 'w', encoding='utf-8') as file:
+        dump(metadata, file)
+    with open(distances_path + tmp_suffix, 'wb') as file:
+        save_array(file, distances)
+    replace(metadata_path + tmp_suffix, metadata_path)
+    replace(distances_path + tmp_suffix, distances_path)
+
+
+def __load_cached_tsp_instance(metadata_path: str,
+                               distances_path: str,
+                               distance_backend: str,
+                               distance_storage: str) -> dict:
+    with open(metadata_path, 'r', encoding='utf-8') as file:
+        metadata = load(file)
+
+    cities = [tuple(city) for city in metadata.pop('cities')]
+    instance = metadata
+    instance['ids'] = {tuple(city): city_id for city, city_id in instance['ids']}
+    instance['distance_backend'] = distance_backend
+    distances = load_array(distances_path, mmap_mode='r')
+
+    if distance_backend == 'matrix':
+        instance['cities'] = cities
+        instance['dist_matrix'] = distances
+        if distance_storage != 'float64':
+            instance['dist_matrix'] = CompactDistanceMatrix(distances, len(cities),
+                                                            distance_storage.startswith('condensed'))
+        instance['fst_city'] = 0
+        instance['rest_of_cities'] = arange(1, len(cities), dtype=intp)
+        return instance
+
+    instance['fst_city'] = cities[0]
+    instance['rest_of_cities'] = cities[1:]
+    distances = distances.tolist()
+    order = list(range(1, len(cities))) + [0] # same as build_weight_dict
+    weights = {}
+    for i_pos, i in enumerate(order):
+        u, row = cities[i], distances[i]
+        for j in order[i_pos + 1:]:
+            v = cities[j]
+            weights[(u, v)] = row[j]
+            weights[(v, u)] = row[j]
+    instance['weights'] = weights
+    return instance
+
+
 def tsp_solution_to_lines(fst_city: EucCity,
                           rest_of_cities: EucTSPPermutation,
                           instance: dict) -> List[str]:
@@ -132,6 +265,11 @@ def tsp_solution_to_lines(fst_city: EucCity,
     a line in a file.'''
     vertex_id = instance['ids']
 
+    if instance.get('distance_backend') == 'matrix': # ids to coordinates
+        cities = instance['cities']
+        fst_city = cities[fst_city]
+        rest_of_cities = [cities[city_id] for city_id in rest_of_cities]
+
     list_of_lines = []
     list_of_lines.append(f"NAME: {instance['NAME']}\n")
     list_of_lines.append(f"TYPE: {instance['TYPE']}\n")
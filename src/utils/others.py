@@ -4,8 +4,9 @@ Module for various auxiliar and utils functions.
 
 from os import urandom
 from math import ceil
-from random import seed
+from random import seed, getrandbits
 from typing import List, Tuple
+from numpy.random import Generator, default_rng
 
 def seed_in_use(seed_to_use: int |
                 float | str |
@@ -30,6 +31,22 @@ def seed_in_use(seed_to_use: int |
     return seed_to_use
 
 
+def numpy_rng(options: dict) -> Generator:
+    '''
+    Returns the NumPy random generator of the execution, stored in
+    options['np_rng']. It is created the first time seeded from the
+    random module, so the seed in use also makes it reproducible.
+    Args:
+        options (dict): The options of the execution.
+    Returns:
+        Generator: The NumPy random generator.
+    '''
+    rng = options.get('np_rng')
+    if rng is None:
+        rng = options['np_rng'] = default_rng(getrandbits(64))
+    return rng
+
+
 def compute_generational_avgs(multiple_ga_execs_data: List[List[Tuple]]) -> List[List[float]]:
     n_executions = len(multiple_ga_execs_data)
     n_generations = len(multiple_ga_execs_data[0])
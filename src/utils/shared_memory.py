@@ -0,0 +1,131 @@
+'''
+Module to place the arrays of an instance (e.g. the distance
+matrix) in shared memory, so other processes use them without
+copying them.
+'''
+
+from os import getpid
+from gc import collect
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Sequence
+from numpy import dtype, ndarray
+
+
+_blocks: Dict[str, SharedMemory] = {}   # blocks in use by this process
+_opened_by: Dict[str, int] = {}         # process that created or attached each block
+_created_blocks = set()                 # blocks to free when released
+
+
+class SharedArray(ndarray):
+    '''
+    Array whose data is a block of shared memory. When pickled (e.g. sent
+    to another process) only the name of the block is sent, and the
+    receiving process attaches to it. Views and results of operations
+    are pickled as regular arrays.
+    '''
+
+    def __reduce__(self):
+        shm_name = getattr(self, 'shm_name', None)
+        if shm_name is None:
+            return ndarray.__reduce__(self.view(ndarray).copy())
+        return attach_shared_array, (shm_name, self.shape, self.dtype.str)
+
+
+def attach_shared_array(shm_name: str, shape: tuple, dtype_str: str) -> SharedArray:
+    '''
+    Returns the array in the shared memory block with the given name.
+    Args:
+        shm_name (str): Name of the block.
+        shape (tuple): Shape of the array.
+        dtype_str (str): Type of the array, as given by dtype.str.
+    Returns:
+        SharedArray: The array, without copying its data.
+    '''
+    if shm_name not in _blocks:
+        _blocks[shm_name] = SharedMemory(name=shm_name)
+        _opened_by[shm_name] = getpid()
+    shared_array = ndarray(shape, dtype=dtype(dtype_str), buffer=_blocks[shm_name].buf).view(SharedArray)
+    shared_array.shm_name = shm_name
+    return shared_array
+
+
+def to_shared_array(array: ndarray) -> SharedArray:
+    '''
+    Copies the array to a new block of shared memory.
+    Args:
+        array (ndarray): The array to copy.
+    Returns:
+        SharedArray: The array in shared memory.
+    '''
+    block = SharedMemory(create=True, size=max(array.nbytes, 1))
+    _blocks[block.name] = block
+    _opened_by[block.name] = getpid()
+    _created_blocks.add(block.name)
+    shared_array = attach_shared_array(block.name, array.shape, array.dtype.str)
+    shared_array[...] = array
+    return shared_array
+
+
+def share_instance(instance: dict,
+                   keys: Sequence[str] = ('dist_matrix', 'rest_of_cities', 'neighbor_lists')) -> dict:
+    '''
+    Places the arrays of the instance with the given keys (if present) in
+    shared memory. The instance can then be sent to other processes
+    without copying those arrays. Arrays already shared are kept. For
+    objects that keep their data in a 'values' array (CompactDistanceMatrix)
+    that array is shared.
+    Args:
+        instance (dict): The instance (e.g. parsed with the matrix
+            distance backend).
+        keys (Sequence[str]): Keys of the arrays to share.
+    Returns:
+        dict: The same instance, with the shared arrays.
+    '''
+    for key in keys:
+        value = instance.get(key)
+        if isinstance(value, ndarray) and getattr(value, 'shm_name', None) is None:
+            instance[key] = to_shared_array(value)
+        elif isinstance(getattr(value, 'values', None), ndarray) and getattr(value.values, 'shm_name', None) is None:
+            value.values = to_shared_array(value.values)
+    return instance
+
+
+def unshare_instance(instance: dict,
+                     keys: Sequence[str] = ('dist_matrix', 'rest_of_cities', 'neighbor_lists')) -> dict:
+    '''
+    Replaces the shared arrays of the instance with the given keys (if
+    present) by private copies, so the instance can still be used after
+    release_shared_memory. Functions bound to the replaced arrays (e.g.
+    'edge_weight_f') must be built again.
+    Args:
+        instance (dict): The instance, shared with share_instance.
+        keys (Sequence[str]): Keys of the shared arrays.
+    Returns:
+        dict: The same instance, without shared arrays.
+    '''
+    for key in keys:
+        value = instance.get(key)
+        if isinstance(value, ndarray) and getattr(value, 'shm_name', None) is not None:
+            instance[key] = value.view(ndarray).copy()
+        elif isinstance(getattr(value, 'values', None), ndarray) and getattr(value.values, 'shm_name', None) is not None:
+            value.values = value.values.view(ndarray).copy()
+    return instance
+
+
+def release_shared_memory() -> None:
+    '''
+    Closes the blocks of shared memory created or attached by this process
+    and frees the ones it created, their memory is returned to the system
+    when no process uses them anymore (other processes can no longer attach
+    to them). The arrays in those blocks must not be referenced anymore
+    (see unshare_instance). Blocks inherited from the parent process (fork)
+    are left to it.
+    '''
+    collect() # arrays only referenced by cycles keep their block in use
+    for shm_name in [shm_name for shm_name, pid in _opened_by.items() if pid == getpid()]:
+        block = _blocks.pop(shm_name)
+        del _opened_by[shm_name]
+        if shm_name in _created_blocks:
+            _created_blocks.discard(shm_name)
+            block.unlink()
+        block.close()